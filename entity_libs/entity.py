@@ -9,9 +9,13 @@ class Entity():
 
     To create a new entity type, a child class must implement the
     methods which raise NotImplementedError. Also, the new entity
-    would have to be added in the structures in utils/constants.py
+    would have to be registered in the entity registry, see search_engine_libs/entity_registry.py
     """
     entity_name = "This is a base class"
+    # Names of the fields in the data files, in order. Child classes set searchable_fields_string from them,
+    # so the searchable fields are listed without loading data. If not set, they are taken from the first
+    # record loaded
+    schema_fields = ()
 
     def __init__(self, source_data):
         """
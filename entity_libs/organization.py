@@ -1,13 +1,16 @@
 """Represents an Organization. Inherits Entity.
 """
 from entity_libs.entity import Entity
+from utils.util_funcs import get_searchable_fields_string
 
 class Organization(Entity):
     """Class representation for an Entity of Type Organization.
     """
 
-    searchable_fields_string = ""
     entity_name = "Organization"
+    schema_fields = ('_id', 'url', 'external_id', 'name', 'domain_names', 'created_at', 'details', 'shared_tickets',
+                     'tags')
+    searchable_fields_string = get_searchable_fields_string(schema_fields, entity_name)
 
     def __init__(self, source_data):
         self.domain_names = None
@@ -2,12 +2,15 @@
 """
 from entity_libs.entity import Entity
 from utils.constants import EntityTypes
+from utils.util_funcs import get_searchable_fields_string
 
 class Ticket(Entity):
     """Class representation for an Entity of Type Ticket.
     """
-    searchable_fields_string = ""
     entity_name = "Ticket"
+    schema_fields = ('_id', 'url', 'external_id', 'created_at', 'type', 'subject', 'description', 'priority', 'status',
+                     'submitter_id', 'assignee_id', 'organization_id', 'tags', 'has_incidents', 'due_at', 'via')
+    searchable_fields_string = get_searchable_fields_string(schema_fields, entity_name)
 
     def __init__(self, source_data):
         self.type = None
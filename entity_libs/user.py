@@ -2,13 +2,17 @@
 """
 from entity_libs.entity import Entity
 from utils.constants import EntityTypes
+from utils.util_funcs import get_searchable_fields_string
 
 
 class User(Entity):
     """Class representation for an Entity of Type User.
     """
-    searchable_fields_string = ""
     entity_name = "User"
+    schema_fields = ('_id', 'url', 'external_id', 'name', 'alias', 'created_at', 'active', 'verified', 'shared',
+                     'locale', 'timezone', 'last_login_at', 'email', 'phone', 'signature', 'organization_id', 'tags',
+                     'suspended', 'role')
+    searchable_fields_string = get_searchable_fields_string(schema_fields, entity_name)
 
     def __init__(self, source_data):
         self.url = None
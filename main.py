@@ -1,8 +1,38 @@
+import time
+
+# Start of the time to first prompt, taken before anything else is imported
+STARTED_AT = time.perf_counter()
+
+import argparse
+
 from search_engine_libs.command_line_interface import CommandLineInterface
+from search_engine_libs.search_engine_utils import COLD_TEXT_FIELDS
 
 
 def main():
-    cli = CommandLineInterface()
+    parser = argparse.ArgumentParser(description='Zendesk Search')
+    parser.add_argument('--profile', action='store_true',
+                        help='profile every search, the profile can be viewed from the menu')
+    parser.add_argument('--show-load-progress', action='store_true',
+                        help='print progress and metrics while loading the data files')
+    parser.add_argument('--mmap-store', metavar='PATH',
+                        help='attach to a memory mapped store file instead of loading the data files')
+    parser.add_argument('--sqlite', metavar='PATH',
+                        help='load the data files into an SQLite database and search it, instead of memory')
+    parser.add_argument('--max-additional-rows', metavar='N', type=int,
+                        help='show at most N linked users and tickets of each kind for a search result')
+    parser.add_argument('--cold-fields', action='store_true',
+                        help='leave Ticket.description and User.signature in the data files, and read them only '
+                             'when they are searched or shown')
+    parser.add_argument('--show-startup-time', action='store_true',
+                        help='print the time from start up to the first prompt')
+    args = parser.parse_args()
+
+    cli = CommandLineInterface(profile_queries=args.profile, show_load_progress=args.show_load_progress,
+                               mmap_store_path=args.mmap_store, sqlite_path=args.sqlite,
+                               max_additional_rows=args.max_additional_rows,
+                               started_at=STARTED_AT if args.show_startup_time else None,
+                               cold_fields=COLD_TEXT_FIELDS if args.cold_fields else None)
     cli.run()
 
 
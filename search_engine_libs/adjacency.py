@@ -0,0 +1,69 @@
+"""Compact adjacency structures for the relationship caches of ZendeskSearchEngine.
+
+A relationship cache links the row of a record (Example: the row of an organization) to the rows
+of the records which refer to it (Example: the rows of all tickets of that organization). Instead of
+a dict of lists, with one list object per key, the links are stored in compressed sparse row (CSR) form:
+    targets -> packed array of rows, grouped by the row they link to
+    offsets -> array where the rows linked to row i are targets[offsets[i]:offsets[i + 1]]
+The links are packed from the resolved rows of a foreign key with CsrAdjacency.from_key_rows, once
+every foreign key value is converted to the row it refers to.
+"""
+from array import array
+
+# Type code of the arrays holding rows and offsets. 64 bit signed integers
+ROW_TYPE_CODE = 'q'
+
+EMPTY_ROWS = memoryview(array(ROW_TYPE_CODE))
+
+
+class CsrAdjacency():
+    """Read only relationship cache in compressed sparse row form.
+        self.offsets -> rows linked to row i are targets[offsets[i]:offsets[i + 1]]
+        self.targets -> packed rows
+    """
+
+    def __init__(self, offsets, targets):
+        self.offsets = offsets
+        self.targets = targets
+        # targets of a memory mapped store are already a memoryview, a view of it would keep the map open
+        self._targets_view = targets if isinstance(targets, memoryview) else memoryview(targets)
+
+    @classmethod
+    def from_key_rows(cls, key_rows, row_count):
+        """Pack the links of a resolved foreign key with a counting sort. Rows linked to a row keep their order.
+        :param key_rows: array where key_rows[i] is the row record i refers to, -1 if it refers to none.
+        Example the organization row of each ticket
+        :param row_count: number of rows in the data set the keys refer to
+        :return: CsrAdjacency
+        """
+        offsets = array(ROW_TYPE_CODE, bytes(8 * (row_count + 1)))
+        for key_row in key_rows:
+            if key_row >= 0:
+                offsets[key_row + 1] += 1
+        for key_row in range(row_count):
+            offsets[key_row + 1] += offsets[key_row]
+
+        targets = array(ROW_TYPE_CODE, bytes(8 * offsets[row_count]))
+        next_position = offsets[:-1]
+        for row, key_row in enumerate(key_rows):
+            if key_row >= 0:
+                targets[next_position[key_row]] = row
+                next_position[key_row] += 1
+
+        return cls(offsets, targets)
+
+    def get(self, row):
+        """Rows linked to row, without copying them
+        :param row: row of the record the links refer to. Example row of an organization
+        :return: memoryview of rows, empty if there are no links
+        """
+        if not 0 <= row < len(self.offsets) - 1:
+            return EMPTY_ROWS
+
+        return self._targets_view[self.offsets[row]:self.offsets[row + 1]]
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __repr__(self):
+        return str([list(self.get(row)) for row in range(len(self))])
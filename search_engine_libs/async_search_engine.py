@@ -0,0 +1,161 @@
+"""Module with an asyncio facade for ZendeskSearchEngine, for serving concurrent clients.
+To use as below,
+1. search_engine = await AsyncZendeskSearchEngine.create('data_files')
+2. results = await search_engine.search('_id', 71, EntityTypes.USER)
+
+Searches run in a bounded thread pool so a slow scan does not block the event loop.
+Identical searches which are in flight at the same time are executed once, and every caller
+gets its own copy of the result. Reloads build a complete new DatasetVersion in the thread pool and the engine
+publishes it when it is ready: searches never wait for a reload (readers are not blocked by the writer),
+each search runs against the version that was current when it started, and reloads are serialized
+(one writer at a time).
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from search_engine_libs.fuzzy_search import DEFAULT_FUZZY_SEARCH_LIMIT, FUZZY_INDEX_MAX_EDIT_DISTANCE
+from search_engine_libs.text_search import DEFAULT_TEXT_SEARCH_LIMIT
+from search_engine_libs.zendesk_search_engine import ZendeskSearchEngine
+
+
+class AsyncZendeskSearchEngine():
+    """Asyncio facade for ZendeskSearchEngine.
+    """
+
+    def __init__(self, base_data_folder, max_workers=4, **engine_kwargs):
+        """Use AsyncZendeskSearchEngine.create, which also loads the data.
+        :param base_data_folder: folder with a sub folder of data files for each entity type
+        :param max_workers: size of the thread pool running searches and reloads
+        :param engine_kwargs: passed to ZendeskSearchEngine
+        """
+        self.base_data_folder = base_data_folder
+        self.engine_kwargs = engine_kwargs
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='zendesk_search')
+
+        # ZendeskSearchEngine, created by create
+        self.search_engine = None
+
+        # {query key : future of the search}, searches in flight which can be shared
+        self._in_flight = {}
+        # Only one reload at a time
+        self._reload_lock = asyncio.Lock()
+
+    @classmethod
+    async def create(cls, base_data_folder, max_workers=4, **engine_kwargs):
+        """Create the facade and load the data
+        :return: AsyncZendeskSearchEngine
+        """
+        async_search_engine = cls(base_data_folder, max_workers, **engine_kwargs)
+        async_search_engine.search_engine = await async_search_engine._run(
+            partial(ZendeskSearchEngine, base_data_folder, **engine_kwargs))
+        return async_search_engine
+
+    async def reload(self):
+        """Load the data files into a new DatasetVersion, which the engine publishes once it is ready.
+        Searches started before that finish on the previous version.
+        :return: the new DatasetVersion
+        """
+        async with self._reload_lock:
+            return await self._run(self.search_engine.load_data_and_relations_cache)
+
+    async def search(self, search_field_name, search_field_value, entity_type):
+        """Same as ZendeskSearchEngine.do_search, run in the thread pool. Callers of identical searches
+        in flight at the same time share one execution, each gets its own copy of the result.
+        :return: printable search results, None if nothing is found
+        """
+        if self.search_engine is None:
+            raise RuntimeError('No data loaded. Create the engine with AsyncZendeskSearchEngine.create')
+
+        search_engine = self.search_engine
+        query_key = _query_key(search_engine.dataset, search_field_name, search_field_value, entity_type)
+
+        future = self._in_flight.get(query_key) if query_key is not None else None
+        if future is None:
+            future = asyncio.ensure_future(
+                self._run(partial(search_engine.do_search, search_field_name, search_field_value, entity_type)))
+
+            if query_key is not None:
+                self._in_flight[query_key] = future
+                future.add_done_callback(lambda _: self._in_flight.pop(query_key, None))
+
+        # shield, so that a cancelled caller does not cancel the search for the others
+        return _copy_search_results(await asyncio.shield(future))
+
+    async def search_text(self, query, limit=DEFAULT_TEXT_SEARCH_LIMIT):
+        """Same as ZendeskSearchEngine.search_text, run in the thread pool
+        :return: list of (entity type, score, printable search result), None if nothing is found
+        """
+        if self.search_engine is None:
+            raise RuntimeError('No data loaded. Create the engine with AsyncZendeskSearchEngine.create')
+
+        return await self._run(partial(self.search_engine.search_text, query, limit))
+
+    async def search_fuzzy(self, query, max_edit_distance=FUZZY_INDEX_MAX_EDIT_DISTANCE,
+                           limit=DEFAULT_FUZZY_SEARCH_LIMIT, entity_type=None):
+        """Same as ZendeskSearchEngine.search_fuzzy, run in the thread pool
+        :return: list of (entity type, edit distance, printable search result), None if nothing is found
+        """
+        if self.search_engine is None:
+            raise RuntimeError('No data loaded. Create the engine with AsyncZendeskSearchEngine.create')
+
+        return await self._run(partial(self.search_engine.search_fuzzy, query, max_edit_distance, limit,
+                                       entity_type))
+
+    async def search_batch(self, queries):
+        """Run many searches concurrently.
+        :param queries: list of (search_field_name, search_field_value, entity_type)
+        :return: list of printable search results, in the order of queries
+        """
+        return await asyncio.gather(*(self.search(*query) for query in queries))
+
+    def close(self):
+        """Shut down the thread pool, waiting for the searches and reloads in flight. Blocks the calling
+        thread, so from a coroutine use aclose instead
+        :return: None
+        """
+        self.executor.shutdown(wait=True)
+
+    async def aclose(self):
+        """Shut down the thread pool once the searches and reloads in flight finish, without blocking the
+        event loop meanwhile
+        :return: None
+        """
+        await asyncio.get_running_loop().run_in_executor(None, self.close)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.aclose()
+
+    def _run(self, func):
+        """Run func in the thread pool
+        :return: awaitable result of func
+        """
+        return asyncio.get_running_loop().run_in_executor(self.executor, func)
+
+
+def _copy_search_results(search_results):
+    """Copy of printable search results, so that a caller changing them does not change the results of the
+    other callers of a shared search
+    :param search_results: list of search results, each a list of [field, value] rows. None if nothing is found
+    :return: copy of search_results
+    """
+    if search_results is None:
+        return None
+
+    return [[list(row) for row in search_result] for search_result in search_results]
+
+
+def _query_key(dataset, search_field_name, search_field_value, entity_type):
+    """Key identifying identical searches on the same DatasetVersion. The type of the value is part of the
+    key because 1 == True == 1.0 in python, but they do not match the same records.
+    :return: hashable key, None if the value can not be hashed and the search can not be shared
+    """
+    try:
+        hash(search_field_value)
+    except TypeError:
+        return None
+
+    return dataset.version, search_field_name, type(search_field_value), search_field_value, entity_type
@@ -1,29 +1,69 @@
 """Module to encapsulate a command line interface. To use as below,
 1. from search_engine_libs.command_line_interface import CommandLineInterface
 2. CommandLineInterface().run()
+
+The welcome prompt is shown without loading any data: the data files of an entity type are loaded the
+first time it is searched, and the list of searchable fields comes from the schema of the entities.
 """
 
-from search_engine_libs.search_engine_utils import ENTITY_TYPE_TO_STORE_TYPE
+from search_engine_libs.query_profiler import format_seconds, now
 from search_engine_libs.zendesk_search_engine import ZendeskSearchEngine
-from utils.constants import ENTITY_TYPES_REVERSE, EMPTY_STRING
+from utils.constants import EMPTY_STRING
+from utils.numeric_match import parse_numeric_range
 
 
 class CommandLineInterface():
     """ Class to interact which users on the CLI, process search and print results
     """
 
-    def __init__(self):
-
-        self.search_engine = ZendeskSearchEngine('data_files')
+    def __init__(self, profile_queries=False, show_load_progress=False, mmap_store_path=None, sqlite_path=None,
+                 max_additional_rows=None, started_at=None, cold_fields=None):
+        """
+        :param profile_queries: if True, every search is profiled and the profile can be viewed from the menu
+        :param show_load_progress: if True, all data files are loaded at start up, with their progress
+        followed by the load metrics. Otherwise an entity type is loaded when it is first searched
+        :param mmap_store_path: path of a memory mapped store file to attach to instead of loading the data files
+        :param sqlite_path: path of an SQLite database to load the data files into and search, instead of memory
+        :param max_additional_rows: maximum number of linked records of each kind shown for a search result
+        :param started_at: time (query_profiler.now) the program started. If given, the time to the first
+        prompt is printed
+        :param cold_fields: {entity type : names of fields left in the data files and read when they are used}
+        """
+        storage_backend = None
+        if sqlite_path:
+            # imported only when used, to keep start up fast
+            from search_engine_libs.sqlite_backend import SqliteBackend
+            storage_backend = SqliteBackend(sqlite_path)
+
+        self.search_engine = ZendeskSearchEngine(
+            'data_files', progress_callback=self.print_load_progress if show_load_progress else None,
+            mmap_store_path=mmap_store_path, storage_backend=storage_backend,
+            max_additional_rows=max_additional_rows, lazy_load=not show_load_progress, cold_fields=cold_fields)
+        if show_load_progress:
+            print('Load metrics')
+            self._print_rows(self.search_engine.load_report.as_rows())
+            if self.search_engine.integrity_report:
+                print('Foreign keys which do not refer to any record')
+                self._print_rows(self.search_engine.integrity_report.as_rows())
+            if self.search_engine.string_encoder:
+                print('Memory saved by encoding repeated values')
+                self._print_rows(self.search_engine.string_encoder.memory_report())
+
+        if profile_queries:
+            self.search_engine.enable_profiling()
+
+        self.started_at = started_at
         self.search_criteria = self.search_engine.searchable_data_set.keys()
         self.search_options_msg = 'Enter '
 
         search_options = []
 
-        for search_criterion in self.search_criteria:
+        # Menu of the entity types in the entity registry, by number
+        self.entity_menu = self.search_engine.entity_registry.menu_numbers
+        for search_criterion in sorted(self.search_criteria, key=lambda entity_type: entity_type.value):
             search_options.append(
                 str(search_criterion.value) + ") " +
-                ENTITY_TYPE_TO_STORE_TYPE[search_criterion].entity_name)
+                self.search_engine.entity_registry.store_types[search_criterion].entity_name)
 
         self.search_options_msg += ' or '.join(search_options) + '   '
 
@@ -33,6 +73,9 @@ class CommandLineInterface():
         """Commence the CLI
         :return:
         """
+        if self.started_at is not None:
+            print(f'Time to first prompt: {format_seconds(now() - self.started_at)}')
+
         self.show_welcome_message()
 
     def show_welcome_message(self):
@@ -46,6 +89,10 @@ Type 'quit' to exit at any time
     Select search options:
         * Enter 1 to search Zendesk
         * Enter 2 to view a list of searchable fields 
+        * Enter 3 to view the query profile
+        * Enter 4 to search all entity types by text
+        * Enter 5 to search names and emails, allowing typos
+        * Enter 6 to search by tags
 """
 
         user_input = input(msg).lower().strip()
@@ -54,8 +101,16 @@ Type 'quit' to exit at any time
             self.do_search()
         elif user_input == '2':
             self.print_list_of_searchable_fields()
+        elif user_input == '3':
+            self.print_query_profile()
+        elif user_input == '4':
+            self.do_text_search()
+        elif user_input == '5':
+            self.do_fuzzy_search()
+        elif user_input == '6':
+            self.do_tag_search()
         elif user_input == 'quit':
-            self.verify_exit_print_msg_exit()
+            self.verify_exit_print_msg_exit(user_input)
 
         else:
             print("Invalid input. Try again")
@@ -70,8 +125,34 @@ Type 'quit' to exit at any time
 
         self.show_welcome_message()
 
+    def print_query_profile(self):
+        """Print the aggregated query profile and the profile of the last search.
+        :return:
+        """
+        profiler = self.search_engine.profiler
+
+        if profiler is None:
+            print("Query profiling is disabled. Run with --profile to enable it.\n")
+        else:
+            print('Query profile of all searches')
+            self._print_rows(profiler.as_rows())
+
+            if profiler.recent_profiles:
+                print('Query profile of the last search')
+                self._print_rows(profiler.recent_profiles[-1].as_rows())
+
+        self.show_welcome_message()
+
+    @staticmethod
+    def print_load_progress(shard_metrics):
+        """Progress callback for the search engine, prints the progress of loading a data file
+        :param shard_metrics: ShardLoadMetrics
+        :return:
+        """
+        print(shard_metrics.progress_msg())
+
     @staticmethod
-    def cast_to_correct_type(search_field_value):
+    def cast_to_correct_type(search_field_value, is_numeric_field=True):
         """Case the input from the user to a suitable type which can be used in the search.
         If the value can not be casted, then it is return as is.
         Example:
@@ -79,7 +160,11 @@ Type 'quit' to exit at any time
             2. cast_to_correct_type('1.1') returns 1.1
             3. cast_to_correct_type('false') returns False
             4. cast_to_correct_type('false1') returns false1
+            5. cast_to_correct_type('10..20'), cast_to_correct_type('>=2.5') return a NumericRange
+            6. cast_to_correct_type('10..20', is_numeric_field=False) returns 10..20
         :param search_field_value:
+        :param is_numeric_field: False if the field searched is not numeric. Ranges of numbers are then
+        searched as text
         :return:
         """
         if str.isnumeric(search_field_value):
@@ -89,6 +174,11 @@ Type 'quit' to exit at any time
         if search_field_value.lower() in ['true', 'false']:
             return True if search_field_value.lower() == 'true' else False
 
+        # convert to a range of numbers
+        numeric_range = parse_numeric_range(search_field_value) if is_numeric_field else None
+        if numeric_range is not None:
+            return numeric_range
+
         # convert to float
         try:
             float_val = float(search_field_value)
@@ -109,16 +199,19 @@ Type 'quit' to exit at any time
         self.verify_exit_print_msg_exit(user_input)
 
         try:
-            entity_type = ENTITY_TYPES_REVERSE[int(user_input)]
+            entity_type = self.entity_menu[int(user_input)]
 
             search_field_name = input("Enter search term  ").lower().strip()
             self.verify_exit_print_msg_exit(search_field_name)
 
-            search_field_value = CommandLineInterface.cast_to_correct_type(
-                input("Enter search value  ").lower().strip())
+            search_field_value = input("Enter search value  ").lower().strip()
+            # the values of the field are only checked when a range of numbers is typed
+            is_numeric_field = parse_numeric_range(search_field_value) is None or \
+                self.search_engine.is_numeric_field(search_field_name, entity_type)
+            search_field_value = CommandLineInterface.cast_to_correct_type(search_field_value, is_numeric_field)
             self.verify_exit_print_msg_exit(search_field_value)
 
-            print(f'Searching for {ENTITY_TYPE_TO_STORE_TYPE[entity_type].entity_name} '
+            print(f'Searching for {self.search_engine.entity_registry.store_types[entity_type].entity_name} '
                   f'for {search_field_name} '
                   f'with a value of {search_field_value}')
 
@@ -142,6 +235,79 @@ Type 'quit' to exit at any time
 
         self.show_welcome_message()
 
+    def do_tag_search(self):
+        """Take a list field (tags, domain_names) and the tags the records must have all of, any of
+        and none of from the user, for the selected entity, execute search and print results.
+        :return:
+        """
+        user_input = input(self.search_options_msg).lower().strip()
+        self.verify_exit_print_msg_exit(user_input)
+
+        try:
+            entity_type = self.entity_menu[int(user_input)]
+
+            search_field_name = input("Enter search term (tags, domain_names)  ").lower().strip()
+            self.verify_exit_print_msg_exit(search_field_name)
+
+            tag_lists = []
+            for condition in ['all of', 'any of', 'none of']:
+                tags = input(f"Enter the tags records must have {condition}, separated by commas. "
+                             f"End a tag with * to match the tags starting with it  ").strip()
+                self.verify_exit_print_msg_exit(tags.lower())
+                tag_lists.append([tag.strip() for tag in tags.split(',') if tag.strip()])
+
+            results = self.search_engine.search_tags(search_field_name, entity_type, *tag_lists)
+            self._pretty_print_results(results)
+
+        except KeyError:
+            print("ERROR! Value must be an integer from the values shown above. Try Again.\n")
+            self.do_tag_search()
+        except (ValueError, AttributeError) as search_exception:
+            print(f'ERROR! {search_exception}\n')
+            self.do_tag_search()
+
+        self.show_welcome_message()
+
+    def do_text_search(self):
+        """Take free text from the user, search the text fields of all entity types and print
+        the best results, most relevant first.
+        :return:
+        """
+        query = input("Enter search text  ").strip()
+        self.verify_exit_print_msg_exit(query.lower())
+
+        results = self.search_engine.search_text(query)
+        if not results:
+            print("*** No results found ***\n")
+
+        else:
+            for cntr, (entity_type, score, printable_search_result) in enumerate(results, 1):
+                entity_name = self.search_engine.entity_registry.store_types[entity_type].entity_name
+                print(f'Result {cntr}: {entity_name} (score {score:.2f})')
+                self._print_rows(printable_search_result)
+
+        self.show_welcome_message()
+
+    def do_fuzzy_search(self):
+        """Take names or emails from the user, which may have typos, search them in all entity types and
+        print the closest results first.
+        :return:
+        """
+        query = input("Enter names or emails  ").strip()
+        self.verify_exit_print_msg_exit(query.lower())
+
+        results = self.search_engine.search_fuzzy(query)
+        if not results:
+            print("*** No results found ***\n")
+
+        else:
+            for cntr, (entity_type, distance, printable_search_result) in enumerate(results, 1):
+                entity_name = self.search_engine.entity_registry.store_types[entity_type].entity_name
+                print(f'Result {cntr}: {entity_name} (edit distance {distance})')
+                self._print_rows(printable_search_result)
+
+        self.show_welcome_message()
+
     def verify_exit_print_msg_exit(self, val):
         """Print exit msg and exit with return code 0, if val == quit
         :return:
@@ -161,29 +327,30 @@ Type 'quit' to exit at any time
             print("*** No results found ***\n")
 
         else:
-            cntr = 1
-            try:
-                from prettytable import PrettyTable
-                for printable_search_result in results:
-                    table = PrettyTable(['Field', 'Value'])
-                    for row in printable_search_result:
-                        table.add_row(row)
-
-                    print(f'Result set {cntr}')
-                    cntr += 1
-                    print(table)
-                    print("\n")
-            except ImportError:
+            for cntr, printable_search_result in enumerate(results, 1):
+                print(f'Result set {cntr}')
+                self._print_rows(printable_search_result)
 
-                #print as raw output
-                for printable_search_result in results:
-                    print(f'Result set {cntr}')
-                    for row in printable_search_result:
-                        print ("{:<50}".format(row[0]), row[1])
+        self.show_welcome_message()
 
-                    print("\n")
-                    cntr += 1
+    @staticmethod
+    def _print_rows(rows):
+        """Prints rows of [Field, Value] in a tabular format. If the relevant module is not found,
+        raw output is printed
+        :param rows:
+        :return:
+        """
+        try:
+            from prettytable import PrettyTable
+            table = PrettyTable(['Field', 'Value'])
+            for row in rows:
+                table.add_row(row)
 
+            print(table)
+        except ImportError:
 
+            #print as raw output
+            for row in rows:
+                print ("{:<50}".format(row[0]), row[1])
 
-        self.show_welcome_message()
+        print("\n")
@@ -0,0 +1,93 @@
+"""A complete version of the data searched by ZendeskSearchEngine.
+
+A reload builds a new DatasetVersion off to the side, and the engine publishes it by replacing
+its reference to the current version. A reload never modifies a published version, so a search
+which took the current version when it started sees consistent data until it finishes, even if a
+reload publishes a newer version meanwhile. An old version is released once the last search
+holding it finishes.
+
+A published version is only added to: ensure_loaded loads the entity types which are not loaded
+yet when the version is loaded lazily, and get_derived builds structures derived from the data,
+like indexes. Data already published is not changed by either. Searches call ensure_loaded before
+reading the data of an entity type, so they never see a partly loaded entity type.
+"""
+import threading
+import weakref
+
+
+class DatasetVersion():
+    """All the data of one load.
+        self.version -> number of the version, increases with every load of an engine
+        self.searchable_data_set -> {entity type : SearchEngineEntityMeta}
+        self.relationship_caches -> {cache name : CsrAdjacency}
+        self.foreign_rows -> {(entity type, foreign key) : array of the row each record refers to, -1 if none}.
+        Empty when a storage backend holds the data
+        self.integrity_report -> IntegrityReport of the orphaned foreign keys, None when a storage backend
+        holds the data
+        self.load_report -> LoadReport of the load which built this version
+        self.string_encoder -> DictionaryEncoder used by the load, None if encoding was disabled
+        self.derived -> structures derived from the data, like indexes. Built lazily with get_derived,
+        so they are dropped together with the version they were built from
+        self.loaded_entity_types -> entity types whose data is loaded
+        self.entity_loader -> function called with this version and a set of entity types to load them,
+        None if every entity type is loaded when the version is built
+    """
+
+    def __init__(self, version, searchable_data_set):
+        self.version = version
+        self.searchable_data_set = searchable_data_set
+        self.relationship_caches = {}
+        self.foreign_rows = {}
+        self.integrity_report = None
+        self.load_report = None
+        self.string_encoder = None
+        self.derived = {}
+        self._derived_lock = threading.RLock()
+        self.loaded_entity_types = frozenset()
+        self.entity_loader = None
+        self._entity_load_lock = threading.Lock()
+
+    def ensure_loaded(self, entity_types):
+        """Load the entity types which are not loaded yet. Concurrent searches wait for the load of an
+        entity type instead of loading it again.
+        :param entity_types: iterable of entity types
+        :return: None
+        """
+        if self.loaded_entity_types.issuperset(entity_types):
+            return
+
+        with self._entity_load_lock:
+            missing_entity_types = set(entity_types) - self.loaded_entity_types
+            if missing_entity_types:
+                self.entity_loader(self, missing_entity_types)
+                # published once the entity types are complete
+                self.loaded_entity_types = self.loaded_entity_types | missing_entity_types
+
+    def get_derived(self, name, builder):
+        """Get a structure derived from this version, building it on first use.
+        Concurrent searches asking for the same structure build it only once.
+        :param name: name of the structure
+        :param builder: function called with this version, returns the structure
+        :return: the structure
+        """
+        derived = self.derived.get(name)
+        if derived is None:
+            with self._derived_lock:
+                derived = self.derived.get(name)
+                if derived is None:
+                    derived = self.derived[name] = builder(self)
+
+        return derived
+
+    def close_on_release(self, resource):
+        """Close a resource holding the data of this version, like a memory mapped file or a database
+        connection, once the version is released: when it is replaced by a newer version and the last
+        search holding it finishes
+        :param resource: object with a close method. It must not refer to this version, which would then
+        never be released
+        :return: None
+        """
+        weakref.finalize(self, resource.close)
+
+    def __repr__(self):
+        return f'DatasetVersion({self.version})'
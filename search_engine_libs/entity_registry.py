@@ -0,0 +1,157 @@
+"""Declarative registry of the entity types searched by ZendeskSearchEngine.
+
+Loading, linking, the relationship caches, the additional data of search results, the storage backends
+and the CLI menus are derived from the registry, so an entity type is added by registering it. A new
+entity type is declared by its name, and given the next free number in the CLI menus:
+
+    GROUP = ENTITY_REGISTRY.register('GROUP', Group, 'groups_data', 'groups*.json').entity_type
+    ENTITY_REGISTRY.add_reverse_link(EntityTypes.ORGANIZATION,
+                                     ReverseLink('organization_to_groups', GROUP, 'organization_id', 'group_{}'))
+
+where Group is a child class of Entity.
+
+The entity class is the schema: its attributes are the fields of the entity type, and its
+get_foreign_entity_links gives the foreign keys which are resolved when the data is loaded.
+Entity types are loaded in registration order. Foreign keys are resolved once every entity type is
+loaded, so the order does not matter for links.
+"""
+from collections import OrderedDict
+
+
+class EntityType():
+    """Entity type declared by its name when it is registered. Like the members of EntityTypes, it is the
+    key of the data of the entity type.
+        self.name -> name of the entity type. GROUP
+        self.value -> number of the entity type in the CLI menus
+    """
+
+    def __init__(self, name, value):
+        self.name = name
+        self.value = value
+
+    def __repr__(self):
+        return str(vars(self))
+
+
+class ReverseLink():
+    """Link from a record to the records of another entity type which refer to it with a foreign key.
+    A relationship cache is built for each reverse link, and the linked records are shown in the
+    additional data of search results.
+        self.cache_name -> name of the relationship cache. organization_to_tickets
+        self.source_entity_type -> entity type holding the foreign key. EntityTypes.TICKET
+        self.foreign_key -> name of the foreign key. organization_id
+        self.field_name_format -> format of the field names in the additional data, with a placeholder
+        for the number of the linked record. ticket_{}
+    """
+
+    def __init__(self, cache_name, source_entity_type, foreign_key, field_name_format):
+        self.cache_name = cache_name
+        self.source_entity_type = source_entity_type
+        self.foreign_key = foreign_key
+        self.field_name_format = field_name_format
+
+    def __repr__(self):
+        return str(vars(self))
+
+
+class EntityRegistration():
+    """Everything ZendeskSearchEngine needs to know about an entity type.
+        self.entity_type -> member of an Enum, like EntityTypes.USER, or an EntityType. Its value is the
+        number of the entity type in the CLI menus
+        self.entity_store_type -> Class of the entity, a child class of Entity
+        self.data_folder -> folder under the base data folder holding the data files
+        self.file_pattern -> pattern of the names of the data files
+        self.reverse_links -> list of ReverseLink to this entity type
+    """
+
+    def __init__(self, entity_type, entity_store_type, data_folder, file_pattern, reverse_links=None):
+        self.entity_type = entity_type
+        self.entity_store_type = entity_store_type
+        self.data_folder = data_folder
+        self.file_pattern = file_pattern
+        self.reverse_links = list(reverse_links or [])
+
+    @property
+    def foreign_keys(self):
+        """Foreign keys held by this entity type
+        :return: {field name : entity type it refers to}
+        """
+        return self.entity_store_type.get_foreign_entity_links()
+
+    def __repr__(self):
+        return str(vars(self))
+
+
+class EntityRegistry():
+    """Entity types in load order, and the lookup tables derived from them. The tables are updated
+    in place by register, so references to them stay valid.
+        self.registrations -> {entity type : EntityRegistration}, in load order
+        self.store_types -> {entity type : Class of the entity}
+        self.data_folders -> {entity type : data folder}
+        self.relationship_caches -> {cache name : (entity type holding the foreign key, foreign key,
+        entity type it refers to)}
+        self.menu_numbers -> {number in the CLI menus : entity type}
+    """
+
+    def __init__(self):
+        self.registrations = OrderedDict()
+        self.store_types = {}
+        self.data_folders = OrderedDict()
+        self.relationship_caches = OrderedDict()
+        self.menu_numbers = {}
+
+    def register(self, entity_type, entity_store_type, data_folder, file_pattern, reverse_links=None):
+        """Add an entity type
+        :param entity_type: member of an Enum, like EntityTypes.USER, or the name of a new entity type,
+        which is given the next free number in the CLI menus
+        :param entity_store_type: Class of the entity
+        :param data_folder: folder under the base data folder holding the data files
+        :param file_pattern: pattern of the names of the data files. 'users*.json'
+        :param reverse_links: list of ReverseLink to this entity type
+        :return: EntityRegistration
+        """
+        if isinstance(entity_type, str):
+            entity_type = EntityType(entity_type, max(self.menu_numbers, default=0) + 1)
+        # the name identifies the entity type in the storage backends
+        if any(registered.name == entity_type.name for registered in self.registrations):
+            raise KeyError(f'Entity type {entity_type.name} is already registered')
+        if entity_type.value in self.menu_numbers:
+            raise KeyError(f'Menu number {entity_type.value} of {entity_type.name} is already used by '
+                           f'{self.menu_numbers[entity_type.value].name}')
+
+        registration = self.registrations[entity_type] = EntityRegistration(entity_type, entity_store_type,
+                                                                            data_folder, file_pattern)
+        self.store_types[entity_type] = entity_store_type
+        self.data_folders[entity_type] = data_folder
+        self.menu_numbers[entity_type.value] = entity_type
+        for reverse_link in reverse_links or []:
+            self.add_reverse_link(entity_type, reverse_link)
+
+        return registration
+
+    def add_reverse_link(self, entity_type, reverse_link):
+        """Link the records of a registered entity type to the records of another entity type which refer
+        to them. Example the groups of an organization, once groups are registered
+        :param entity_type: entity type the foreign key refers to
+        :param reverse_link: ReverseLink
+        :return: None
+        """
+        if reverse_link.cache_name in self.relationship_caches:
+            raise KeyError(f'Relationship cache {reverse_link.cache_name} is already registered')
+
+        self.registrations[entity_type].reverse_links.append(reverse_link)
+        self.relationship_caches[reverse_link.cache_name] = (reverse_link.source_entity_type,
+                                                             reverse_link.foreign_key, entity_type)
+
+    def __getitem__(self, entity_type):
+        return self.registrations[entity_type]
+
+    def __iter__(self):
+        return iter(self.registrations.values())
+
+    def __repr__(self):
+        return str(vars(self))
+
+
+# Registry used by default. The built in entity types are registered in search_engine_utils
+ENTITY_REGISTRY = EntityRegistry()
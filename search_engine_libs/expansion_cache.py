@@ -0,0 +1,55 @@
+"""Cache of the printable parts of search results which are the same for every search on a DatasetVersion:
+the external representation of the record a foreign key points to, and the additional data from linked
+data sets (employees and tickets of an organization, tickets of a user).
+The cache is built lazily, one entry per record that appears in a search result, and belongs to a
+DatasetVersion, so a reload starts with an empty cache.
+"""
+
+
+class ExpansionCache():
+    """Cached expansions of one DatasetVersion.
+        self.external_reprs -> {entity type : {row : external representation}}
+        self.addition_data -> {(entity type, row, max additional rows) : rows of additional data, as tuples}
+    Entries are never modified once added. Two searches missing the same entry at the same time may both
+    build it, they build the same value.
+    """
+
+    def __init__(self, dataset=None):
+        """
+        :param dataset: DatasetVersion the cache belongs to. Not used, the argument lets the class be
+        given to DatasetVersion.get_derived as the builder
+        """
+        self.external_reprs = {}
+        self.addition_data = {}
+
+    def get_external_repr(self, entity_type, row, builder):
+        """External representation of a record a foreign key points to
+        :param entity_type: entity type of the record
+        :param row: row of the record
+        :param builder: function called without arguments on a miss, returns the representation
+        :return: (representation, True if it was found in the cache)
+        """
+        entity_reprs = self.external_reprs.setdefault(entity_type, {})
+        external_repr = entity_reprs.get(row)
+        if external_repr is not None:
+            return external_repr, True
+
+        external_repr = entity_reprs[row] = builder()
+        return external_repr, False
+
+    def get_addition_data(self, key, builder):
+        """Additional data of a search result
+        :param key: (entity type, row, max additional rows)
+        :param builder: function called without arguments on a miss, returns the rows of additional data
+        :return: (new list of new [field, value] rows, True if it was found in the cache)
+        """
+        addition_data = self.addition_data.get(key)
+        is_cached = addition_data is not None
+        if not is_cached:
+            addition_data = self.addition_data[key] = tuple(tuple(row) for row in builder())
+
+        # new lists, callers add their own rows and may change them without changing the cache
+        return [list(row) for row in addition_data], is_cached
+
+    def __repr__(self):
+        return str(vars(self))
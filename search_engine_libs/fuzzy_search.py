@@ -0,0 +1,256 @@
+"""Typo tolerant search over the names and emails of all entity types.
+To use as below,
+1. search_engine = ZendeskSearchEngine('data_files')
+2. search_engine.search_fuzzy('fransisca rasmusen')
+
+Every record is a document made of the tokens of its fuzzy search fields. A record matches when each
+query token is within a bounded edit distance (insertions, deletions, substitutions and transpositions
+of adjacent characters) of one of its tokens. Records are ranked by the sum of the distances.
+Candidate tokens are found with a symmetric deletion index: every string obtained by deleting up to
+FUZZY_INDEX_MAX_EDIT_DISTANCE characters from the start of a token maps to the tokens it comes from. Two
+tokens within that distance always share such a string, so a search computes the distance only to the
+few tokens which share one with the query token, instead of to every record.
+The index is built on first use from a DatasetVersion and dropped together with it on reload.
+"""
+import heapq
+from array import array
+
+from search_engine_libs.adjacency import ROW_TYPE_CODE
+from search_engine_libs.text_search import tokenize
+from utils.cold_fields import resolve_cold_field
+
+# Fields searched by search_fuzzy. Not every entity type has every field
+FUZZY_SEARCH_FIELDS = ('name', 'email')
+DEFAULT_FUZZY_SEARCH_LIMIT = 10
+
+# Largest edit distance the index can search
+FUZZY_INDEX_MAX_EDIT_DISTANCE = 2
+# Deletions are indexed for the first characters of each token only, which bounds the size of the index
+# for long tokens. Candidates are checked on the whole token
+FUZZY_INDEX_PREFIX_LENGTH = 7
+
+# Edit distance allowed for a query token by its length: short tokens must match exactly, so that a
+# two letter token does not match every other two letter token. [(minimum length, distance)]
+DISTANCE_BY_TOKEN_LENGTH = [(6, 2), (3, 1), (0, 0)]
+
+
+class FuzzySearchHit():
+    """One result of a fuzzy search
+        self.distance -> sum of the edit distances of the query tokens, lower is closer
+        self.entity_type -> EntityTypes of the record
+        self.row -> row of the record
+    """
+
+    def __init__(self, distance, entity_type, row):
+        self.distance = distance
+        self.entity_type = entity_type
+        self.row = row
+
+    def __repr__(self):
+        return str(vars(self))
+
+
+class FuzzyIndex():
+    """Symmetric deletion index over the fuzzy search fields of all records of a DatasetVersion.
+    Documents are numbered in load order across entity types.
+    """
+
+    def __init__(self):
+        # entity type and first document of each entity type, in document order
+        self.entity_ranges = []
+        self.document_count = 0
+        # vocabulary of tokens, a token is identified by its position
+        self.tokens = []
+        self.token_ids = {}
+        # documents of each token, by token id
+        self.postings = []
+        # {token prefix with characters deleted : array of token ids}
+        self.deletions = {}
+
+    @classmethod
+    def build(cls, dataset):
+        """Index every record of a DatasetVersion. Used with DatasetVersion.get_derived
+        :param dataset: DatasetVersion
+        :return: FuzzyIndex
+        """
+        index = cls()
+        for entity_type, store_meta in dataset.searchable_data_set.items():
+            index.entity_ranges.append((index.document_count, entity_type))
+            for store_object in store_meta.rows:
+                index._add_document(_document_tokens(store_object))
+
+        return index
+
+    def _add_document(self, tokens):
+        document = self.document_count
+        self.document_count += 1
+
+        for token in set(tokens):
+            token_id = self.token_ids.get(token)
+            if token_id is None:
+                token_id = self.token_ids[token] = len(self.tokens)
+                self.tokens.append(token)
+                self.postings.append(array(ROW_TYPE_CODE))
+                for deletion in _deletions(token[:FUZZY_INDEX_PREFIX_LENGTH], FUZZY_INDEX_MAX_EDIT_DISTANCE):
+                    token_id_list = self.deletions.get(deletion)
+                    if token_id_list is None:
+                        token_id_list = self.deletions[deletion] = array(ROW_TYPE_CODE)
+                    token_id_list.append(token_id)
+
+            self.postings[token_id].append(document)
+
+    def search(self, query, max_edit_distance=FUZZY_INDEX_MAX_EDIT_DISTANCE, limit=DEFAULT_FUZZY_SEARCH_LIMIT,
+               entity_type=None, profile=None):
+        """Closest documents for a query
+        :param query: names or emails, with typos. 'fransisca rasmusen'
+        :param max_edit_distance: largest edit distance of a query token. Short tokens are allowed less,
+        see DISTANCE_BY_TOKEN_LENGTH
+        :param limit: maximum number of hits
+        :param entity_type: search only the records of this entity type, None for all
+        :param profile: QueryProfile to record into, None if the search is not profiled
+        :return: list of FuzzySearchHit, closest first
+        """
+        if max_edit_distance > FUZZY_INDEX_MAX_EDIT_DISTANCE:
+            raise ValueError(f'max_edit_distance must be at most {FUZZY_INDEX_MAX_EDIT_DISTANCE}')
+
+        query_tokens = set(tokenize(query))
+        if not query_tokens:
+            return []
+
+        first_document, end_document = self._document_range(entity_type)
+        distances = None
+        for query_token in query_tokens:
+            token_distances = {}
+            for token_id, distance in self._similar_tokens(query_token, max_edit_distance, profile):
+                for document in self.postings[token_id]:
+                    if first_document <= document < end_document and distance < token_distances.get(document,
+                                                                                                     distance + 1):
+                        token_distances[document] = distance
+
+                if profile is not None:
+                    profile.count('records_scanned', len(self.postings[token_id]))
+
+            # every query token must match a token of the document
+            if distances is None:
+                distances = token_distances
+            else:
+                distances = {document: distances[document] + distance
+                             for document, distance in token_distances.items() if document in distances}
+
+        # ties are broken by load order, so results are stable
+        best = heapq.nsmallest(limit, distances.items(), key=lambda document_distance: (document_distance[1],
+                                                                                        document_distance[0]))
+        return [FuzzySearchHit(distance, *self._entity_row(document)) for document, distance in best]
+
+    def _similar_tokens(self, query_token, max_edit_distance, profile=None):
+        """Tokens of the vocabulary within the edit distance allowed for a query token
+        :return: list of (token id, edit distance)
+        """
+        allowed_distance = min(max_edit_distance, _distance_for_length(len(query_token)))
+
+        candidate_token_ids = set()
+        for deletion in _deletions(query_token[:FUZZY_INDEX_PREFIX_LENGTH], allowed_distance):
+            candidate_token_ids.update(self.deletions.get(deletion, ()))
+
+        similar_tokens = []
+        for token_id in candidate_token_ids:
+            distance = edit_distance(query_token, self.tokens[token_id], allowed_distance)
+            if distance <= allowed_distance:
+                similar_tokens.append((token_id, distance))
+
+        if profile is not None:
+            profile.count('predicates_evaluated', len(candidate_token_ids))
+
+        return similar_tokens
+
+    def _document_range(self, entity_type):
+        """Documents of an entity type
+        :param entity_type: None for all documents
+        :return: (first document, end document)
+        """
+        if entity_type is None:
+            return 0, self.document_count
+
+        for position, (first_document, range_entity_type) in enumerate(self.entity_ranges):
+            if range_entity_type == entity_type:
+                end_document = (self.entity_ranges[position + 1][0] if position + 1 < len(self.entity_ranges)
+                                else self.document_count)
+                return first_document, end_document
+
+        return 0, 0
+
+    def _entity_row(self, document):
+        """Entity type and row of a document
+        :return: (entity type, row)
+        """
+        for first_document, entity_type in reversed(self.entity_ranges):
+            if document >= first_document:
+                return entity_type, document - first_document
+
+        raise IndexError(f'document {document} out of range')
+
+
+def edit_distance(source, target, max_distance):
+    """Optimal string alignment distance: the number of insertions, deletions, substitutions and
+    transpositions of adjacent characters turning source into target
+    :param source: string
+    :param target: string
+    :param max_distance: the computation stops once the distance is known to be larger
+    :return: the distance, max_distance + 1 if it is larger than max_distance
+    """
+    if abs(len(source) - len(target)) > max_distance:
+        return max_distance + 1
+
+    previous_previous = None
+    previous = list(range(len(target) + 1))
+    for i in range(1, len(source) + 1):
+        current = [i] + [0] * len(target)
+        for j in range(1, len(target) + 1):
+            distance = min(previous[j] + 1, current[j - 1] + 1,
+                           previous[j - 1] + (source[i - 1] != target[j - 1]))
+            if i > 1 and j > 1 and source[i - 1] == target[j - 2] and source[i - 2] == target[j - 1]:
+                distance = min(distance, previous_previous[j - 2] + 1)
+            current[j] = distance
+
+        if min(current) > max_distance:
+            return max_distance + 1
+
+        previous_previous, previous = previous, current
+
+    return min(previous[-1], max_distance + 1)
+
+
+def _distance_for_length(token_length):
+    for minimum_length, distance in DISTANCE_BY_TOKEN_LENGTH:
+        if token_length >= minimum_length:
+            return distance
+
+    return 0
+
+
+def _deletions(token, max_deletions):
+    """Strings obtained by deleting up to max_deletions characters from a token, the token included
+    :return: set of strings
+    """
+    deletions = {token}
+    last_deletions = {token}
+    for _ in range(max_deletions):
+        last_deletions = {deletion[:i] + deletion[i + 1:] for deletion in last_deletions
+                          for i in range(len(deletion))}
+        deletions.update(last_deletions)
+
+    return deletions
+
+
+def _document_tokens(store_object):
+    """Tokens of the fuzzy search fields of a record
+    :param store_object: entity object
+    :return: list of tokens
+    """
+    tokens = []
+    for field_name in FUZZY_SEARCH_FIELDS:
+        value = resolve_cold_field(getattr(store_object, field_name, None))
+        if isinstance(value, str):
+            tokens.extend(tokenize(value))
+
+    return tokens
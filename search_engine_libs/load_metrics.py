@@ -0,0 +1,116 @@
+"""Metrics collected while ZendeskSearchEngine loads its data files.
+
+A LoadReport holds one EntityLoadMetrics per entity type, which in turn holds one
+ShardLoadMetrics per data file (shard). The report is available as
+ZendeskSearchEngine.load_report once loading finishes, and shard metrics are passed to
+the optional progress callback while loading is in progress.
+"""
+from collections import OrderedDict
+
+from search_engine_libs.query_profiler import format_seconds
+
+
+class ShardLoadMetrics():
+    """Metrics for loading one data file.
+        self.records_total -> number of records in the file, known once the file is parsed
+        self.store_time -> time spent writing records to a storage backend, 0 when data is held in memory
+        self.done -> True once every record of the file has been stored
+    """
+
+    def __init__(self, entity_name, file_path):
+        self.entity_name = entity_name
+        self.file_path = file_path
+        self.bytes_read = 0
+        self.records_total = None
+        self.records_parsed = 0
+        self.parse_time = 0.0
+        self.construction_time = 0.0
+        self.store_time = 0.0
+        self.duplicates_rejected = 0
+        self.done = False
+
+    def progress_msg(self):
+        """Single line describing the progress of this shard
+        :return: string
+        """
+        return (f'Loading {self.entity_name} data from {self.file_path}: '
+                f'{self.records_parsed}/{self.records_total} records, {_format_bytes(self.bytes_read)}, '
+                f'{format_seconds(self.parse_time + self.construction_time + self.store_time)}')
+
+    def __repr__(self):
+        return str(vars(self))
+
+
+class EntityLoadMetrics():
+    """Metrics for loading all data files of an entity type. Totals are summed over the shards.
+    """
+    _summed_metrics = ('bytes_read', 'records_parsed', 'parse_time', 'construction_time',
+                       'store_time', 'duplicates_rejected')
+
+    def __init__(self, entity_name):
+        self.entity_name = entity_name
+        self.shards = []
+
+    def totals(self):
+        """Sum of the metrics of all shards
+        :return: OrderedDict {metric name: total}
+        """
+        return OrderedDict((metric, sum(getattr(shard, metric) for shard in self.shards))
+                           for metric in EntityLoadMetrics._summed_metrics)
+
+    def __repr__(self):
+        return str(vars(self))
+
+
+class LoadReport():
+    """Metrics for one call of ZendeskSearchEngine.load_data_and_relations_cache
+        self.link_time -> time spent resolving foreign keys and building the relationship caches,
+        once all data files are loaded
+    """
+
+    def __init__(self):
+        self.entities = OrderedDict()
+        self.link_time = 0.0
+        self.total_time = 0.0
+
+    def add_entity(self, entity_name):
+        """Start collecting metrics for an entity type
+        :param entity_name: name of the entity. User, Ticket...
+        :return: EntityLoadMetrics
+        """
+        self.entities[entity_name] = EntityLoadMetrics(entity_name)
+        return self.entities[entity_name]
+
+    def as_rows(self):
+        """Rows of [Field, Value], same format as the rows of a search result
+        :return: list of lists
+        """
+        rows = [['total_time', format_seconds(self.total_time)],
+                ['link_time', format_seconds(self.link_time)]]
+        for entity_name, entity_metrics in self.entities.items():
+            totals = entity_metrics.totals()
+            rows.append([entity_name, f'{len(entity_metrics.shards)} files'])
+            for metric, total in totals.items():
+                if metric.endswith('_time'):
+                    total = format_seconds(total)
+                elif metric == 'bytes_read':
+                    total = _format_bytes(total)
+                rows.append([f'{entity_name.lower()}_{metric}', str(total)])
+
+        return rows
+
+    def __repr__(self):
+        return str(vars(self))
+
+
+def _format_bytes(num_bytes):
+    """Format a size for printing
+    :param num_bytes: size in bytes
+    :return: string
+    """
+    for unit in ('B', 'KB', 'MB'):
+        if num_bytes < 1024:
+            return f'{num_bytes:.1f}{unit}' if unit != 'B' else f'{num_bytes}B'
+        num_bytes /= 1024
+
+    return f'{num_bytes:.1f}GB'
@@ -0,0 +1,509 @@
+"""Read only data store in a memory mapped file, shared by all processes on a host.
+
+The store is built once from a loaded ZendeskSearchEngine with build_mmap_store, or from the command line
+
+        python -m search_engine_libs.mmap_store data_files data_files/zendesk.mmap
+
+and ZendeskSearchEngine(base_data_folder, mmap_store_path='data_files/zendesk.mmap') attaches to it, through
+MmapStoreBackend, instead of parsing the data files. Every process maps the same file, so the operating
+system keeps one copy of the data in the page cache however many worker processes there are. Records are
+decoded lazily when a row is accessed. The unique identifier to row maps, the relationship caches and the
+indexes (numeric columns, tag indexes, text and fuzzy indexes) are built once with the store and used in
+place, so the memory of a process does not grow with the data. The map is closed when the DatasetVersion
+attached to it is released.
+
+File layout
+    magic (8 bytes) | header size (8 bytes) | header (json) | padding | sections
+The header lists, per entity type, the sections with the records (one json document per row), the
+offsets of the records, the sorted unique identifiers and the indexes of its fields, per relationship
+cache the offsets and targets sections of the CsrAdjacency, and the sections of the text and fuzzy
+indexes. Sections are aligned to 8 bytes so integer arrays can be used in place.
+Lists of strings are stored as the utf-8 bytes of the strings with their offsets, and maps from strings
+to lists of integers as the sorted strings with the offsets of their lists in packed integer columns.
+"""
+import argparse
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from bisect import bisect_left
+from functools import partial
+
+from search_engine_libs.adjacency import ROW_TYPE_CODE, CsrAdjacency
+from search_engine_libs.fuzzy_search import FuzzyIndex
+from search_engine_libs.load_metrics import ShardLoadMetrics
+from search_engine_libs.numeric_columns import NumericColumn
+from search_engine_libs.storage_backends import StorageBackend
+from search_engine_libs.tag_index import TagIndex
+from search_engine_libs.text_search import InvertedIndex
+from utils.cold_fields import json_default
+
+MMAP_STORE_MAGIC = b'ZDMMAP02'
+_HEADER_SIZE_FORMAT = '<Q'
+_ALIGNMENT = 8
+# Type code of the arrays of numeric columns
+_VALUE_TYPE_CODE = 'd'
+
+
+class MmapRows():
+    """Rows of one entity type in a memory mapped store. Used like the list SearchEngineEntityMeta.rows,
+    but the entity object of a row is decoded each time it is accessed.
+    """
+
+    def __init__(self, buffer, row_offsets, entity_store_type):
+        """
+        :param buffer: memoryview of the records section
+        :param row_offsets: memoryview of integers, row i is buffer[row_offsets[i]:row_offsets[i + 1]]
+        :param entity_store_type: Class of the entity User, Organization, Ticket
+        """
+        self.buffer = buffer
+        self.row_offsets = row_offsets
+        self.entity_store_type = entity_store_type
+
+    def __len__(self):
+        return len(self.row_offsets) - 1
+
+    def __getitem__(self, row):
+        if not 0 <= row < len(self):
+            raise IndexError(f'row {row} out of range')
+
+        source_data = json.loads(bytes(self.buffer[self.row_offsets[row]:self.row_offsets[row + 1]]))
+        return self.entity_store_type(source_data)
+
+    def __iter__(self):
+        for row in range(len(self)):
+            yield self[row]
+
+
+class MmapStrings():
+    """List of strings in a memory mapped store, decoded each time one is accessed
+    """
+
+    def __init__(self, buffer, offsets):
+        """
+        :param buffer: memoryview of the utf-8 bytes of the strings
+        :param offsets: memoryview of integers, string i is buffer[offsets[i]:offsets[i + 1]]
+        """
+        self.buffer = buffer
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, position):
+        if not 0 <= position < len(self):
+            raise IndexError(f'string {position} out of range')
+
+        return str(self.buffer[self.offsets[position]:self.offsets[position + 1]], 'utf-8')
+
+    def __iter__(self):
+        for position in range(len(self)):
+            yield self[position]
+
+    def find(self, string):
+        """Position of a string, the strings must be sorted
+        :param string:
+        :return: position, None if the string is not in the list
+        """
+        position = bisect_left(self, string)
+        if position < len(self) and self[position] == string:
+            return position
+
+        return None
+
+
+class MmapLists():
+    """Lists of integers in a memory mapped store, by position. Used like a list of arrays
+    """
+
+    def __init__(self, offsets, values):
+        """
+        :param offsets: memoryview of integers, list i is values[offsets[i]:offsets[i + 1]]
+        :param values: memoryview of integers
+        """
+        self.offsets = offsets
+        self.values = values
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, position):
+        if not 0 <= position < len(self):
+            raise IndexError(f'list {position} out of range')
+
+        return self.values[self.offsets[position]:self.offsets[position + 1]]
+
+
+class MmapPostings():
+    """Map from sorted strings to lists of integers in a memory mapped store. Used like the dicts of
+    postings of the indexes: get, [key], in and iteration over the keys.
+    """
+
+    def __init__(self, keys, offsets, *columns):
+        """
+        :param keys: sorted MmapStrings
+        :param offsets: memoryview of integers, the list of key i is column[offsets[i]:offsets[i + 1]]
+        :param columns: memoryviews of integers. With more than one column, the value of a key is a tuple of
+        the lists of every column
+        """
+        self.keys = keys
+        self.offsets = offsets
+        self.columns = columns
+
+    def get(self, key, default=None):
+        position = self.keys.find(key)
+        if position is None:
+            return default
+
+        start, end = self.offsets[position], self.offsets[position + 1]
+        if len(self.columns) == 1:
+            return self.columns[0][start:end]
+
+        return tuple(column[start:end] for column in self.columns)
+
+    def __getitem__(self, key):
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+
+        return value
+
+    def __contains__(self, key):
+        return self.keys.find(key) is not None
+
+    def __iter__(self):
+        return iter(self.keys)
+
+    def __len__(self):
+        return len(self.keys)
+
+
+class MmapRowIndex():
+    """Unique identifier to row map of one entity type in a memory mapped store. The identifiers are
+    stored as their sorted json text, and looked up with a binary search
+    """
+
+    def __init__(self, keys, rows):
+        """
+        :param keys: MmapStrings of the json text of the unique identifiers, sorted
+        :param rows: memoryview of integers, the row of each identifier
+        """
+        self.keys = keys
+        self.rows = rows
+
+    def get(self, unique_identifier, default=None):
+        try:
+            position = self.keys.find(json.dumps(unique_identifier))
+        except TypeError:
+            # not json serializable, it can not be a unique identifier of the store
+            return default
+
+        return default if position is None else self.rows[position]
+
+    def __contains__(self, unique_identifier):
+        return self.get(unique_identifier) is not None
+
+    def __iter__(self):
+        for key in self.keys:
+            yield json.loads(key)
+
+    def __len__(self):
+        return len(self.keys)
+
+
+class MmapFile():
+    """Memory map of a store file, with the views of its sections
+    """
+
+    def __init__(self, file_path):
+        with open(file_path, 'rb') as file_reader:
+            self.mapped_file = mmap.mmap(file_reader.fileno(), 0, access=mmap.ACCESS_READ)
+        self.file_view = memoryview(self.mapped_file)
+        self.views = [self.file_view]
+
+    def view(self, start, end, type_code=None):
+        """
+        :param start: position in the file
+        :param end: end position in the file
+        :param type_code: array type code to cast the bytes to, None for bytes
+        :return: memoryview
+        """
+        view = self.file_view[start:end]
+        self.views.append(view)
+        if type_code is not None:
+            view = view.cast(type_code)
+            self.views.append(view)
+
+        return view
+
+    def close(self):
+        """Release the views and close the map. Used by DatasetVersion.close_on_release
+        :return: None
+        """
+        for view in reversed(self.views):
+            view.release()
+
+        try:
+            self.mapped_file.close()
+        except BufferError:
+            # slices of the views are still used outside of the released version, the operating system
+            # unmaps the file once they are garbage collected
+            pass
+
+
+class MmapStoreBackend(StorageBackend):
+    """Storage backend attaching to a memory mapped store file
+    """
+    backend_name = "mmap"
+
+    def __init__(self, file_path):
+        """
+        :param file_path: path of a store file built with build_mmap_store
+        """
+        self.file_path = file_path
+
+    def load(self, search_engine, dataset):
+        attach_mmap_store(self.file_path, dataset)
+
+
+def build_mmap_store(search_engine, file_path):
+    """Write the current data of a search engine, with its indexes, to a memory mapped store file.
+    The file is replaced atomically, processes attached to a previous file keep using it until they reload.
+    :param search_engine: loaded ZendeskSearchEngine
+    :param file_path: path of the store file
+    :return: None
+    """
+    dataset = search_engine.dataset
+    dataset.ensure_loaded(dataset.searchable_data_set)
+    sections = []
+    header = {'byteorder': sys.byteorder, 'entities': {}, 'relationship_caches': {}}
+
+    def add_section(data):
+        sections.append(bytes(data))
+        return len(sections) - 1
+
+    def add_rows(rows):
+        return add_section(array(ROW_TYPE_CODE, rows).tobytes())
+
+    def add_strings(strings):
+        data = bytearray()
+        offsets = array(ROW_TYPE_CODE, [0])
+        for string in strings:
+            data += string.encode('utf-8')
+            offsets.append(len(data))
+
+        return {'strings': add_section(data), 'offsets': add_section(offsets.tobytes())}
+
+    def add_postings(postings, column_count=1):
+        """
+        :param postings: {string : list of integers}, or {string : tuple of lists} with more than one column
+        """
+        keys = sorted(postings)
+        offsets = array(ROW_TYPE_CODE, [0])
+        columns = [array(ROW_TYPE_CODE) for _ in range(column_count)]
+        for key in keys:
+            key_columns = postings[key] if column_count > 1 else (postings[key],)
+            for column, key_column in zip(columns, key_columns):
+                column.extend(key_column)
+            offsets.append(len(columns[0]))
+
+        return {'keys': add_strings(keys), 'offsets': add_section(offsets.tobytes()),
+                'columns': [add_section(column.tobytes()) for column in columns]}
+
+    for entity_type, store_meta in dataset.searchable_data_set.items():
+        records = bytearray()
+        row_offsets = array(ROW_TYPE_CODE, [0])
+        field_names = {}
+        for store_object in store_meta.rows:
+            # cold fields are written with their values
+            records += json.dumps(vars(store_object), default=json_default).encode('utf-8')
+            row_offsets.append(len(records))
+            field_names.update(dict.fromkeys(vars(store_object)))
+
+        identifiers = sorted((json.dumps(store_object.unique_identifier), row)
+                             for row, store_object in enumerate(store_meta.rows))
+        entity_sections = {
+            'records': add_section(records),
+            'row_offsets': add_section(row_offsets.tobytes()),
+            'identifiers': {'keys': add_strings(key for key, _ in identifiers),
+                            'rows': add_rows(row for _, row in identifiers)},
+            'numeric_columns': {},
+            'tag_indexes': {},
+        }
+
+        # Every field is indexed, so that searches never build an index by decoding every record
+        for field_name in field_names:
+            numeric_column = dataset.get_derived(
+                ('numeric_column', entity_type, field_name),
+                partial(NumericColumn.build, entity_type=entity_type, field_name=field_name))
+            entity_sections['numeric_columns'][field_name] = {
+                'values': add_section(numeric_column.values.tobytes()),
+                'rows': add_section(numeric_column.rows.tobytes()),
+            } if numeric_column.is_numeric else None
+
+            tag_index = dataset.get_derived(('tag_index', entity_type, field_name),
+                                            partial(TagIndex.build, entity_type=entity_type, field_name=field_name))
+            entity_sections['tag_indexes'][field_name] = add_postings(tag_index.postings) \
+                if tag_index.is_tag_field else None
+
+        header['entities'][entity_type.name] = entity_sections
+
+    for cache_name, link_cache in dataset.relationship_caches.items():
+        header['relationship_caches'][cache_name] = {
+            'offsets': add_rows(link_cache.offsets),
+            'targets': add_rows(link_cache.targets),
+        }
+
+    text_index = dataset.get_derived('text_index', InvertedIndex.build)
+    header['text_index'] = {
+        'entity_ranges': [[first_document, entity_type.name]
+                          for first_document, entity_type in text_index.entity_ranges],
+        'document_lengths': add_rows(text_index.document_lengths),
+        'average_document_length': text_index.average_document_length,
+        'postings': add_postings(text_index.postings, 2),
+    }
+
+    fuzzy_index = dataset.get_derived('fuzzy_index', FuzzyIndex.build)
+    postings_offsets = array(ROW_TYPE_CODE, [0])
+    for token_postings in fuzzy_index.postings:
+        postings_offsets.append(postings_offsets[-1] + len(token_postings))
+    header['fuzzy_index'] = {
+        'entity_ranges': [[first_document, entity_type.name]
+                          for first_document, entity_type in fuzzy_index.entity_ranges],
+        'document_count': fuzzy_index.document_count,
+        'tokens': add_strings(fuzzy_index.tokens),
+        'postings_offsets': add_section(postings_offsets.tobytes()),
+        'postings': add_rows(document for token_postings in fuzzy_index.postings for document in token_postings),
+        'deletions': add_postings(fuzzy_index.deletions),
+    }
+
+    # Positions of the sections, relative to the first section
+    positions = []
+    position = 0
+    for section in sections:
+        positions.append([position, len(section)])
+        position = _align(position + len(section))
+    header['sections'] = positions
+
+    header_bytes = json.dumps(header).encode('utf-8')
+    data_start = _align(len(MMAP_STORE_MAGIC) + struct.calcsize(_HEADER_SIZE_FORMAT) + len(header_bytes))
+
+    temp_file_path = f'{file_path}.tmp{os.getpid()}'
+    with open(temp_file_path, 'wb') as file_writer:
+        file_writer.write(MMAP_STORE_MAGIC)
+        file_writer.write(struct.pack(_HEADER_SIZE_FORMAT, len(header_bytes)))
+        file_writer.write(header_bytes)
+        for section, (section_position, _) in zip(sections, positions):
+            file_writer.write(b'\0' * (data_start + section_position - file_writer.tell()))
+            file_writer.write(section)
+
+    os.replace(temp_file_path, file_path)
+
+
+def attach_mmap_store(file_path, dataset):
+    """Fill an empty DatasetVersion from a memory mapped store file. The map is closed when the version
+    is released
+    :param file_path: path of the store file
+    :param dataset: DatasetVersion with empty SearchEngineEntityMeta for each entity type
+    :return: None
+    """
+    mmap_file = MmapFile(file_path)
+    dataset.close_on_release(mmap_file)
+    mapped_file = mmap_file.mapped_file
+
+    if mapped_file[:len(MMAP_STORE_MAGIC)] != MMAP_STORE_MAGIC:
+        raise ValueError(f'{file_path} is not a search engine store file, or was built by another version')
+
+    header_start = len(MMAP_STORE_MAGIC) + struct.calcsize(_HEADER_SIZE_FORMAT)
+    header_size = struct.unpack_from(_HEADER_SIZE_FORMAT, mapped_file, len(MMAP_STORE_MAGIC))[0]
+    header = json.loads(mapped_file[header_start:header_start + header_size])
+    if header['byteorder'] != sys.byteorder:
+        raise ValueError(f'{file_path} was built on a machine with {header["byteorder"]} endian integers')
+
+    data_start = _align(header_start + header_size)
+
+    def section(index, type_code=ROW_TYPE_CODE):
+        position, size = header['sections'][index]
+        return mmap_file.view(data_start + position, data_start + position + size, type_code)
+
+    def strings(string_sections):
+        return MmapStrings(section(string_sections['strings'], None), section(string_sections['offsets']))
+
+    def postings(postings_sections):
+        return MmapPostings(strings(postings_sections['keys']), section(postings_sections['offsets']),
+                            *(section(column) for column in postings_sections['columns']))
+
+    entity_types = {entity_type.name: entity_type for entity_type in dataset.searchable_data_set}
+    for entity_name, entity_sections in header['entities'].items():
+        entity_type = entity_types[entity_name]
+        store_meta = dataset.searchable_data_set[entity_type]
+        store_meta.rows = MmapRows(section(entity_sections['records'], None), section(entity_sections['row_offsets']),
+                                   store_meta.entity_store_type)
+        store_meta.row_index = MmapRowIndex(strings(entity_sections['identifiers']['keys']),
+                                            section(entity_sections['identifiers']['rows']))
+
+        for field_name, column_sections in entity_sections['numeric_columns'].items():
+            dataset.derived[('numeric_column', entity_type, field_name)] = NumericColumn(
+                section(column_sections['values'], _VALUE_TYPE_CODE), section(column_sections['rows']), True) \
+                if column_sections else NumericColumn(array(_VALUE_TYPE_CODE), array(ROW_TYPE_CODE), False)
+
+        for field_name, tag_sections in entity_sections['tag_indexes'].items():
+            tag_index = TagIndex(len(store_meta.rows), tag_sections is not None)
+            if tag_sections:
+                tag_index.postings = postings(tag_sections)
+                tag_index.tags = tag_index.postings.keys
+            dataset.derived[('tag_index', entity_type, field_name)] = tag_index
+
+        shard_metrics = ShardLoadMetrics(store_meta.entity_store_type.entity_name, file_path)
+        shard_metrics.bytes_read = len(store_meta.rows.buffer)
+        shard_metrics.records_total = shard_metrics.records_parsed = len(store_meta.rows)
+        shard_metrics.done = True
+        dataset.load_report.add_entity(shard_metrics.entity_name).shards.append(shard_metrics)
+
+    for cache_name, cache_sections in header['relationship_caches'].items():
+        dataset.relationship_caches[cache_name] = CsrAdjacency(section(cache_sections['offsets']),
+                                                               section(cache_sections['targets']))
+
+    text_sections = header['text_index']
+    text_index = InvertedIndex()
+    text_index.entity_ranges = [(first_document, entity_types[entity_name])
+                                for first_document, entity_name in text_sections['entity_ranges']]
+    text_index.document_lengths = section(text_sections['document_lengths'])
+    text_index.average_document_length = text_sections['average_document_length']
+    text_index.postings = postings(text_sections['postings'])
+    dataset.derived['text_index'] = text_index
+
+    fuzzy_sections = header['fuzzy_index']
+    fuzzy_index = FuzzyIndex()
+    fuzzy_index.entity_ranges = [(first_document, entity_types[entity_name])
+                                 for first_document, entity_name in fuzzy_sections['entity_ranges']]
+    fuzzy_index.document_count = fuzzy_sections['document_count']
+    fuzzy_index.tokens = strings(fuzzy_sections['tokens'])
+    fuzzy_index.postings = MmapLists(section(fuzzy_sections['postings_offsets']), section(fuzzy_sections['postings']))
+    fuzzy_index.deletions = postings(fuzzy_sections['deletions'])
+    dataset.derived['fuzzy_index'] = fuzzy_index
+
+
+def _align(position):
+    """Round position up to the section alignment
+    :param position: position in the file
+    :return: aligned position
+    """
+    return (position + _ALIGNMENT - 1) // _ALIGNMENT * _ALIGNMENT
+
+
+def main():
+    from search_engine_libs.zendesk_search_engine import ZendeskSearchEngine
+
+    parser = argparse.ArgumentParser(description='Build a memory mapped store shared by search engine processes')
+    parser.add_argument('base_data_folder', help='folder with a sub folder of data files for each entity type')
+    parser.add_argument('store_file_path', help='path of the store file to write')
+    args = parser.parse_args()
+
+    build_mmap_store(ZendeskSearchEngine(args.base_data_folder), args.store_file_path)
+
+
+if __name__ == '__main__':
+    main()
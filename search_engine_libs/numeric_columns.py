@@ -0,0 +1,98 @@
+"""Numeric columns of a DatasetVersion, for searches by a number or a range of numbers.
+
+A numeric column holds the values of one field of one entity type, parsed once into a packed array of
+floats sorted by value, with the row of each value. Searches find the rows whose value may match with
+two binary searches instead of matching every record. The rows found are still checked with is_match,
+so the results are the same as a full scan.
+Columns are built lazily, the first time a field is searched with a number, and belong to the
+DatasetVersion they were built from.
+"""
+import math
+from array import array
+from bisect import bisect_left, bisect_right
+
+from search_engine_libs.adjacency import ROW_TYPE_CODE
+from utils.numeric_match import NUMERIC_ABS_TOLERANCE, NUMERIC_REL_TOLERANCE, NumericRange, is_number
+
+
+class NumericColumn():
+    """Values of one field, sorted.
+        self.values -> array of the numeric values of the field, ascending. NaN values are left out,
+        they never match
+        self.rows -> array of the row of each value
+        self.is_numeric -> False if some records have a value which is neither a number nor None. Those
+        fields are matched by type record per record, the column is then empty and not used
+    """
+
+    def __init__(self, values, rows, is_numeric):
+        self.values = values
+        self.rows = rows
+        self.is_numeric = is_numeric
+
+    @staticmethod
+    def build(dataset, entity_type, field_name):
+        """Builder for DatasetVersion.get_derived
+        :param dataset: DatasetVersion with the data of entity_type loaded
+        :param entity_type: entity type of the records
+        :param field_name: name of the field
+        :return: NumericColumn
+        """
+        entries = []
+        for row, store_object in enumerate(dataset.searchable_data_set[entity_type].rows):
+            # raises AttributeError for fields the entity does not have, like is_match
+            value = getattr(store_object, field_name)
+            if value is None:
+                continue
+
+            if not is_number(value):
+                return NumericColumn(array('d'), array(ROW_TYPE_CODE), False)
+
+            if not math.isnan(value):
+                entries.append((float(value), row))
+
+        entries.sort()
+        return NumericColumn(array('d', (value for value, _ in entries)),
+                             array(ROW_TYPE_CODE, (row for _, row in entries)), True)
+
+    def search(self, search_value):
+        """Rows whose value may match a search value
+        :param search_value: number or NumericRange
+        :return: list of rows in load order. None if the column is not numeric
+        """
+        if not self.is_numeric:
+            return None
+
+        bounds = value_bounds(search_value)
+        if bounds is None:
+            return []
+
+        low, high = bounds
+        start = 0 if low is None else bisect_left(self.values, low)
+        end = len(self.values) if high is None else bisect_right(self.values, high)
+        return sorted(self.rows[start:max(start, end)])
+
+    def __repr__(self):
+        return str(vars(self))
+
+
+def value_bounds(search_value):
+    """Bounds of the values which may match a search value, both included. Values equal to an excluded bound
+    of a range, or within the tolerance of numbers_equal but not equal, are left to is_match. Large integers
+    may round to the float of a bound
+    :param search_value: number or NumericRange
+    :return: (low, high) floats, None for a missing bound. None if no value can match
+    """
+    if isinstance(search_value, NumericRange):
+        return (None if search_value.low is None else float(search_value.low),
+                None if search_value.high is None else float(search_value.high))
+
+    search_value = float(search_value)
+    if math.isnan(search_value):
+        return None
+
+    tolerance = 0.0
+    if math.isfinite(search_value):
+        # twice the relative tolerance, it applies to the larger of the two values
+        tolerance = max(2 * NUMERIC_REL_TOLERANCE * abs(search_value), NUMERIC_ABS_TOLERANCE)
+
+    return search_value - tolerance, search_value + tolerance
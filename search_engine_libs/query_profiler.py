@@ -0,0 +1,185 @@
+"""Opt-in instrumentation for ZendeskSearchEngine.
+
+A QueryProfile records where the time of a single search went (per phase) and how much
+work it did (per counter). A QueryProfiler aggregates profiles of many searches into
+latency histograms and counter totals which can be dumped from the CLI.
+Profiling is off by default, ZendeskSearchEngine only creates profiles when a profiler is set.
+"""
+import math
+import threading
+import time
+from collections import OrderedDict, deque
+
+# Phases of a search, in the order in which they run
+#   scan   -> look up by unique identifier or scan the data store
+#   match  -> time spent in Entity.is_match while scanning (part of scan)
+#   join   -> resolving foreign keys of the hits (like joins in SQL)
+#   expand -> getting additional data from linked data sets
+#   format -> building the printable result (includes join and expand)
+QUERY_PHASES = ('scan', 'match', 'join', 'expand', 'format')
+
+# Counters of the work done by a search
+QUERY_COUNTERS = ('records_scanned', 'predicates_evaluated', 'joins_performed', 'link_lookups',
+                  'expansion_cache_hits', 'rows_formatted', 'results')
+
+
+class LatencyHistogram():
+    """Histogram of durations with power of 2 buckets in microseconds.
+    Bucket i holds durations d with 2**(i-1) <= d < 2**i microseconds, bucket 0 holds d < 1 microsecond.
+    """
+
+    def __init__(self):
+        self.buckets = {}
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def record(self, seconds):
+        """Add a duration to the histogram
+        :param seconds: duration in seconds
+        :return: None
+        """
+        micro_seconds = seconds * 1e6
+        bucket = 0 if micro_seconds < 1 else int(math.log2(micro_seconds)) + 1
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+        self.count += 1
+        self.total += seconds
+        self.min = seconds if self.min is None else min(self.min, seconds)
+        self.max = seconds if self.max is None else max(self.max, seconds)
+
+    def percentile(self, pct):
+        """Approximate percentile, returns the upper bound of the bucket holding it.
+        :param pct: percentile between 0 and 100
+        :return: duration in seconds, None if the histogram is empty
+        """
+        if not self.count:
+            return None
+
+        rank = max(1, int(math.ceil(self.count * pct / 100.0)))
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                return min(2 ** bucket / 1e6, self.max)
+
+        return self.max
+
+    def summary(self):
+        """One line summary of the histogram
+        :return: string
+        """
+        if not self.count:
+            return 'no samples'
+
+        return (f'count: {self.count} mean: {format_seconds(self.total / self.count)} '
+                f'p50: {format_seconds(self.percentile(50))} p95: {format_seconds(self.percentile(95))} '
+                f'max: {format_seconds(self.max)}')
+
+
+class QueryProfile():
+    """Timings and counters of one search. Also used as the result of ZendeskSearchEngine.explain
+    """
+
+    def __init__(self, search_field_name, search_field_value, entity_type):
+        self.search_field_name = search_field_name
+        self.search_field_value = search_field_value
+        self.entity_type = entity_type  # None for searches across all entity types
+        self.access_path = None
+        self.total_time = 0.0
+        self.phase_timings = OrderedDict((phase, 0.0) for phase in QUERY_PHASES)
+        self.counters = OrderedDict((counter, 0) for counter in QUERY_COUNTERS)
+
+    def add_time(self, phase, seconds):
+        """Add time spent in a phase
+        :param phase: one of QUERY_PHASES
+        :param seconds: duration in seconds
+        :return: None
+        """
+        self.phase_timings[phase] += seconds
+
+    def count(self, counter, amount=1):
+        """Increment a counter
+        :param counter: one of QUERY_COUNTERS
+        :param amount: increment
+        :return: None
+        """
+        self.counters[counter] += amount
+
+    def as_rows(self):
+        """Rows of [Field, Value], same format as the rows of a search result
+        :return: list of lists
+        """
+        entity_name = self.entity_type.name if self.entity_type is not None else 'ALL'
+        rows = [['query', f'{entity_name} {self.search_field_name} = {self.search_field_value!r}'],
+                ['access_path', str(self.access_path)],
+                ['total_time', format_seconds(self.total_time)]]
+        rows.extend([f'{phase}_time', format_seconds(seconds)] for phase, seconds in self.phase_timings.items())
+        rows.extend([counter, str(value)] for counter, value in self.counters.items())
+        return rows
+
+    def __repr__(self):
+        return str(vars(self))
+
+
+class QueryProfiler():
+    """Aggregates QueryProfiles. Keeps latency histograms per phase, counter totals and
+    the most recent profiles. Profiles can be recorded from many threads.
+    """
+
+    def __init__(self, recent_profiles_size=20):
+        self._lock = threading.Lock()
+        self.query_count = 0
+        self.histograms = OrderedDict((phase, LatencyHistogram()) for phase in ('total',) + QUERY_PHASES)
+        self.counter_totals = OrderedDict((counter, 0) for counter in QUERY_COUNTERS)
+        self.recent_profiles = deque(maxlen=recent_profiles_size)
+
+    def record(self, profile):
+        """Add a finished profile to the aggregates
+        :param profile: QueryProfile
+        :return: None
+        """
+        with self._lock:
+            self.query_count += 1
+            self.histograms['total'].record(profile.total_time)
+            for phase, seconds in profile.phase_timings.items():
+                self.histograms[phase].record(seconds)
+            for counter, value in profile.counters.items():
+                self.counter_totals[counter] += value
+            self.recent_profiles.append(profile)
+
+    def reset(self):
+        """Drop all recorded data
+        :return: None
+        """
+        self.__init__(self.recent_profiles.maxlen)
+
+    def as_rows(self):
+        """Rows of [Field, Value] summarising all recorded profiles
+        :return: list of lists
+        """
+        rows = [['queries', str(self.query_count)]]
+        rows.extend([f'{phase}_time', histogram.summary()] for phase, histogram in self.histograms.items())
+        rows.extend([counter, str(value)] for counter, value in self.counter_totals.items())
+        return rows
+
+
+def format_seconds(seconds):
+    """Format a duration for printing
+    :param seconds: duration in seconds
+    :return: string
+    """
+    if seconds is None:
+        return 'None'
+    if seconds < 1e-3:
+        return f'{seconds * 1e6:.1f}us'
+    if seconds < 1:
+        return f'{seconds * 1e3:.3f}ms'
+    return f'{seconds:.3f}s'
+
+
+def now():
+    """Clock used for all profiling
+    :return: seconds
+    """
+    return time.perf_counter()
@@ -0,0 +1,142 @@
+"""Post load stage which resolves the foreign keys of a DatasetVersion and builds its relationship caches.
+
+Once every data set is loaded, each foreign key (Entity.get_foreign_entity_links) is resolved in one pass
+over the rows of its entity type into an array of the rows it refers to, -1 when it refers to none.
+Values which do not refer to any loaded record are orphaned references, collected in an IntegrityReport.
+The relationship caches are packed from the resolved arrays, and searches read the row a foreign key
+refers to from them, so they never look up missing records.
+"""
+from array import array
+from collections import OrderedDict
+
+from search_engine_libs.adjacency import ROW_TYPE_CODE, CsrAdjacency
+
+# Number of orphaned references kept as examples per foreign key
+ORPHAN_SAMPLE_SIZE = 10
+
+
+class ForeignKeyIntegrity():
+    """Orphaned references of one foreign key.
+        self.entity_name -> name of the entity holding the foreign key. Ticket
+        self.field_name -> name of the foreign key. submitter_id
+        self.target_entity_name -> name of the entity the foreign key refers to. User
+        self.references -> number of records with a value in the foreign key
+        self.orphans -> number of those values which do not refer to a loaded record
+        self.orphan_samples -> first (unique identifier of the record, missing value) pairs
+    """
+
+    def __init__(self, entity_name, field_name, target_entity_name):
+        self.entity_name = entity_name
+        self.field_name = field_name
+        self.target_entity_name = target_entity_name
+        self.references = 0
+        self.orphans = 0
+        self.orphan_samples = []
+
+    def add_orphan(self, unique_identifier, missing_value):
+        self.orphans += 1
+        if len(self.orphan_samples) < ORPHAN_SAMPLE_SIZE:
+            self.orphan_samples.append((unique_identifier, missing_value))
+
+    def __repr__(self):
+        return str(vars(self))
+
+
+class IntegrityReport():
+    """Referential integrity of one DatasetVersion
+        self.foreign_keys -> {(entity type, field name) : ForeignKeyIntegrity}
+    """
+
+    def __init__(self):
+        self.foreign_keys = OrderedDict()
+
+    @property
+    def orphans(self):
+        """Number of orphaned references across all foreign keys
+        """
+        return sum(foreign_key.orphans for foreign_key in self.foreign_keys.values())
+
+    def as_rows(self):
+        """Rows of [Field, Value], same format as the rows of a search result
+        :return: list of lists
+        """
+        rows = [['orphaned_references', str(self.orphans)]]
+        for foreign_key in self.foreign_keys.values():
+            field = f'{foreign_key.entity_name.lower()}_{foreign_key.field_name}'
+            rows.append([field, f'{foreign_key.orphans} of {foreign_key.references} references to '
+                                f'{foreign_key.target_entity_name} not found'])
+            for unique_identifier, missing_value in foreign_key.orphan_samples:
+                rows.append(['', f'{foreign_key.entity_name} {unique_identifier} -> {missing_value}'])
+
+        return rows
+
+    def __repr__(self):
+        return str(vars(self))
+
+
+def link_dataset(dataset, relationship_caches, loaded_entity_types):
+    """Resolve the foreign keys of a DatasetVersion into dataset.foreign_rows, build its relationship
+    caches and add the orphaned references to dataset.integrity_report.
+    Only foreign keys between loaded entity types which are not linked yet are linked, so for versions
+    loaded lazily it runs again each time entity types are loaded.
+    :param dataset: DatasetVersion with its data in memory
+    :param relationship_caches: {cache name : (entity type holding the foreign key, foreign key,
+    entity type it refers to)}, from the entity registry
+    :param loaded_entity_types: entity types whose data is loaded
+    :return: None
+    """
+    if dataset.integrity_report is None:
+        dataset.integrity_report = IntegrityReport()
+
+    for entity_type, store_meta in dataset.searchable_data_set.items():
+        if entity_type not in loaded_entity_types:
+            continue
+
+        for field_name, target_entity_type in store_meta.entity_store_type.get_foreign_entity_links().items():
+            if target_entity_type not in loaded_entity_types or (entity_type, field_name) in dataset.foreign_rows:
+                continue
+
+            target_store_meta = dataset.searchable_data_set[target_entity_type]
+            foreign_key = dataset.integrity_report.foreign_keys[(entity_type, field_name)] = ForeignKeyIntegrity(
+                store_meta.entity_store_type.entity_name, field_name, target_store_meta.entity_store_type.entity_name)
+
+            dataset.foreign_rows[(entity_type, field_name)] = _resolve_foreign_key(
+                store_meta.rows, field_name, target_store_meta.row_index, foreign_key)
+
+    for cache_name, (source_entity_type, field_name, key_entity_type) in relationship_caches.items():
+        if cache_name in dataset.relationship_caches or (source_entity_type, field_name) not in dataset.foreign_rows:
+            continue
+
+        dataset.relationship_caches[cache_name] = CsrAdjacency.from_key_rows(
+            dataset.foreign_rows[(source_entity_type, field_name)],
+            len(dataset.searchable_data_set[key_entity_type].rows))
+
+
+def _resolve_foreign_key(rows, field_name, target_row_index, foreign_key):
+    """Rows referred to by one foreign key of every record
+    :param rows: records holding the foreign key
+    :param field_name: name of the foreign key
+    :param target_row_index: {unique identifier : row} of the data set the foreign key refers to
+    :param foreign_key: ForeignKeyIntegrity collecting the orphaned references
+    :return: array with the row referred to by each record, -1 if none
+    """
+    key_rows = array(ROW_TYPE_CODE, [-1]) * len(rows)
+
+    for row, store_object in enumerate(rows):
+        value = getattr(store_object, field_name)
+        if value is None:
+            continue
+
+        foreign_key.references += 1
+        try:
+            key_row = target_row_index.get(value)
+        except TypeError:
+            # values which can not be hashed never match a unique identifier
+            key_row = None
+
+        if key_row is None:
+            foreign_key.add_orphan(store_object.unique_identifier, value)
+        else:
+            key_rows[row] = key_row
+
+    return key_rows
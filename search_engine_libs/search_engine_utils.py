@@ -3,11 +3,36 @@
 from entity_libs.organization import Organization
 from entity_libs.ticket import Ticket
 from entity_libs.user import User
+from search_engine_libs.entity_registry import ENTITY_REGISTRY, ReverseLink
 from utils.constants import EntityTypes
 
+
+def register_builtin_entity_types(entity_registry):
+    """Register Organizations, Users and Tickets, in load order
+    :param entity_registry: EntityRegistry
+    :return: None
+    """
+    entity_registry.register(EntityTypes.ORGANIZATION, Organization, 'organizations_data', 'organization*.json', [
+        ReverseLink('organization_to_users', EntityTypes.USER, 'organization_id', 'employee_{}'),
+        ReverseLink('organization_to_tickets', EntityTypes.TICKET, 'organization_id', 'ticket_{}'),
+    ])
+    entity_registry.register(EntityTypes.USER, User, 'users_data', 'users*.json', [
+        ReverseLink('user_to_ticket_submitter', EntityTypes.TICKET, 'submitter_id', 'ticket_{}_as_submitter'),
+        ReverseLink('user_to_ticket_assignee', EntityTypes.TICKET, 'assignee_id', 'ticket_{}_as_assignee'),
+    ])
+    entity_registry.register(EntityTypes.TICKET, Ticket, 'tickets_data', 'ticket*.json')
+
+
+register_builtin_entity_types(ENTITY_REGISTRY)
+
 #Conversion from Entity type enum to Class
-ENTITY_TYPE_TO_STORE_TYPE = {
-    EntityTypes.USER: User,
-    EntityTypes.TICKET: Ticket,
-    EntityTypes.ORGANIZATION: Organization
+ENTITY_TYPE_TO_STORE_TYPE = ENTITY_REGISTRY.store_types
+
+#Bulky text fields left in the data files with --cold-fields. {Entity type : field names}
+COLD_TEXT_FIELDS = {
+    EntityTypes.TICKET: ('description',),
+    EntityTypes.USER: ('signature',),
 }
+
+#Relationship caches. {cache name : (Entity type holding the foreign key, foreign key, Entity type it refers to)}
+RELATIONSHIP_CACHES = ENTITY_REGISTRY.relationship_caches
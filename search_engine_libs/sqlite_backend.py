@@ -0,0 +1,543 @@
+"""SQLite storage backend, for data sets which do not fit in memory.
+To use as below,
+1. search_engine = ZendeskSearchEngine('data_files', storage_backend=SqliteBackend('zendesk.sqlite'))
+2. search_engine.do_search('tags', 'Ohio', EntityTypes.TICKET)
+
+Loading bulk inserts the data files into one table per entity type, one transaction per file, and
+creates indexes on the unique identifier and the foreign keys once the records are in. Each table has
+a FTS5 table with the text of the string and list fields, using the trigram tokenizer so that it can
+answer the case insensitive substring searches of CUSTOM_SEARCH_FUNCTIONS. Numeric fields are indexed,
+for searches by a number or a range of numbers, and the tags of the list fields of strings are kept in
+lower case in a tags table, for search_tags.
+Only the unique identifier to row map and the relationship caches need to look records up, and they
+query the indexes. Searches use SQL to narrow a search down to the rows which may match, and only those
+are decoded and checked with Entity.is_match, so results are the same as with the in memory store.
+Searches which SQL can not narrow down (non ascii text, fields of mixed types) decode every row, one at
+a time, without building an index in memory. The text and fuzzy indexes of search_text and search_fuzzy
+are still built in memory from every record.
+
+The connection is closed when the DatasetVersion using it is released.
+
+Reloading builds a new database file next to the previous one and replaces it once it is complete,
+searches running on the previous version keep reading the previous file.
+"""
+import json
+import os
+import sqlite3
+import threading
+
+from search_engine_libs.load_metrics import ShardLoadMetrics
+from search_engine_libs.numeric_columns import value_bounds
+from search_engine_libs.query_profiler import now
+from search_engine_libs.storage_backends import StorageBackend
+from search_engine_libs.tag_index import PREFIX_WILDCARD
+from utils.file_processors import get_file_name_list, parse_json_from_file
+from utils.numeric_match import is_numeric_search
+
+# Number of rows fetched at a time when iterating over a table
+FETCH_BATCH_SIZE = 1000
+
+# Types of values for which a search value can be compared in SQL
+_SCALAR_TYPES = frozenset(['str', 'int', 'float', 'bool', 'NoneType'])
+# Types of the values of fields searched by a number or a range of numbers in SQL
+_NUMERIC_TYPES = frozenset(['int', 'float', 'NoneType'])
+
+
+class SqliteDatabase():
+    """Connection to the database, shared by the threads searching one DatasetVersion.
+    """
+
+    def __init__(self, database_path):
+        self.database_path = database_path
+        self.connection = sqlite3.connect(f'file:{database_path}?mode=ro', uri=True, check_same_thread=False)
+        self._lock = threading.Lock()
+
+    def fetch_all(self, sql, params=()):
+        with self._lock:
+            return self.connection.execute(sql, params).fetchall()
+
+    def fetch_rows(self, sql, params=()):
+        """Rows of the table, from a query returning the rowid only
+        :return: list of rows
+        """
+        return [rowid - 1 for rowid, in self.fetch_all(sql, params)]
+
+    def iterate(self, sql, params=()):
+        """Iterate over the results of a query, holding the connection only while fetching a batch
+        """
+        last_rowid = 0
+        while True:
+            batch = self.fetch_all(f'{sql} AND rowid > ? ORDER BY rowid LIMIT {FETCH_BATCH_SIZE}',
+                                   tuple(params) + (last_rowid,))
+            if not batch:
+                return
+
+            yield from batch
+            last_rowid = batch[-1][0]
+
+    def close(self):
+        """Close the connection. Used by DatasetVersion.close_on_release
+        :return: None
+        """
+        with self._lock:
+            self.connection.close()
+
+
+class SqliteRows():
+    """Rows of one entity type. Used like the list SearchEngineEntityMeta.rows, the entity object
+    of a row is read from the database each time it is accessed.
+    """
+
+    def __init__(self, database, table_name, entity_store_type, row_count):
+        self.database = database
+        self.table_name = table_name
+        self.entity_store_type = entity_store_type
+        self.row_count = row_count
+
+    def __len__(self):
+        return self.row_count
+
+    def __getitem__(self, row):
+        records = self.database.fetch_all(f'SELECT _record FROM "{self.table_name}" WHERE rowid = ?', (row + 1,))
+        if not records:
+            raise IndexError(f'row {row} out of range')
+
+        return self.entity_store_type(json.loads(records[0][0]))
+
+    def __iter__(self):
+        for _, record in self.database.iterate(f'SELECT rowid, _record FROM "{self.table_name}" WHERE 1'):
+            yield self.entity_store_type(json.loads(record))
+
+
+class SqliteRowIndex():
+    """Unique identifier to row map, using the unique index of the table
+    """
+
+    def __init__(self, database, table_name, unique_identifier_field_name):
+        self.database = database
+        self.sql = f'SELECT rowid FROM "{table_name}" WHERE "{unique_identifier_field_name}" = ?'
+
+    def get(self, unique_identifier, default=None):
+        # like a dict, values which can not be a unique identifier, like a NumericRange, are not found
+        if not isinstance(unique_identifier, (str, int, float)):
+            return default
+
+        rows = self.database.fetch_rows(self.sql, (_to_column_value(unique_identifier),))
+        return rows[0] if rows else default
+
+
+class SqliteLinks():
+    """Relationship cache, using the index on the foreign key
+    """
+
+    def __init__(self, database, source_table_name, foreign_key, key_table_name, key_field_name):
+        self.database = database
+        self.sql = (f'SELECT s.rowid FROM "{source_table_name}" s JOIN "{key_table_name}" k '
+                    f'ON s."{foreign_key}" = k."{key_field_name}" WHERE k.rowid = ? ORDER BY s.rowid')
+
+    def get(self, row):
+        return self.database.fetch_rows(self.sql, (row + 1,))
+
+
+class SqliteSearch():
+    """search_candidates of one entity type. Gives the rows which may match a search, None if SQL
+    can not narrow the search down.
+    """
+
+    def __init__(self, database, table_name, field_types, has_fts):
+        """
+        :param field_types: {field name : set of the names of the python types of its values}
+        :param has_fts: True if the FTS5 table with the trigram tokenizer exists
+        """
+        self.database = database
+        self.table_name = table_name
+        self.field_types = field_types
+        self.has_fts = has_fts
+
+    def __call__(self, search_field_name, search_field_value):
+        field_types = self.field_types.get(search_field_name)
+        if field_types is None:
+            return None
+
+        column = f'"{search_field_name}"'
+
+        if isinstance(search_field_value, str):
+            if not search_field_value:
+                # only missing values match an empty string
+                if field_types <= _SCALAR_TYPES:
+                    return self.database.fetch_rows(
+                        f'SELECT rowid FROM "{self.table_name}" WHERE {column} IS NULL ORDER BY rowid')
+                return None
+
+            if not search_field_value.isascii() or not field_types <= _SCALAR_TYPES | {'list'}:
+                return None
+
+            if self.has_fts and len(search_field_value) >= 3:
+                phrase = search_field_value.replace('"', '""')
+                return self.database.fetch_rows(
+                    f'SELECT rowid FROM "{self.table_name}_fts" WHERE "{self.table_name}_fts" MATCH ? ORDER BY rowid',
+                    (f'{column} : "{phrase}"',))
+
+            return self.database.fetch_rows(
+                f'SELECT rowid FROM "{self.table_name}_fts" WHERE instr(lower({column}), ?) > 0 ORDER BY rowid',
+                (search_field_value.lower(),))
+
+        if is_numeric_search(search_field_value):
+            # 1 == True in python, so numbers are only compared in SQL when the field holds no booleans
+            if not field_types <= _NUMERIC_TYPES:
+                return None
+
+            bounds = value_bounds(search_field_value)
+            if bounds is None:
+                return []
+
+            conditions = [f'{column} IS NOT NULL']
+            params = []
+            for operator, bound in zip(('>=', '<='), bounds):
+                if bound is not None:
+                    conditions.append(f'{column} {operator} ?')
+                    params.append(bound)
+
+            return self.database.fetch_rows(
+                f'SELECT rowid FROM "{self.table_name}" WHERE {" AND ".join(conditions)} ORDER BY rowid', params)
+
+        if isinstance(search_field_value, bool) and field_types <= {'bool', 'NoneType'}:
+            return self.database.fetch_rows(
+                f'SELECT rowid FROM "{self.table_name}" WHERE {column} = ? ORDER BY rowid',
+                (int(search_field_value),))
+
+        return None
+
+
+class SqliteTagIndex():
+    """Tag index of one list field, using the tags table. Used like TagIndex by search_tags
+    """
+
+    def __init__(self, database, table_name, field_name, row_count, is_tag_field):
+        """
+        :param is_tag_field: True if every value of the field is a list of strings or None
+        """
+        self.database = database
+        self.table_name = table_name
+        self.field_name = field_name
+        self.row_count = row_count
+        self.is_tag_field = is_tag_field
+
+    def rows_containing(self, fragment):
+        """Same as TagIndex.rows_containing
+        """
+        if not self.is_tag_field:
+            return None
+
+        return self.database.fetch_rows(
+            f'SELECT DISTINCT row + 1 FROM "{self.table_name}_tags" WHERE field_name = ? AND instr(tag, ?) > 0 '
+            f'ORDER BY row', (self.field_name, fragment.lower()))
+
+    def search(self, all_of=(), any_of=(), none_of=(), profile=None):
+        """Same as TagIndex.search, with the set algebra done in SQL
+        """
+        if not self.is_tag_field:
+            return None
+
+        queries = [self._term_query(term) for term in all_of]
+        if any_of:
+            queries.append(self._union_query(any_of))
+
+        if queries:
+            sql = ' INTERSECT '.join(query_sql for query_sql, _ in queries)
+            params = [param for _, query_params in queries for param in query_params]
+        else:
+            sql = f'SELECT rowid - 1 AS row FROM "{self.table_name}"'
+            params = []
+
+        if none_of:
+            excluded_sql, excluded_params = self._union_query(none_of)
+            sql = f'SELECT * FROM ({sql}) EXCEPT {excluded_sql}'
+            params += excluded_params
+
+        # fetch_rows takes rowids, which are rows + 1
+        rows = self.database.fetch_rows(f'SELECT row + 1 FROM ({sql}) ORDER BY row', params)
+        if profile is not None:
+            profile.count('records_scanned', len(rows))
+
+        return rows
+
+    def _term_query(self, term):
+        """Query of the rows which have a tag matched by a term, see PREFIX_WILDCARD
+        :return: (sql, params)
+        """
+        term = term.lower()
+        sql = f'SELECT row FROM "{self.table_name}_tags" WHERE field_name = ? AND '
+        if not term.endswith(PREFIX_WILDCARD):
+            return f'{sql}tag = ?', [self.field_name, term]
+
+        prefix = term[:-len(PREFIX_WILDCARD)]
+        if not prefix:
+            return f'{sql}1', [self.field_name]
+
+        # tags are compared as utf-8 bytes, in the same order as python strings
+        return (f'{sql}tag >= ? AND tag < ?',
+                [self.field_name, prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)])
+
+    def _union_query(self, terms):
+        """Query of the rows which have a tag matched by any of the terms
+        :return: (sql, params)
+        """
+        queries = [self._term_query(term) for term in terms]
+        return (f'SELECT row FROM ({" UNION ".join(query_sql for query_sql, _ in queries)})',
+                [param for _, query_params in queries for param in query_params])
+
+
+class SqliteBackend(StorageBackend):
+    """Storage backend keeping the data in an SQLite database file
+    """
+    backend_name = "sqlite"
+
+    def __init__(self, database_path, rebuild=True):
+        """
+        :param database_path: path of the database file
+        :param rebuild: if True, every load rebuilds the database from the data files. If False, the engine
+        attaches to a database built before, for example by another process
+        """
+        self.database_path = database_path
+        self.rebuild = rebuild
+
+    def load(self, search_engine, dataset):
+        if self.rebuild:
+            temp_database_path = f'{self.database_path}.tmp{os.getpid()}'
+            if os.path.exists(temp_database_path):
+                os.remove(temp_database_path)
+
+            self._build_database(search_engine, dataset, temp_database_path)
+            os.replace(temp_database_path, self.database_path)
+
+        database = SqliteDatabase(self.database_path)
+        dataset.close_on_release(database)
+        self._attach_database(dataset, database, search_engine.entity_registry.relationship_caches)
+
+    @staticmethod
+    def _build_database(search_engine, dataset, database_path):
+        """Load the data files into a new database
+        :param search_engine: ZendeskSearchEngine, for the data folder and how to handle duplicates
+        :param dataset: DatasetVersion being loaded. Metrics of each file are recorded in its load report
+        :param database_path: path of the database file to create
+        :return: None
+        """
+        connection = sqlite3.connect(database_path)
+        try:
+            connection.execute('CREATE TABLE _fields (table_name, field_name, position, field_types, is_tag_field)')
+            has_fts = _create_fts_supported(connection)
+
+            for registration in search_engine.entity_registry:
+                store_meta = dataset.searchable_data_set[registration.entity_type]
+                _load_table(connection, search_engine, dataset, store_meta,
+                            os.path.join(search_engine.base_data_folder, registration.data_folder), has_fts)
+
+            # Indexes on foreign keys are faster to create once all records are in
+            relationship_caches = search_engine.entity_registry.relationship_caches
+            for source_entity_type, foreign_key, _ in set(relationship_caches.values()):
+                table_name = _table_name(dataset.searchable_data_set[source_entity_type])
+                connection.execute(f'CREATE INDEX IF NOT EXISTS "{table_name}_{foreign_key}" '
+                                   f'ON "{table_name}" ("{foreign_key}")')
+            connection.commit()
+        finally:
+            connection.close()
+
+    @staticmethod
+    def _attach_database(dataset, database, relationship_caches):
+        """Fill the DatasetVersion with objects reading from the database
+        :param relationship_caches: {cache name : (entity type holding the foreign key, foreign key,
+        entity type it refers to)}, from the entity registry
+        :return: None
+        """
+        # The text tables are FTS5 tables only if the SQLite which built the database has the trigram
+        # tokenizer. Otherwise they are plain tables, searched with instr
+        fts_table_names = {name for name, sql in database.fetch_all(
+            "SELECT name, sql FROM sqlite_master WHERE type = 'table'") if 'using fts5' in (sql or '').lower()}
+        fields = {}
+        tag_fields = {}
+        for table_name, field_name, _, field_types, is_tag_field in database.fetch_all(
+                'SELECT * FROM _fields ORDER BY table_name, position'):
+            fields.setdefault(table_name, {})[field_name] = set(json.loads(field_types))
+            tag_fields.setdefault(table_name, {})[field_name] = bool(is_tag_field)
+
+        for entity_type, store_meta in dataset.searchable_data_set.items():
+            table_name = _table_name(store_meta)
+            row_count = database.fetch_all(f'SELECT count(*) FROM "{table_name}"')[0][0]
+
+            store_meta.rows = SqliteRows(database, table_name, store_meta.entity_store_type, row_count)
+            store_meta.row_index = SqliteRowIndex(database, table_name,
+                                                  store_meta.entity_store_type.unique_identifier_field_name())
+            store_meta.search_candidates = SqliteSearch(database, table_name, fields.get(table_name, {}),
+                                                        f'{table_name}_fts' in fts_table_names)
+
+            # search_tags uses the tags table instead of a tag index built from every record
+            for field_name, is_tag_field in tag_fields.get(table_name, {}).items():
+                dataset.derived[('tag_index', entity_type, field_name)] = SqliteTagIndex(
+                    database, table_name, field_name, row_count, is_tag_field)
+
+        for cache_name, (source_entity_type, foreign_key, key_entity_type) in relationship_caches.items():
+            key_store_meta = dataset.searchable_data_set[key_entity_type]
+            dataset.relationship_caches[cache_name] = SqliteLinks(
+                database, _table_name(dataset.searchable_data_set[source_entity_type]), foreign_key,
+                _table_name(key_store_meta), key_store_meta.entity_store_type.unique_identifier_field_name())
+
+
+def _load_table(connection, search_engine, dataset, store_meta, folder_path, has_fts):
+    """Bulk insert the data files of one entity type, one transaction per file
+    :return: None
+    """
+    table_name = _table_name(store_meta)
+    entity_name = store_meta.entity_store_type.entity_name
+    entity_metrics = dataset.load_report.add_entity(entity_name)
+    unique_identifier_field_name = store_meta.entity_store_type.unique_identifier_field_name()
+
+    field_names = None
+    field_types = None
+    # {field name : False once a value which is neither a list of strings nor None is seen}
+    tag_fields = None
+    insert_sql = insert_fts_sql = None
+    row_count = 0
+
+    for f in get_file_name_list(store_meta.file_pattern, folder_path):
+        shard_metrics = ShardLoadMetrics(entity_name, f)
+        entity_metrics.shards.append(shard_metrics)
+
+        start = now()
+        source_records = parse_json_from_file(f)
+        shard_metrics.parse_time = now() - start
+        shard_metrics.bytes_read = os.path.getsize(f)
+        shard_metrics.records_total = len(source_records)
+
+        with connection:  # one transaction per file
+            for o_json in source_records:
+                start = now()
+                store_object = store_meta.entity_store_type(o_json)
+                store_start = now()
+                shard_metrics.construction_time += store_start - start
+                shard_metrics.records_parsed += 1
+
+                record = vars(store_object)
+                if field_names is None:
+                    # All objects of an entity type have the same attributes
+                    field_names = list(record)
+                    field_types = {field_name: set() for field_name in field_names}
+                    tag_fields = dict.fromkeys(field_names, True)
+                    insert_sql, insert_fts_sql = _create_table(connection, table_name, field_names,
+                                                               unique_identifier_field_name, has_fts)
+
+                for field_name, value in record.items():
+                    field_types[field_name].add(_type_name(value))
+                    if value is not None and not (isinstance(value, list) and
+                                                  all(isinstance(tag, str) for tag in value)):
+                        tag_fields[field_name] = False
+
+                try:
+                    connection.execute(insert_sql, [row_count + 1, json.dumps(record)] +
+                                       [_to_column_value(value) for value in record.values()])
+                except sqlite3.IntegrityError:
+                    shard_metrics.duplicates_rejected += 1
+                    if search_engine.skip_duplicates:
+                        continue
+
+                    raise KeyError(f'Found 2 records of type {entity_name} with same unique key '
+                                   f'{store_object.unique_identifier}')
+
+                connection.execute(insert_fts_sql, [row_count + 1] + [_to_text(value) for value in record.values()])
+                connection.executemany(
+                    f'INSERT INTO "{table_name}_tags" VALUES (?, ?, ?)',
+                    [(field_name, tag, row_count) for field_name, value in record.items() if isinstance(value, list)
+                     for tag in set(item.lower() for item in value if isinstance(item, str))])
+                row_count += 1
+                shard_metrics.store_time += now() - store_start
+
+        shard_metrics.done = True
+        if search_engine.progress_callback:
+            search_engine.progress_callback(shard_metrics)
+
+    if field_names is None:
+        return
+
+    with connection:
+        connection.executemany('INSERT INTO _fields VALUES (?, ?, ?, ?, ?)',
+                               [(table_name, field_name, position, json.dumps(sorted(field_types[field_name])),
+                                 tag_fields[field_name])
+                                for position, field_name in enumerate(field_names)])
+
+        # Only the tags of fields holding lists of strings alone are searched
+        connection.executemany(f'DELETE FROM "{table_name}_tags" WHERE field_name = ?',
+                               [(field_name,) for field_name, is_tag_field in tag_fields.items() if not is_tag_field])
+        connection.execute(f'CREATE INDEX "{table_name}_tags_tag" ON "{table_name}_tags" (field_name, tag, row)')
+
+        # Numeric fields are searched by ranges of values
+        for field_name in field_names:
+            if field_types[field_name] <= _NUMERIC_TYPES and field_types[field_name] != {'NoneType'}:
+                connection.execute(f'CREATE INDEX IF NOT EXISTS "{table_name}_{field_name}" '
+                                   f'ON "{table_name}" ("{field_name}")')
+
+
+def _create_table(connection, table_name, field_names, unique_identifier_field_name, has_fts):
+    """Create the table of an entity type, and its FTS5 table if available (a plain table otherwise)
+    :return: insert statements for the table and the text table
+    """
+    columns = ', '.join(f'"{field_name}"' for field_name in field_names)
+    connection.execute(f'CREATE TABLE "{table_name}" (_record, {columns})')
+    connection.execute(f'CREATE UNIQUE INDEX "{table_name}_{unique_identifier_field_name}" '
+                       f'ON "{table_name}" ("{unique_identifier_field_name}")')
+    connection.execute(f'CREATE TABLE "{table_name}_tags" (field_name, tag, row)')
+    if has_fts:
+        connection.execute(f'CREATE VIRTUAL TABLE "{table_name}_fts" USING fts5({columns}, tokenize="trigram")')
+    else:
+        connection.execute(f'CREATE TABLE "{table_name}_fts" ({columns})')
+
+    placeholders = ', '.join('?' for _ in field_names)
+    return (f'INSERT INTO "{table_name}" (rowid, _record, {columns}) VALUES (?, ?, {placeholders})',
+            f'INSERT INTO "{table_name}_fts" (rowid, {columns}) VALUES (?, {placeholders})')
+
+
+def _create_fts_supported(connection):
+    """Check if this SQLite has FTS5 with the trigram tokenizer (SQLite 3.34 and later)
+    :return: True if supported
+    """
+    try:
+        connection.execute('CREATE VIRTUAL TABLE temp._fts_check USING fts5(text, tokenize="trigram")')
+        connection.execute('DROP TABLE temp._fts_check')
+        return True
+    except sqlite3.OperationalError:
+        return False
+
+
+def _table_name(store_meta):
+    return f'{store_meta.entity_store_type.entity_name.lower()}s'
+
+
+def _type_name(value):
+    """Name of the type of a value, as used by CUSTOM_SEARCH_FUNCTIONS. Lists holding other lists
+    are reported as 'nested_list', they can not be searched in SQL.
+    """
+    if isinstance(value, (list, set)) and not all(type(item).__name__ in _SCALAR_TYPES for item in value):
+        return 'nested_list'
+
+    return type(value).__name__
+
+
+def _to_column_value(value):
+    """Value as stored in the column of a field. Lists are stored as json
+    """
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, (str, int, float)) or value is None:
+        return value
+
+    return json.dumps(value if not isinstance(value, set) else sorted(value))
+
+
+def _to_text(value):
+    """Text of a value which can match a string search: the string itself, or the string items of a list
+    """
+    if isinstance(value, str):
+        return value
+    if isinstance(value, (list, set)):
+        return '\n'.join(item for item in value if isinstance(item, str))
+
+    return None
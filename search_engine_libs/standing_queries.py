@@ -0,0 +1,158 @@
+"""Standing queries: searches registered once with ZendeskSearchEngine.register_standing_query, whose
+results are kept up to date when the data is reloaded, with the records added to, removed from and
+changed within the results after each reload.
+To use as below,
+1. query = search_engine.register_standing_query('priority', 'urgent', EntityTypes.TICKET, callback=print)
+2. search_engine.load_data_and_relations_cache()  # calls print with the QueryChanges of the reload
+3. query.take_changes()  # or poll the changes instead of passing a callback
+
+A reload diffs each entity type of the new DatasetVersion against the previous one once, by unique
+identifier: records added, removed, and changed (any field with a different value, cold fields are
+compared by a digest of their values, see utils/cold_fields.py). Every standing query
+of the entity type then checks with is_match only the added and changed records. Whether the other
+records match can not have changed, as is_match depends only on the fields of the record.
+"""
+from collections import deque
+
+# Number of QueryChanges kept by a standing query until they are taken, the oldest are dropped first
+MAX_PENDING_CHANGES = 100
+
+
+class RecordChanges():
+    """Differences of the records of one entity type between two DatasetVersions.
+        self.added -> unique identifiers of the records only in the new version
+        self.removed -> unique identifiers of the records only in the old version
+        self.changed -> unique identifiers of the records in both versions with different values
+    """
+
+    def __init__(self):
+        self.added = []
+        self.removed = []
+        self.changed = []
+
+    @classmethod
+    def diff(cls, old_store_meta, new_store_meta):
+        """
+        :param old_store_meta: SearchEngineEntityMeta of the entity type in the old version
+        :param new_store_meta: SearchEngineEntityMeta of the entity type in the new version
+        :return: RecordChanges
+        """
+        record_changes = cls()
+        # storage backends only support get on their row index, the rows are iterated instead
+        old_rows = old_store_meta.rows
+        for store_object in new_store_meta.rows:
+            unique_identifier = store_object.unique_identifier
+            old_row = old_store_meta.row_index.get(unique_identifier)
+            if old_row is None:
+                record_changes.added.append(unique_identifier)
+            elif vars(old_rows[old_row]) != vars(store_object):
+                record_changes.changed.append(unique_identifier)
+
+        record_changes.removed = [store_object.unique_identifier for store_object in old_rows
+                                  if new_store_meta.row_index.get(store_object.unique_identifier) is None]
+        return record_changes
+
+    def __repr__(self):
+        return str(vars(self))
+
+
+class QueryChanges():
+    """Changes of the results of a standing query made by one reload.
+        self.version -> version of the DatasetVersion the changes lead to
+        self.added -> unique identifiers of the records which match now, and did not before
+        self.removed -> unique identifiers of the records which matched before, and do not now
+        self.changed -> unique identifiers of the records which match before and now, with different values
+        self.records_checked -> number of records checked with is_match
+    """
+
+    def __init__(self, version):
+        self.version = version
+        self.added = []
+        self.removed = []
+        self.changed = []
+        self.records_checked = 0
+
+    def __bool__(self):
+        return bool(self.added or self.removed or self.changed)
+
+    def __repr__(self):
+        return str(vars(self))
+
+
+class StandingQuery():
+    """A search kept up to date across reloads.
+        self.search_field_name -> attribute to search on
+        self.search_field_value -> value to search on
+        self.entity_type -> entity type searched
+        self.callback -> function called with the QueryChanges of each reload which changes the results,
+        None to only keep them for take_changes. Called by the thread reloading the data
+        self.version -> version of the DatasetVersion the results are from
+        self.matching_identifiers -> set of the unique identifiers of the records which match
+        self.pending_changes -> QueryChanges not taken yet, oldest first
+    """
+
+    def __init__(self, search_field_name, search_field_value, entity_type, callback=None):
+        self.search_field_name = search_field_name
+        self.search_field_value = search_field_value
+        self.entity_type = entity_type
+        self.callback = callback
+        self.version = None
+        self.matching_identifiers = set()
+        self.pending_changes = deque(maxlen=MAX_PENDING_CHANGES)
+
+    def evaluate(self, dataset):
+        """Find every record which matches in a DatasetVersion
+        :param dataset: DatasetVersion with the data of the entity type loaded
+        :return: None
+        """
+        self.matching_identifiers = {
+            store_object.unique_identifier for store_object in dataset.searchable_data_set[self.entity_type].rows
+            if store_object.is_match(self.search_field_name, self.search_field_value)}
+        self.version = dataset.version
+
+    def update(self, dataset, record_changes):
+        """Bring the results up to date with a new DatasetVersion, checking only the records which changed
+        :param dataset: new DatasetVersion
+        :param record_changes: RecordChanges of the entity type from the version of the results to dataset
+        :return: QueryChanges
+        """
+        query_changes = QueryChanges(dataset.version)
+        store_meta = dataset.searchable_data_set[self.entity_type]
+
+        for unique_identifier in record_changes.removed:
+            if unique_identifier in self.matching_identifiers:
+                self.matching_identifiers.discard(unique_identifier)
+                query_changes.removed.append(unique_identifier)
+
+        for unique_identifier in record_changes.added + record_changes.changed:
+            store_object = store_meta.rows[store_meta.row_index.get(unique_identifier)]
+            query_changes.records_checked += 1
+            was_matching = unique_identifier in self.matching_identifiers
+
+            if store_object.is_match(self.search_field_name, self.search_field_value):
+                self.matching_identifiers.add(unique_identifier)
+                (query_changes.changed if was_matching else query_changes.added).append(unique_identifier)
+            elif was_matching:
+                self.matching_identifiers.discard(unique_identifier)
+                query_changes.removed.append(unique_identifier)
+
+        self.version = dataset.version
+        if query_changes:
+            self.pending_changes.append(query_changes)
+            if self.callback is not None:
+                self.callback(query_changes)
+
+        return query_changes
+
+    def take_changes(self):
+        """Changes since the last call, for clients polling instead of passing a callback
+        :return: list of QueryChanges, oldest first
+        """
+        changes = []
+        while self.pending_changes:
+            changes.append(self.pending_changes.popleft())
+
+        return changes
+
+    def __repr__(self):
+        return str(vars(self))
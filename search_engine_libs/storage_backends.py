@@ -0,0 +1,26 @@
+"""Interface of the storage backends of ZendeskSearchEngine.
+
+By default ZendeskSearchEngine loads the data files into python objects held in memory. A storage
+backend replaces that: it fills the DatasetVersion being built with objects which behave like the
+in memory structures but keep the data elsewhere. For each SearchEngineEntityMeta
+    rows -> sequence of entity objects, indexed by row (len, [row], iteration in row order)
+    row_index -> object with get(unique identifier) returning the row, None if not found
+    search_candidates -> optional function (search_field_name, search_field_value) returning the rows
+    which may match, or None if the backend can not narrow the search down
+and for each relationship cache in DatasetVersion.relationship_caches, an object with get(row)
+returning the linked rows in load order.
+"""
+
+
+class StorageBackend():
+    """Base class for storage backends. Child classes must implement load.
+    """
+    backend_name = "This is a base class"
+
+    def load(self, search_engine, dataset):
+        """Fill an empty DatasetVersion.
+        :param search_engine: ZendeskSearchEngine loading the data, for its settings
+        :param dataset: DatasetVersion with an empty SearchEngineEntityMeta for each entity type
+        :return: None
+        """
+        raise NotImplementedError("Implement this method to load data")
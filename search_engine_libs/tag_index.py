@@ -0,0 +1,196 @@
+"""Tag indexes of a DatasetVersion, for the list fields of the entities (tags, domain_names).
+
+A tag index maps each tag of one field of one entity type to the sorted rows of the records which have
+it, with the sorted vocabulary of the tags for prefix and substring lookups on tag names:
+    1. do_search by a tag field finds the tags containing the search value in the vocabulary, and
+    checks only the records which have one of them with is_match
+    2. search_tags finds the records which have all of, any of or none of some tags by intersecting and
+    merging the sorted rows of the tags, without matching the records
+Tags are compared in lower case. Indexes are built lazily, the first time a field is searched, and
+belong to the DatasetVersion they were built from.
+"""
+import heapq
+from array import array
+from bisect import bisect_left
+
+from search_engine_libs.adjacency import ROW_TYPE_CODE
+
+# A term of a tag query ending with it matches the tags starting with the rest of the term. 'ohio*'
+PREFIX_WILDCARD = '*'
+
+
+class TagIndex():
+    """Tags of one field.
+        self.tags -> sorted list of the distinct tags, in lower case
+        self.postings -> {tag : array of the rows of the records which have it, ascending}
+        self.row_count -> number of records of the entity type
+        self.is_tag_field -> False if some records have a value which is neither a list of strings nor
+        None. Those fields are matched record per record, the index is then empty and not used
+    """
+
+    def __init__(self, row_count, is_tag_field=True):
+        self.tags = []
+        self.postings = {}
+        self.row_count = row_count
+        self.is_tag_field = is_tag_field
+
+    @classmethod
+    def build(cls, dataset, entity_type, field_name):
+        """Builder for DatasetVersion.get_derived
+        :param dataset: DatasetVersion with the data of entity_type loaded
+        :param entity_type: entity type of the records
+        :param field_name: name of the field
+        :return: TagIndex
+        """
+        rows = dataset.searchable_data_set[entity_type].rows
+        index = cls(len(rows))
+
+        for row, store_object in enumerate(rows):
+            # raises AttributeError for fields the entity does not have, like is_match
+            value = getattr(store_object, field_name)
+            if value is None:
+                continue
+
+            if not isinstance(value, (list, tuple, set)) or not all(isinstance(tag, str) for tag in value):
+                return cls(len(rows), False)
+
+            for tag in set(tag.lower() for tag in value):
+                tag_rows = index.postings.get(tag)
+                if tag_rows is None:
+                    tag_rows = index.postings[tag] = array(ROW_TYPE_CODE)
+                tag_rows.append(row)
+
+        index.tags = sorted(index.postings)
+        return index
+
+    def tags_with_prefix(self, prefix):
+        """
+        :param prefix: start of the tags, in any case
+        :return: list of the tags starting with prefix
+        """
+        prefix = prefix.lower()
+        tags = []
+        for position in range(bisect_left(self.tags, prefix), len(self.tags)):
+            if not self.tags[position].startswith(prefix):
+                break
+            tags.append(self.tags[position])
+
+        return tags
+
+    def tags_containing(self, fragment):
+        """
+        :param fragment: part of the tags, in any case
+        :return: list of the tags containing fragment
+        """
+        fragment = fragment.lower()
+        return [tag for tag in self.tags if fragment in tag]
+
+    def rows_containing(self, fragment):
+        """Rows which may match a search of the field by a string, like do_search
+        :param fragment: search value
+        :return: list of rows in load order. None if the field is not a tag field
+        """
+        if not self.is_tag_field:
+            return None
+
+        return union_sorted([self.postings[tag] for tag in self.tags_containing(fragment)])
+
+    def search(self, all_of=(), any_of=(), none_of=(), profile=None):
+        """Records which have all of, any of and none of some tags
+        :param all_of: terms the records must all have
+        :param any_of: terms the records must have at least one of. Not checked if empty
+        :param none_of: terms the records must not have
+        Terms are tags in any case, or the start of tags followed by PREFIX_WILDCARD
+        :param profile: QueryProfile to record into, None if the search is not profiled
+        :return: list of rows in load order. None if the field is not a tag field
+        """
+        if not self.is_tag_field:
+            return None
+
+        row_lists = [self._term_rows(term, profile) for term in all_of]
+        if any_of:
+            row_lists.append(union_sorted([self._term_rows(term, profile) for term in any_of]))
+
+        if row_lists:
+            rows = intersect_sorted(row_lists)
+        else:
+            rows = range(self.row_count)
+
+        if none_of:
+            rows = difference_sorted(rows, union_sorted([self._term_rows(term, profile) for term in none_of]))
+
+        return list(rows)
+
+    def _term_rows(self, term, profile=None):
+        """Rows of the records which have a tag matched by a term
+        :return: sorted rows
+        """
+        term = term.lower()
+        if term.endswith(PREFIX_WILDCARD):
+            row_lists = [self.postings[tag] for tag in self.tags_with_prefix(term[:-len(PREFIX_WILDCARD)])]
+        else:
+            row_lists = [self.postings[term]] if term in self.postings else []
+
+        if profile is not None:
+            profile.count('records_scanned', sum(len(rows) for rows in row_lists))
+
+        return union_sorted(row_lists)
+
+    def __repr__(self):
+        return str(vars(self))
+
+
+def intersect_sorted(row_lists):
+    """Rows in every list. The shortest list is walked, and each of its rows is looked up in the other
+    lists with a binary search which starts where the previous one ended
+    :param row_lists: list of sorted rows
+    :return: list of sorted rows
+    """
+    row_lists = sorted(row_lists, key=len)
+    rows = list(row_lists[0])
+
+    for other_rows in row_lists[1:]:
+        common_rows = []
+        position = 0
+        for row in rows:
+            position = bisect_left(other_rows, row, position)
+            if position == len(other_rows):
+                break
+            if other_rows[position] == row:
+                common_rows.append(row)
+        rows = common_rows
+
+    return rows
+
+
+def union_sorted(row_lists):
+    """Rows in any list
+    :param row_lists: list of sorted rows
+    :return: list of sorted rows, without duplicates
+    """
+    if len(row_lists) == 1:
+        return list(row_lists[0])
+
+    rows = []
+    for row in heapq.merge(*row_lists):
+        if not rows or rows[-1] != row:
+            rows.append(row)
+
+    return rows
+
+
+def difference_sorted(rows, excluded_rows):
+    """Rows which are not excluded
+    :param rows: sorted rows
+    :param excluded_rows: sorted rows
+    :return: list of sorted rows
+    """
+    remaining_rows = []
+    position = 0
+    for row in rows:
+        while position < len(excluded_rows) and excluded_rows[position] < row:
+            position += 1
+        if position == len(excluded_rows) or excluded_rows[position] != row:
+            remaining_rows.append(row)
+
+    return remaining_rows
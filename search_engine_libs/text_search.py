@@ -0,0 +1,156 @@
+"""Relevance ranked free text search over the text fields of all entity types.
+To use as below,
+1. search_engine = ZendeskSearchEngine('data_files')
+2. search_engine.search_text('ohio problem', limit=10)
+
+Every record is a document made of its text fields. The index maps each token to its postings: the
+documents it appears in and how many times. A search scores the documents of the query tokens with
+BM25 and keeps the best ones in a heap, so only the top hits are formatted.
+The index is built on first use from a DatasetVersion and dropped together with it on reload.
+"""
+import heapq
+import math
+import re
+from array import array
+
+from search_engine_libs.adjacency import ROW_TYPE_CODE
+from utils.cold_fields import resolve_cold_field
+
+# Fields searched by search_text. Not every entity type has every field
+TEXT_SEARCH_FIELDS = ('name', 'subject', 'description', 'tags', 'details', 'signature', 'domain_names')
+DEFAULT_TEXT_SEARCH_LIMIT = 10
+
+# BM25 parameters: saturation of the term frequency and length normalisation
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+_TOKEN_PATTERN = re.compile(r'\w+')
+
+
+def tokenize(text):
+    """Split text into lower case word tokens
+    :param text: string
+    :return: list of tokens
+    """
+    return _TOKEN_PATTERN.findall(text.lower())
+
+
+class TextSearchHit():
+    """One result of a text search
+        self.score -> BM25 score, higher is more relevant
+        self.entity_type -> EntityTypes of the record
+        self.row -> row of the record
+    """
+
+    def __init__(self, score, entity_type, row):
+        self.score = score
+        self.entity_type = entity_type
+        self.row = row
+
+    def __repr__(self):
+        return str(vars(self))
+
+
+class InvertedIndex():
+    """Token to postings index over the text fields of all records of a DatasetVersion.
+    Documents are numbered in load order across entity types.
+    """
+
+    def __init__(self):
+        # entity type and first document of each entity type, in document order
+        self.entity_ranges = []
+        self.document_lengths = array(ROW_TYPE_CODE)
+        # {token : (array of documents, array of term frequencies)}
+        self.postings = {}
+        self.average_document_length = 0.0
+
+    @classmethod
+    def build(cls, dataset):
+        """Index every record of a DatasetVersion. Used with DatasetVersion.get_derived
+        :param dataset: DatasetVersion
+        :return: InvertedIndex
+        """
+        index = cls()
+        for entity_type, store_meta in dataset.searchable_data_set.items():
+            index.entity_ranges.append((len(index.document_lengths), entity_type))
+            for store_object in store_meta.rows:
+                index._add_document(_document_tokens(store_object))
+
+        if index.document_lengths:
+            index.average_document_length = sum(index.document_lengths) / len(index.document_lengths)
+
+        return index
+
+    def _add_document(self, tokens):
+        document = len(self.document_lengths)
+        self.document_lengths.append(len(tokens))
+
+        term_frequencies = {}
+        for token in tokens:
+            term_frequencies[token] = term_frequencies.get(token, 0) + 1
+
+        for token, term_frequency in term_frequencies.items():
+            postings = self.postings.get(token)
+            if postings is None:
+                postings = self.postings[token] = (array(ROW_TYPE_CODE), array(ROW_TYPE_CODE))
+            postings[0].append(document)
+            postings[1].append(term_frequency)
+
+    def search(self, query, limit=DEFAULT_TEXT_SEARCH_LIMIT, profile=None):
+        """Best documents for a query
+        :param query: free text
+        :param limit: maximum number of hits
+        :param profile: QueryProfile to record into, None if the search is not profiled
+        :return: list of TextSearchHit, best first
+        """
+        document_count = len(self.document_lengths)
+        scores = {}
+
+        for token in set(tokenize(query)):
+            postings = self.postings.get(token)
+            if postings is None:
+                continue
+
+            documents, term_frequencies = postings
+            idf = math.log(1 + (document_count - len(documents) + 0.5) / (len(documents) + 0.5))
+            for document, term_frequency in zip(documents, term_frequencies):
+                length_norm = 1 - BM25_B + BM25_B * self.document_lengths[document] / self.average_document_length
+                scores[document] = scores.get(document, 0.0) + idf * term_frequency * (BM25_K1 + 1) / (
+                    term_frequency + BM25_K1 * length_norm)
+
+            if profile is not None:
+                profile.count('records_scanned', len(documents))
+                profile.count('predicates_evaluated', len(documents))
+
+        # ties are broken by load order, so results are stable
+        best = heapq.nsmallest(limit, scores.items(), key=lambda document_score: (-document_score[1],
+                                                                                  document_score[0]))
+        return [TextSearchHit(score, *self._entity_row(document)) for document, score in best]
+
+    def _entity_row(self, document):
+        """Entity type and row of a document
+        :return: (entity type, row)
+        """
+        for first_document, entity_type in reversed(self.entity_ranges):
+            if document >= first_document:
+                return entity_type, document - first_document
+
+        raise IndexError(f'document {document} out of range')
+
+
+def _document_tokens(store_object):
+    """Tokens of the text fields of a record
+    :param store_object: entity object
+    :return: list of tokens
+    """
+    tokens = []
+    for field_name in TEXT_SEARCH_FIELDS:
+        value = resolve_cold_field(getattr(store_object, field_name, None))
+        if isinstance(value, str):
+            tokens.extend(tokenize(value))
+        elif isinstance(value, (list, tuple, set)):
+            for item in value:
+                if isinstance(item, str):
+                    tokens.extend(tokenize(item))
+
+    return tokens
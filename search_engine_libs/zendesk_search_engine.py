@@ -1,11 +1,28 @@
 """Module to perform the data search
 """
 
+import itertools
 import os
-
-from search_engine_libs.search_engine_utils import ENTITY_TYPE_TO_STORE_TYPE
-from utils.constants import EntityTypes
-from utils.file_processors import get_file_name_list, parse_json_from_file
+import threading
+import weakref
+from functools import partial
+
+from search_engine_libs.dataset_version import DatasetVersion
+from search_engine_libs.expansion_cache import ExpansionCache
+from search_engine_libs.fuzzy_search import (DEFAULT_FUZZY_SEARCH_LIMIT, FUZZY_INDEX_MAX_EDIT_DISTANCE,
+                                             FUZZY_SEARCH_FIELDS, FuzzyIndex)
+from search_engine_libs.load_metrics import LoadReport, ShardLoadMetrics
+from search_engine_libs.numeric_columns import NumericColumn
+from search_engine_libs.query_profiler import QueryProfile, QueryProfiler, now
+from search_engine_libs.referential_integrity import link_dataset
+from search_engine_libs.search_engine_utils import ENTITY_REGISTRY
+from search_engine_libs.standing_queries import RecordChanges, StandingQuery
+from search_engine_libs.tag_index import TagIndex
+from search_engine_libs.text_search import DEFAULT_TEXT_SEARCH_LIMIT, TEXT_SEARCH_FIELDS, InvertedIndex
+from utils.cold_fields import ColdFieldFile, make_fields_cold
+from utils.dictionary_encoder import DEFAULT_ENCODED_FIELDS, DictionaryEncoder
+from utils.file_processors import get_file_name_list, parse_json_from_file, parse_json_records_with_spans
+from utils.numeric_match import is_number, is_numeric_search
 
 
 class SearchEngineEntityMeta():
@@ -13,160 +30,449 @@ class SearchEngineEntityMeta():
         self.file_pattern -> pattern for the file names which hold data from this entity
         self.entity_type -> type of entity USER, TICKETS from EntityTypes
         self.entity_store_type -> Class of the entity User, Organization, Ticket
-        self.data_store -> dictionary to hold the data. {id : entity object}
-        self.relationship_linker -> function which creates links to foreign objects which do not
-        have a foreign key in this entity.
-        Example: An Organization will have a list of tickets which belong to it. This
-        method wil help generate that cache. Using a dict keeps runtime low when the size
-        of the data set increases.
-        The dictionary would have key as organization id and value as a list of linked
-        ticket ids.
+        self.rows -> list of the entity objects in load order. The position of an object is its row,
+        a dense integer id assigned at load time which is used by all internal structures
+        self.row_index -> dictionary to look up the row of an object by unique identifier. {id : row}
+        self.search_candidates -> None, or a function set by a storage backend which narrows a search
+        down to the rows which may match. See storage_backends.py
+    Links to foreign objects which do not have a foreign key in this entity are built once all data
+    is loaded, see referential_integrity.py.
     """
 
-    def __init__(self, file_pattern, entity_type, relationship_linker):
+    def __init__(self, file_pattern, entity_type, entity_store_type):
         self.file_pattern = file_pattern
         self.entity_type = entity_type
-        self.entity_store_type = ENTITY_TYPE_TO_STORE_TYPE[entity_type]
-        self.data_store = {}
-        self.relationship_linker = relationship_linker
+        self.entity_store_type = entity_store_type
+        self.rows = []
+        self.row_index = {}
+        self.search_candidates = None
 
 
 class ZendeskSearchEngine(object):
     """Class encapsulating the search algorithm. Searches can be done on entities lists in
     self.searchable_data_set.
     There are 2 types of searches:
-    1. Search by unique identifier : _id. Dict key look up, constant time.
-    2. Search by non unique identifier : name/tags. Linear look up time.
+    1. Search by unique identifier : _id. Dict key look up of the row, constant time.
+    2. Search by non unique identifier : name/tags. Linear look up time. Searches by a number or a
+    NumericRange use a sorted numeric column of the field, see numeric_columns.py. Searches of list
+    fields (tags, domain_names) by a string use a tag index of the field, see tag_index.py
+    All data is held in a DatasetVersion. Each search works on the version which was current when
+    it started, and reloads publish a complete new version, so searches can run during a reload.
     """
-    def __init__(self, base_data_folder):
-
-        # Dataset from which a user can search for data
-        self.searchable_data_set = {
-            EntityTypes.USER: SearchEngineEntityMeta('users*.json', EntityTypes.USER, self._user_relationship_linker),
-            EntityTypes.TICKET: SearchEngineEntityMeta('ticket*.json', EntityTypes.TICKET,
-                                                       self._ticket_relationship_linker),
-            EntityTypes.ORGANIZATION: SearchEngineEntityMeta('organization*.json', EntityTypes.ORGANIZATION, None),
-            # Add any new types here
-        }
+    # Number of records between two calls of the progress callback while loading a data file
+    PROGRESS_INTERVAL = 10000
+
+    def __init__(self, base_data_folder, profiler=None, progress_callback=None, skip_duplicates=False,
+                 encoded_fields=DEFAULT_ENCODED_FIELDS, mmap_store_path=None, storage_backend=None,
+                 cache_expansions=True, max_additional_rows=None, entity_registry=ENTITY_REGISTRY, lazy_load=False,
+                 cold_fields=None):
+        """
+        :param base_data_folder: folder with a sub folder of data files for each entity type
+        :param profiler: QueryProfiler to record every search into. None disables profiling
+        :param progress_callback: function called with a ShardLoadMetrics while data files are loaded
+        :param skip_duplicates: if True, records with an already loaded unique identifier are counted and
+        skipped. Otherwise a KeyError is raised.
+        :param encoded_fields: names of fields with repeated values which are dictionary encoded while loading.
+        None disables the encoding
+        :param mmap_store_path: path of a store file built with search_engine_libs.mmap_store. If given, the
+        engine attaches to it instead of loading the data files from base_data_folder
+        :param storage_backend: StorageBackend holding the data. None keeps all data in memory (default)
+        :param cache_expansions: if True, the representations of foreign keys and the additional data of
+        search results are cached per DatasetVersion (ExpansionCache)
+        :param max_additional_rows: maximum number of linked records of each kind shown in the additional data
+        of a search result, followed by their total count. None shows all of them (default)
+        :param entity_registry: EntityRegistry of the entity types to load and search
+        :param lazy_load: if True, the data files of an entity type are loaded the first time a search needs
+        them, instead of when the engine is created or reloaded. Not used with storage backends
+        :param cold_fields: {entity type : names of fields left in the data files}. Cold fields are read from
+        the data files when they are searched or printed, see utils/cold_fields.py. None keeps every field
+        in memory (default). Not used with storage backends
+        """
+        self.entity_registry = entity_registry
 
         # Functions to assist in getting linked data when the search is based on the entity types in the keys
+        # If entity type is organization, then get all it's employees and tickets
         self.addition_data_func = {
-            EntityTypes.USER: self.get_addition_data_for_search_by_user,
-            EntityTypes.ORGANIZATION: self.get_addition_data_for_search_by_organization
+            registration.entity_type: partial(self.get_addition_data, registration.reverse_links)
+            for registration in entity_registry if registration.reverse_links
         }
 
-        # Cache for looking up linked records. Avoid looping through values of the linked data set dict.
-        self.organization_to_users = {}
-        self.organization_to_tickets = {}
-
-        self.user_to_ticket_submitter = {}
-        self.user_to_ticket_assignee = {}
-
         self.base_data_folder = base_data_folder
 
+        # QueryProfiler recording every search. None when profiling is disabled (default)
+        self.profiler = profiler
+
+        self.progress_callback = progress_callback
+        self.skip_duplicates = skip_duplicates
+        self.encoded_fields = encoded_fields
+        if mmap_store_path:
+            from search_engine_libs.mmap_store import MmapStoreBackend
+            storage_backend = MmapStoreBackend(mmap_store_path)
+        self.storage_backend = storage_backend
+        self.cache_expansions = cache_expansions
+        self.max_additional_rows = max_additional_rows
+        self.lazy_load = lazy_load
+        self.cold_fields = cold_fields or {}
+
+        # Current DatasetVersion. Replaced as a whole by load_data_and_relations_cache, which never modifies it
+        self.dataset = None
+        # Versions replaced by a newer one, kept here only while searches still hold them
+        self.retired_datasets = weakref.WeakSet()
+        self._version_counter = itertools.count(1)
+        # Only one load at a time
+        self._load_lock = threading.Lock()
+        # StandingQuery kept up to date by every reload, see standing_queries.py
+        self.standing_queries = []
+
         self.load_data_and_relations_cache()
 
-    def _user_relationship_linker(self, user_object):
-        organization_id = user_object.organization_id
-        self._create_link(self.organization_to_users, organization_id, user_object)
+    # The properties below give the data of the current version
+    @property
+    def searchable_data_set(self):
+        """Dataset from which a user can search for data
+        :return: {entity type : SearchEngineEntityMeta}
+        """
+        return self.dataset.searchable_data_set
+
+    @property
+    def load_report(self):
+        """LoadReport of the current version
+        """
+        return self.dataset.load_report
 
-    def _ticket_relationship_linker(self, ticket_object):
-        organization_id = ticket_object.organization_id
-        self._create_link(self.organization_to_tickets, organization_id, ticket_object)
+    @property
+    def integrity_report(self):
+        """IntegrityReport of the orphaned foreign keys of the current version
+        """
+        return self.dataset.integrity_report
 
-        submitter_id = ticket_object.submitter_id
-        self._create_link(self.user_to_ticket_submitter, submitter_id, ticket_object)
+    @property
+    def string_encoder(self):
+        """DictionaryEncoder of the current version, None if encoding is disabled
+        """
+        return self.dataset.string_encoder
 
-        assignee_id = ticket_object.assignee_id
-        self._create_link(self.user_to_ticket_assignee, assignee_id, ticket_object)
+    # Cache for looking up linked records. Avoid looping through values of the linked data set dict.
+    # Each is a CsrAdjacency from the row of a record to the rows of the linked records.
+    @property
+    def organization_to_users(self):
+        return self.dataset.relationship_caches['organization_to_users']
 
-    def _create_link(self, link_dict, link_id, link_source_object):
+    @property
+    def organization_to_tickets(self):
+        return self.dataset.relationship_caches['organization_to_tickets']
 
-        if link_id is not None:
-            if link_id not in link_dict:
-                link_dict[link_id] = []
+    @property
+    def user_to_ticket_submitter(self):
+        return self.dataset.relationship_caches['user_to_ticket_submitter']
 
-            link_dict[link_id].append(link_source_object.unique_identifier)
+    @property
+    def user_to_ticket_assignee(self):
+        return self.dataset.relationship_caches['user_to_ticket_assignee']
+
+    def _create_searchable_data_set(self):
+        """Create empty containers for each entity type
+        :return: {entity type : SearchEngineEntityMeta}
+        """
+        return {
+            registration.entity_type: SearchEngineEntityMeta(registration.file_pattern, registration.entity_type,
+                                                             registration.entity_store_type)
+            # New types are added to the entity registry
+            for registration in self.entity_registry
+        }
 
     def load_data_and_relations_cache(self):
         """
-        This method loads data in order and creates any cache for maintaining relationships between data sets
-        :return:
+        This method loads data in order and creates any cache for maintaining relationships between data sets.
+        Everything is loaded into a new DatasetVersion, which replaces the current one once it is complete.
+        Searches running meanwhile keep using the version they started with.
+        Metrics of the load are saved in self.load_report
+        :return: the new DatasetVersion
+        """
+        with self._load_lock:
+            dataset = self._build_dataset()
+
+            previous_dataset = self.dataset
+            if previous_dataset is not None:
+                self.retired_datasets.add(previous_dataset)
+            self.dataset = dataset  # publish, a single reference assignment
+
+            if previous_dataset is not None:
+                self._update_standing_queries(previous_dataset, dataset)
+
+        return dataset
+
+    def register_standing_query(self, search_field_name, search_field_value, entity_type, callback=None):
+        """Register a search whose results are kept up to date by every reload of the data, with the records
+        added to, removed from and changed within its results. See standing_queries.py
+        :param search_field_name: Attribute to search on. _id, name, tags
+        :param search_field_value: Value to search attribute on. 1, 'Miss Buck'...
+        :param entity_type: Which entity to search on USER/TICKET/ORGANIZATION
+        :param callback: function called with the QueryChanges of each reload which changes the results. It is
+        called by the thread reloading the data, and must not reload the data itself
+        :return: StandingQuery, with the records which match now
+        """
+        standing_query = StandingQuery(search_field_name, search_field_value, entity_type, callback)
+
+        # the results must be from the version the next reload replaces
+        with self._load_lock:
+            self.dataset.ensure_loaded({entity_type})
+            standing_query.evaluate(self.dataset)
+            self.standing_queries.append(standing_query)
+
+        return standing_query
+
+    def unregister_standing_query(self, standing_query):
+        """Stop keeping a standing query up to date
+        :param standing_query: StandingQuery returned by register_standing_query
+        :return: None
+        """
+        with self._load_lock:
+            self.standing_queries.remove(standing_query)
+
+    def _update_standing_queries(self, previous_dataset, dataset):
+        """Bring the standing queries up to date with a new DatasetVersion. The records of each entity type
+        are diffed once, and each query checks only the added and changed records
+        :param previous_dataset: DatasetVersion the standing queries are up to date with
+        :param dataset: new DatasetVersion
+        :return: None
         """
+        record_changes = {}
+        for standing_query in self.standing_queries:
+            entity_type = standing_query.entity_type
+            if entity_type not in record_changes:
+                previous_dataset.ensure_loaded({entity_type})
+                dataset.ensure_loaded({entity_type})
+                record_changes[entity_type] = RecordChanges.diff(previous_dataset.searchable_data_set[entity_type],
+                                                                 dataset.searchable_data_set[entity_type])
+
+            standing_query.update(dataset, record_changes[entity_type])
+
+    def _build_dataset(self):
+        """Load all data files into a new DatasetVersion. With lazy_load, only check that the data files
+        exist, and let the version load them when searches need them.
+        :return: DatasetVersion
+        """
+        load_start = now()
+        dataset = DatasetVersion(next(self._version_counter), self._create_searchable_data_set())
+        dataset.load_report = LoadReport()
+        all_entity_types = frozenset(dataset.searchable_data_set)
+
+        if self.storage_backend is not None:
+            self.storage_backend.load(self, dataset)
+            dataset.loaded_entity_types = all_entity_types
+            dataset.load_report.total_time = now() - load_start
+            return dataset
+
+        # A new encoder per load, values of a previous load are not kept alive
+        dataset.string_encoder = DictionaryEncoder(self.encoded_fields) if self.encoded_fields else None
+
+        if self.lazy_load:
+            for registration in self.entity_registry:
+                get_file_name_list(registration.file_pattern,
+                                   os.path.join(self.base_data_folder, registration.data_folder))
+            dataset.entity_loader = self._load_entity_types
+        else:
+            self._load_entity_types(dataset, all_entity_types)
+            dataset.loaded_entity_types = all_entity_types
 
-        # Reset all relationship cache
-        self.organization_to_users.clear()
-        self.organization_to_tickets.clear()
-        self.user_to_ticket_submitter.clear()
-        self.user_to_ticket_assignee.clear()
+        return dataset
 
-        # Load Organizations
-        self._load_data_from_files(os.path.join(self.base_data_folder, 'organizations_data'),
-                                   self.searchable_data_set[EntityTypes.ORGANIZATION])
-        self._load_data_from_files(os.path.join(self.base_data_folder, 'users_data'),
-                                   self.searchable_data_set[EntityTypes.USER])
-        self._load_data_from_files(os.path.join(self.base_data_folder, 'tickets_data'),
-                                   self.searchable_data_set[EntityTypes.TICKET])
+    def _load_entity_types(self, dataset, entity_types):
+        """Load the data files of entity types into a DatasetVersion, then link them to the entity
+        types loaded before
+        :param dataset: DatasetVersion
+        :param entity_types: set of entity types to load
+        :return: None
+        """
+        load_start = now()
+
+        # Load Organizations, Users and Tickets, in registration order
+        for registration in self.entity_registry:
+            if registration.entity_type in entity_types:
+                self._load_data_from_files(os.path.join(self.base_data_folder, registration.data_folder),
+                                           dataset.searchable_data_set[registration.entity_type], dataset)
+
+        # Resolve the foreign keys and build the relationship caches in one pass, now that the data is loaded
+        link_start = now()
+        link_dataset(dataset, self.entity_registry.relationship_caches, dataset.loaded_entity_types | entity_types)
+        dataset.load_report.link_time += now() - link_start
+
+        dataset.load_report.total_time += now() - load_start
+
+    def _entity_types_needed(self, entity_type):
+        """Entity types which must be loaded to search an entity type: itself and the entity types its
+        foreign keys refer to. The entity types linked to it as additional data are loaded by
+        get_addition_data, only once a search has results to show them for
+        :param entity_type: entity type searched
+        :return: set of entity types
+        """
+        entity_types_needed = {entity_type}
+        entity_types_needed.update(self.entity_registry[entity_type].foreign_keys.values())
+        return entity_types_needed
 
     def get_search_fields_list(self):
         """Gets all searchable fields from each searchable entity
         :return:
         """
         searchable_fields_list = []
-        for data_set in self.searchable_data_set.keys():
-            searchable_fields_list.append(ENTITY_TYPE_TO_STORE_TYPE[data_set].get_searchable_fields())
+        # Same order as the menu of entity types. The fields are served from the schema of each entity,
+        # without loading data
+        for entity_type in sorted(self.searchable_data_set, key=lambda entity_type: entity_type.value):
+            entity_store_type = self.searchable_data_set[entity_type].entity_store_type
+            searchable_fields_list.append(entity_store_type.get_searchable_fields())
 
         return searchable_fields_list
 
-    def _load_data_from_files(self, folder_path, store_meta):
+    def _load_data_from_files(self, folder_path, store_meta, dataset):
         """Load data from file to an object
         :param folder_path: path of the folder
         :param store_meta: container which will hold the data
+        :param dataset: DatasetVersion being loaded. Metrics of each file are recorded in its load report
         :return:
         """
-        # reset any previously saved data
-        store_meta.data_store.clear()
+        string_encoder = dataset.string_encoder
+        entity_name = store_meta.entity_store_type.entity_name
+        entity_metrics = dataset.load_report.add_entity(entity_name)
+        cold_field_names = self.cold_fields.get(store_meta.entity_type)
 
         for f in get_file_name_list(store_meta.file_pattern, folder_path):
-            for o_json in parse_json_from_file(f):
+            shard_metrics = ShardLoadMetrics(entity_name, f)
+            entity_metrics.shards.append(shard_metrics)
+
+            start = now()
+            if cold_field_names:
+                # the position of each record is kept, to read its cold fields from the file later
+                cold_field_file = ColdFieldFile(f)
+                source_records, record_spans = parse_json_records_with_spans(f)
+            else:
+                source_records = parse_json_from_file(f)
+            shard_metrics.parse_time = now() - start
+            shard_metrics.bytes_read = os.path.getsize(f)
+            shard_metrics.records_total = len(source_records)
+
+            for record_number, o_json in enumerate(source_records):
+                start = now()
+                if cold_field_names:
+                    make_fields_cold(o_json, cold_field_names, cold_field_file, *record_spans[record_number])
+                if string_encoder:
+                    string_encoder.encode_record(o_json)
                 store_object = store_meta.entity_store_type(o_json)
+                shard_metrics.construction_time += now() - start
+                shard_metrics.records_parsed += 1
+
+                if store_object.unique_identifier in store_meta.row_index:
+                    shard_metrics.duplicates_rejected += 1
+                    if self.skip_duplicates:
+                        continue
 
-                if store_object.unique_identifier in store_meta.data_store:
                     raise KeyError(
-                        f'Found 2 records of type {store_meta.entity_store_type.entity_name} with same unique key '
+                        f'Found 2 records of type {entity_name} with same unique key '
                         f'{store_object.unique_identifier}')
 
-                store_meta.data_store[store_object.unique_identifier] = store_object
+                row = len(store_meta.rows)
+                store_meta.row_index[store_object.unique_identifier] = row
+                store_meta.rows.append(store_object)
 
-                if store_meta.relationship_linker:
-                    store_meta.relationship_linker(store_object)
+                if self.progress_callback and not shard_metrics.records_parsed % self.PROGRESS_INTERVAL:
+                    self.progress_callback(shard_metrics)
 
-    def _search_by_unique_identifier(self, id_val, entity_type):
+            shard_metrics.done = True
+            if self.progress_callback:
+                self.progress_callback(shard_metrics)
+
+    @staticmethod
+    def _search_by_unique_identifier(dataset, id_val, entity_type):
         """Search for a given entity by it's unique identifier.
+        Searches convert unique identifiers to rows here, foreign keys are converted once at load time.
+        :param dataset: DatasetVersion to search
         :param id_val: unique identifier. Usually _id
         :param entity_type: EntityTypes.USER/TICKET/...
-        :return: list of result. empty list if nothing found
+        :return: list of rows. None if nothing found
         """
-        search_result = self.searchable_data_set[entity_type].data_store.get(id_val)
+        search_result = dataset.searchable_data_set[entity_type].row_index.get(id_val)
 
-        if not search_result:
+        if search_result is None:
             return None
 
         return [search_result]
 
-    def _search_by_non_unique_identifier(self, search_field_name, search_field_value, entity_type):
+    def _search_by_non_unique_identifier(self, dataset, search_field_name, search_field_value, entity_type,
+                                         profile=None):
         """Search for a given entity by a non unique field.
+        :param dataset: DatasetVersion to search
         :param search_field_name: attribute to search on
         :param search_field_value: value to search on
         :param entity_type: EntityTypes.USER/TICKET/...
-        :return: list of result. empty list if nothing found
+        :param profile: QueryProfile to record into, None if the search is not profiled
+        :return: list of rows. empty list if nothing found
         """
+        store_meta = dataset.searchable_data_set[entity_type]
+        rows = enumerate(store_meta.rows)
+
+        # A storage backend may narrow the search down to the rows which can match. They are still checked
+        # with is_match, so the results are the same as a full scan. The rows of a backend are not all in
+        # memory, so when it can not narrow a search down, they are scanned instead of building an index
+        candidate_rows = None
+        access_path = 'full scan'
+        if store_meta.search_candidates is not None:
+            candidate_rows = store_meta.search_candidates(search_field_name, search_field_value)
+            access_path = 'backend candidates'
+        elif is_numeric_search(search_field_value):
+            numeric_column = dataset.get_derived(
+                ('numeric_column', entity_type, search_field_name),
+                partial(NumericColumn.build, entity_type=entity_type, field_name=search_field_name))
+            candidate_rows = numeric_column.search(search_field_value)
+            access_path = 'numeric column'
+        elif isinstance(search_field_value, str) and search_field_value:
+            # empty strings also match the records without a value, they are scanned
+            candidate_rows = self._get_tag_index(dataset, entity_type, search_field_name).rows_containing(
+                search_field_value)
+            access_path = 'tag index'
+        if candidate_rows is not None:
+            rows = ((row, store_meta.rows[row]) for row in candidate_rows)
+
+        if profile is not None:
+            profile.access_path = 'full scan' if candidate_rows is None else access_path
+            return self._profiled_scan(rows, search_field_name, search_field_value, profile)
+
         search_results = []
-        # loop through all the values in dict
-        for data_store_record in self.searchable_data_set[entity_type].data_store.values():
+        # loop through all the rows
+        for row, data_store_record in rows:
             if data_store_record.is_match(search_field_name,
                                           search_field_value):  # ask the object to check if its member matches the search value
-                search_results.append(data_store_record)
+                search_results.append(row)
+
+        return search_results
+
+    @staticmethod
+    def _get_tag_index(dataset, entity_type, field_name):
+        """Tag index of a field, built on first use
+        :return: TagIndex
+        """
+        return dataset.get_derived(('tag_index', entity_type, field_name),
+                                   partial(TagIndex.build, entity_type=entity_type, field_name=field_name))
+
+    @staticmethod
+    def _profiled_scan(rows, search_field_name, search_field_value, profile):
+        """Same as the loop in _search_by_non_unique_identifier, but times each is_match call.
+        Kept separate so that searches which are not profiled do not pay for the clock calls.
+        :param rows: iterable of (row, entity object)
+        :return: list of rows. empty list if nothing found
+        """
+        search_results = []
+        match_time = 0.0
+        try:
+            for row, data_store_record in rows:
+                profile.count('records_scanned')
+                profile.count('predicates_evaluated')
+                start = now()
+                is_match = data_store_record.is_match(search_field_name, search_field_value)
+                match_time += now() - start
+                if is_match:
+                    search_results.append(row)
+        finally:
+            profile.add_time('match', match_time)
 
         return search_results
 
@@ -174,120 +480,386 @@ class ZendeskSearchEngine(object):
         """Performs search based on given parameters. the algorithm is as below
         1. If search_field_name is a unique identifier, search the relevant data store by key.
         2. If search_field_name is non unique identifier, search the relevant data store scanning the values.
+        If profiling is enabled, the search is profiled and recorded in self.profiler.
         :param search_field_name: Attribute to search on. _id, name, tags
         :param search_field_value: Value to search attribute on. 1, 'Miss Buck'...
         :param entity_type: Which entity to search on USER/TICKET/ORGANIZATION
         :return:
         """
+        if self.profiler is None:
+            return self._do_search(search_field_name, search_field_value, entity_type, None)
+
+        profile = QueryProfile(search_field_name, search_field_value, entity_type)
+        try:
+            return self._do_search(search_field_name, search_field_value, entity_type, profile)
+        finally:
+            self.profiler.record(profile)
+
+    def explain(self, search_field_name, search_field_value, entity_type):
+        """Runs the search like do_search, but returns how it was executed instead of the results.
+        The profile is also recorded in self.profiler if profiling is enabled.
+        :param search_field_name: Attribute to search on. _id, name, tags
+        :param search_field_value: Value to search attribute on. 1, 'Miss Buck'...
+        :param entity_type: Which entity to search on USER/TICKET/ORGANIZATION
+        :return: QueryProfile
+        """
+        profile = QueryProfile(search_field_name, search_field_value, entity_type)
+        try:
+            self._do_search(search_field_name, search_field_value, entity_type, profile)
+        finally:
+            if self.profiler is not None:
+                self.profiler.record(profile)
+
+        return profile
+
+    def is_numeric_field(self, search_field_name, entity_type):
+        """Check if every value of a field is a number or None, so that it can be searched by a NumericRange
+        :param search_field_name: Attribute to check. submitter_id
+        :param entity_type: Which entity the field belongs to USER/TICKET/ORGANIZATION
+        :return: True if the field is numeric. Raises AttributeError for fields the entity does not have
+        """
+        dataset = self.dataset
+        dataset.ensure_loaded({entity_type})
+
+        store_meta = dataset.searchable_data_set[entity_type]
+        if store_meta.search_candidates is not None:
+            # the rows of a storage backend are not all in memory, they are checked without building a column
+            return all(value is None or is_number(value)
+                       for value in (getattr(row, search_field_name) for row in store_meta.rows))
+
+        return dataset.get_derived(
+            ('numeric_column', entity_type, search_field_name),
+            partial(NumericColumn.build, entity_type=entity_type, field_name=search_field_name)).is_numeric
+
+    def search_tags(self, search_field_name, entity_type, all_of=(), any_of=(), none_of=()):
+        """Search a list field (tags, domain_names) by whole tags, with the tag index of the field.
+        Tags are compared in any case, a term ending with * matches the tags starting with the rest of it.
+        :param search_field_name: list field to search on. tags
+        :param entity_type: Which entity to search on USER/TICKET/ORGANIZATION
+        :param all_of: tags the records must all have. ['Ohio', 'Utah']
+        :param any_of: tags the records must have at least one of. Not checked if empty
+        :param none_of: tags the records must not have
+        :return: printable search results, None if nothing is found.
+        Raises ValueError if the field is not a list of strings
+        """
+        def find_rows(dataset, profile):
+            rows = self._get_tag_index(dataset, entity_type, search_field_name).search(all_of, any_of, none_of,
+                                                                                       profile)
+            if rows is None:
+                raise ValueError(f'{search_field_name} is not a list of tags')
+            return rows
+
+        return self._run_index_search(
+            (search_field_name, f'all of {list(all_of)} any of {list(any_of)} none of {list(none_of)}', entity_type),
+            'tag index', self._entity_types_needed(entity_type), find_rows,
+            lambda dataset, row, profile: self._get_printable_search_result(dataset, row, entity_type, profile))
+
+    def search_text(self, query, limit=DEFAULT_TEXT_SEARCH_LIMIT):
+        """Free text search over the text fields (TEXT_SEARCH_FIELDS) of all entity types, ranked by relevance.
+        The inverted index is built by the first search on a version of the data.
+        :param query: free text. 'ohio problem'
+        :param limit: maximum number of results
+        :return: list of (entity type, score, printable search result), best first. None if nothing is found
+        """
+        return self._run_index_search(
+            (' '.join(TEXT_SEARCH_FIELDS), query, None), 'inverted index', None,
+            lambda dataset, profile: dataset.get_derived('text_index', InvertedIndex.build).search(query, limit,
+                                                                                                 profile),
+            lambda dataset, hit, profile: (hit.entity_type, hit.score, self._get_printable_search_result(
+                dataset, hit.row, hit.entity_type, profile)))
+
+    def search_fuzzy(self, query, max_edit_distance=FUZZY_INDEX_MAX_EDIT_DISTANCE, limit=DEFAULT_FUZZY_SEARCH_LIMIT,
+                     entity_type=None):
+        """Typo tolerant search over the names and emails (FUZZY_SEARCH_FIELDS) of all entity types, closest
+        first. The fuzzy index is built by the first search on a version of the data.
+        :param query: names or emails, with typos. 'fransisca rasmusen'
+        :param max_edit_distance: largest number of typos in each word of the query
+        :param limit: maximum number of results
+        :param entity_type: search only this entity type, None for all
+        :return: list of (entity type, edit distance, printable search result), closest first. None if nothing
+        is found
+        """
+        return self._run_index_search(
+            (' '.join(FUZZY_SEARCH_FIELDS), query, entity_type), 'fuzzy index', None,
+            lambda dataset, profile: dataset.get_derived('fuzzy_index', FuzzyIndex.build).search(
+                query, max_edit_distance, limit, entity_type, profile),
+            lambda dataset, hit, profile: (hit.entity_type, hit.distance, self._get_printable_search_result(
+                dataset, hit.row, hit.entity_type, profile)))
+
+    def _run_index_search(self, profile_args, access_path, entity_types, find_hits, format_hit):
+        """Run a search answered by an index of the current version, and format its hits. Used by search_tags,
+        search_text and search_fuzzy. If profiling is enabled, the search is profiled and recorded in
+        self.profiler like do_search.
+        :param profile_args: (search field name, search value, entity type) shown in the QueryProfile
+        :param access_path: name of the index, for the QueryProfile
+        :param entity_types: entity types to load before searching, None for all
+        :param find_hits: function called with the DatasetVersion and the QueryProfile (None if the search
+        is not profiled), returns the hits in the order of the results
+        :param format_hit: function called with the DatasetVersion, a hit and the QueryProfile, returns the
+        result of the hit
+        :return: list of results, None if nothing is found
+        """
+        profile = None
+        if self.profiler is not None:
+            profile = QueryProfile(*profile_args)
+            profile.access_path = access_path
+
+        query_start = now()
+        dataset = self.dataset
+        try:
+            dataset.ensure_loaded(dataset.searchable_data_set if entity_types is None else entity_types)
+            hits = find_hits(dataset, profile)
+
+            if profile is not None:
+                format_start = now()
+                profile.add_time('scan', format_start - query_start)
+                profile.count('results', len(hits))
+
+            if not hits:
+                return None
+
+            results = [format_hit(dataset, hit, profile) for hit in hits]
+
+            if profile is not None:
+                profile.add_time('format', now() - format_start)
+
+            return results
+        finally:
+            if profile is not None:
+                profile.total_time = now() - query_start
+                self.profiler.record(profile)
+
+    def enable_profiling(self, profiler=None):
+        """Start profiling every search
+        :param profiler: QueryProfiler to record into. A new one is created if not given
+        :return: the QueryProfiler in use
+        """
+        self.profiler = profiler if profiler is not None else QueryProfiler()
+        return self.profiler
+
+    def disable_profiling(self):
+        """Stop profiling searches
+        :return: None
+        """
+        self.profiler = None
 
-        if search_field_name == ENTITY_TYPE_TO_STORE_TYPE[entity_type].unique_identifier_field_name():
-            search_results = self._search_by_unique_identifier(search_field_value, entity_type)
+    def _do_search(self, search_field_name, search_field_value, entity_type, profile):
+        """Implementation of do_search.
+        :param profile: QueryProfile to record into, None if the search is not profiled
+        :return: printable search results, None if nothing is found
+        """
+        query_start = now()
+        # The whole search uses this version, even if a reload publishes a new one meanwhile
+        dataset = self.dataset
+        dataset.ensure_loaded(self._entity_types_needed(entity_type))
+
+        entity_store_type = dataset.searchable_data_set[entity_type].entity_store_type
+        # ranges, and floats which only match an int identifier within the tolerance, are not keys of the
+        # row index, they are searched like the other numeric fields
+        if search_field_name == entity_store_type.unique_identifier_field_name() and not (
+                is_numeric_search(search_field_value) and not isinstance(search_field_value, int)):
+            search_results = self._search_by_unique_identifier(dataset, search_field_value, entity_type)
+            if profile is not None:
+                profile.access_path = 'unique identifier lookup'
         else:
-            search_results = self._search_by_non_unique_identifier(search_field_name, search_field_value, entity_type)
+            search_results = self._search_by_non_unique_identifier(dataset, search_field_name, search_field_value,
+                                                                   entity_type, profile)
+
+        if profile is not None:
+            format_start = now()
+            profile.add_time('scan', format_start - query_start)
+            profile.count('results', len(search_results) if search_results else 0)
 
         # if no results found, return
         if not search_results:
+            if profile is not None:
+                profile.total_time = now() - query_start
             return None
 
         printable_search_results = []
 
-        for search_result in search_results:  # loop through the search results and create printable object
-            printable_search_result = []
-            foreign_links = search_result.get_foreign_entity_links()  # Get foreign links
+        for search_result in search_results:  # loop through the rows found and create printable object
+            printable_search_results.append(self._get_printable_search_result(dataset, search_result, entity_type,
+                                                                              profile))
 
-            # loop through the data members. if there is a foreign link, get it's representation
-            for field_name, val in vars(search_result).items():
-                printable_val = [val]
+        if profile is not None:
+            end = now()
+            profile.add_time('format', end - format_start)
+            profile.total_time = end - query_start
 
-                if field_name in foreign_links:
-
-                    fk_search_results = self._search_by_unique_identifier(val, foreign_links[
-                        field_name])  # like joins in SQL
-                    if fk_search_results:
-                        # Get the foreign items representation and plug it next to it's id
-                        # in the result get. Example, when searching for user id 1, the
-                        # output will show row organization id as
-                        # 119, name: Multron website: http://initech.zendesk.com/api/v2/organizations/119.json
-                        printable_val.append(fk_search_results[0].get_external_repr())
+        return printable_search_results
 
-                # Convert from list to csv
-                printable_val = ', '.join(str(v) for v in printable_val)
+    def _get_printable_search_result(self, dataset, search_result, entity_type, profile):
+        """Create the printable rows of one search result, with foreign keys resolved and
+        additional data from linked data sets.
+        :param dataset: DatasetVersion the search result is from
+        :param search_result: row of the entity object
+        :param entity_type: entity type of search_result
+        :param profile: QueryProfile to record into, None if the search is not profiled
+        :return: list of [field, value] rows
+        """
+        search_result_object = dataset.searchable_data_set[entity_type].rows[search_result]
+        printable_search_result = []
+        foreign_links = search_result_object.get_foreign_entity_links()  # Get foreign links
+
+        # loop through the data members. if there is a foreign link, get it's representation
+        for field_name, val in vars(search_result_object).items():
+            printable_val = [val]
+
+            if field_name in foreign_links:
+                join_start = now() if profile is not None else None
+
+                # Get the foreign items representation and plug it next to it's id
+                # in the result get. Example, when searching for user id 1, the
+                # output will show row organization id as
+                # 119, name: Multron website: http://initech.zendesk.com/api/v2/organizations/119.json
+                foreign_repr = self._get_foreign_repr(dataset, entity_type, search_result, field_name, val,
+                                                      foreign_links[field_name], profile)
+                if foreign_repr is not None:
+                    printable_val.append(foreign_repr)
+
+                if profile is not None:
+                    profile.add_time('join', now() - join_start)
+
+            # Convert from list to csv
+            printable_val = ', '.join(str(v) for v in printable_val)
+
+            # Add to final result set.
+            printable_search_result.append([field_name, printable_val])
+
+        # Get additional data from other entity types, depending on this entity type and it's relation to others
+        if entity_type in self.addition_data_func:
+            expand_start = now() if profile is not None else None
+
+            data_from_linked_datasets = self._get_cached_addition_data(dataset, search_result, entity_type, profile)
+            if data_from_linked_datasets:
+                data_from_linked_datasets.insert(0, ['', ''])
+                data_from_linked_datasets.insert(1, ['Additional Data',
+                                                     'Below is additional data from linked data sets'])
+                data_from_linked_datasets.insert(2, ['', ''])
+                printable_search_result.extend(data_from_linked_datasets)
+
+            if profile is not None:
+                profile.add_time('expand', now() - expand_start)
+
+        if profile is not None:
+            profile.count('rows_formatted', len(printable_search_result))
+
+        return printable_search_result
+
+    def get_addition_data(self, reverse_links, dataset, primary_data, profile=None):
+        """Get the records linked to a search result. Example users and tickets which belong to an organization
+        :param reverse_links: list of ReverseLink of the entity type of the search result, from the entity registry
+        :param dataset: DatasetVersion the search result is from
+        :param primary_data: row of the search result
+        :param profile: QueryProfile to record into, None if the search is not profiled
+        :return: list of [field, value] rows
+        """
+        dataset.ensure_loaded({reverse_link.source_entity_type for reverse_link in reverse_links})
 
-                # Add to final result set.
-                printable_search_result.append([field_name, printable_val])
+        addition_data = []
+        for reverse_link in reverse_links:
+            addition_data.extend(self._get_addition_data_rows(dataset, primary_data, reverse_link.cache_name,
+                                                              reverse_link.source_entity_type,
+                                                              reverse_link.field_name_format, profile))
+        return addition_data
 
-            # Get additional data from other entity types, depending on this entity type and it's relation to others
-            # If entity type is organization, then get all it's employees and role
-            if entity_type in self.addition_data_func:
-                data_from_linked_datasets = self.addition_data_func[entity_type](search_result)
-                if data_from_linked_datasets:
-                    data_from_linked_datasets.insert(0, ['', ''])
-                    data_from_linked_datasets.insert(1, ['Additional Data',
-                                                         'Below is additional data from linked data sets'])
-                    data_from_linked_datasets.insert(2, ['', ''])
-                    printable_search_result.extend(data_from_linked_datasets)
+    def _get_addition_data_rows(self, dataset, primary_data, link_cache_name, search_entity, field_name_format,
+                                profile=None):
+        """Printable rows of the records linked to a search result. If there are more than
+        self.max_additional_rows, only the first ones are shown, followed by the total count.
+        :param field_name_format: format of the field names, with a placeholder for the number of the record.
+        Example 'employee_{}'
+        :return: list of [field, value] rows
+        """
+        linked_objects, total_count = self._get_addition_data(dataset, primary_data, link_cache_name, search_entity,
+                                                              profile, self.max_additional_rows)
+        addition_data = [[field_name_format.format(idx + 1), linked_object.get_external_repr()]
+                         for idx, linked_object in enumerate(linked_objects)]
 
-            printable_search_results.append(printable_search_result)
+        if total_count > len(linked_objects):
+            addition_data.append([field_name_format.format('total'),
+                                  f'{total_count} ({total_count - len(linked_objects)} more not shown)'])
 
-        return printable_search_results
+        return addition_data
 
-    def get_addition_data_for_search_by_organization(self, organization):
-        """Get users and tickets which belong to an organization
-        :param search_result: organization entity object
-        :return:
+    def _get_foreign_repr(self, dataset, entity_type, row, field_name, unique_identifier, foreign_entity_type,
+                          profile=None):
+        """External representation of the record a foreign key points to, like joins in SQL.
+        The row of the record is read from the foreign keys resolved at load time. Storage backends do not
+        resolve them, the row is then looked up by unique identifier.
+        :param entity_type: entity type of the record holding the foreign key
+        :param row: row of the record holding the foreign key
+        :param field_name: name of the foreign key
+        :param unique_identifier: value of the foreign key
+        :param foreign_entity_type: entity type the foreign key points to
+        :return: the representation, None if the record is not found
         """
-        addition_data = []
+        foreign_rows = dataset.foreign_rows.get((entity_type, field_name))
+        if foreign_rows is not None:
+            foreign_row = foreign_rows[row]
+        else:
+            fk_search_results = self._search_by_unique_identifier(dataset, unique_identifier, foreign_entity_type)
+            foreign_row = fk_search_results[0] if fk_search_results else -1
 
-        linked_users = self._get_addition_data(organization, self.organization_to_users,
-                                               self._search_by_unique_identifier,
-                                               EntityTypes.USER)
-        for idx, linked_user in enumerate(linked_users):
-            addition_data.append([f'employee_{idx + 1}', linked_user.get_external_repr()])
+        if foreign_row < 0:
+            return None
 
-        linked_tickets = self._get_addition_data(organization, self.organization_to_tickets,
-                                                 self._search_by_unique_identifier,
-                                                 EntityTypes.TICKET)
-        for idx, linked_ticket in enumerate(linked_tickets):
-            addition_data.append([f'ticket_{idx + 1}', linked_ticket.get_external_repr()])
+        def build_foreign_repr():
+            if profile is not None:
+                profile.count('joins_performed')
 
-        return addition_data
+            return dataset.searchable_data_set[foreign_entity_type].rows[foreign_row].get_external_repr()
 
-    def get_addition_data_for_search_by_user(self, user):
-        """Get tickets for a given user.
-        :param search_result: User entity object
-        :return:
+        if not self.cache_expansions:
+            return build_foreign_repr()
+
+        foreign_repr, is_cached = dataset.get_derived('expansion_cache', ExpansionCache).get_external_repr(
+            foreign_entity_type, foreign_row, build_foreign_repr)
+        if is_cached and profile is not None:
+            profile.count('expansion_cache_hits')
+
+        return foreign_repr
+
+    def _get_cached_addition_data(self, dataset, row, entity_type, profile=None):
+        """Additional data of a search result from the ExpansionCache, built with self.addition_data_func
+        on a miss
+        :return: list of [field, value] rows, a new list for every call
         """
-        addition_data = []
-        tickets_as_submitter = self._get_addition_data(user, self.user_to_ticket_submitter,
-                                                       self._search_by_unique_identifier,
-                                                       EntityTypes.TICKET)
-        for idx, ticket in enumerate(tickets_as_submitter):
-            addition_data.append([f'ticket_{idx + 1}_as_submitter', ticket.get_external_repr()])
-
-        tickets_as_assignee = self._get_addition_data(user, self.user_to_ticket_assignee,
-                                                      self._search_by_unique_identifier,
-                                                      EntityTypes.TICKET)
-        for idx, ticket in enumerate(tickets_as_assignee):
-            addition_data.append([f'ticket_{idx + 1}_as_assignee', ticket.get_external_repr()])
+        def build_addition_data():
+            return self.addition_data_func[entity_type](dataset, row, profile)
+
+        if not self.cache_expansions:
+            return build_addition_data()
+
+        addition_data, is_cached = dataset.get_derived('expansion_cache', ExpansionCache).get_addition_data(
+            (entity_type, row, self.max_additional_rows), build_addition_data)
+        if is_cached and profile is not None:
+            profile.count('expansion_cache_hits')
 
         return addition_data
 
-    def _get_addition_data(self, primary_data, cache_dict, search_method, search_entity):
-        """Internal method which uses cache_dict to look for linked data in a dataset
-        for entity search_entity based on searching method search_method
-        :param primary_data: object which has links to other data sets
-        :param cache_dict: cache which links primary data to unique identifiers of
-        other data sets. Example {user_id : [ticket_ids]}
-        :param search_method: method to use for searching. Example self._search_by_unique_identifier
+    @staticmethod
+    def _get_addition_data(dataset, primary_data, link_cache_name, search_entity, profile=None, limit=None):
+        """Internal method which uses a relationship cache to look for linked data in a dataset
+        for entity search_entity. The cache gives the rows of the linked records, so they
+        are read from the rows of the linked data set without looking them up by identifier.
+        :param dataset: DatasetVersion the primary data is from
+        :param primary_data: row of the object which has links to other data sets
+        :param link_cache_name: name of the CsrAdjacency which links primary data to rows of
+        other data sets. Example {user row : [ticket rows]}
         :param search_entity: Entity type of the linked data set EntityType.TICKET for USERS
-        :return:
+        :param profile: QueryProfile to record into, None if the search is not profiled
+        :param limit: maximum number of linked objects to return, None for all
+        :return: (list of linked objects, total number of linked records)
         """
-        return_data = []
-        addition_data_ids = cache_dict.get(primary_data.unique_identifier, [])
+        linked_rows = dataset.relationship_caches[link_cache_name].get(primary_data)
+        total_count = len(linked_rows)
+        if limit is not None:
+            linked_rows = linked_rows[:limit]
 
-        for addition_data_id in addition_data_ids:
-            addition_data_object = search_method(addition_data_id, search_entity)
-            if addition_data_object:
-                return_data.append(addition_data_object[0])
+        if profile is not None:
+            profile.count('link_lookups', len(linked_rows))
 
-        return return_data
+        rows = dataset.searchable_data_set[search_entity].rows
+        return [rows[row] for row in linked_rows], total_count
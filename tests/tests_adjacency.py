@@ -0,0 +1,37 @@
+import unittest
+from array import array
+
+from search_engine_libs.adjacency import ROW_TYPE_CODE, CsrAdjacency
+
+
+class TestAdjacency(unittest.TestCase):
+
+    def test_rows_keep_load_order(self):
+        # organization row of each ticket row
+        key_rows = array(ROW_TYPE_CODE, [1, 0, 1, 2, 1, 0])
+
+        link_cache = CsrAdjacency.from_key_rows(key_rows, 3)
+
+        self.assertEqual(len(link_cache), 3)
+        self.assertEqual(list(link_cache.offsets), [0, 2, 5, 6])
+        self.assertEqual(list(link_cache.targets), [1, 5, 0, 2, 4, 3])
+        self.assertEqual(list(link_cache.get(1)), [0, 2, 4])
+        self.assertEqual(list(link_cache.get(0)), [1, 5])
+        self.assertEqual(list(link_cache.get(2)), [3])
+
+    def test_missing_key(self):
+        # the second record refers to no row, the second key row has no links
+        key_rows = array(ROW_TYPE_CODE, [0, -1])
+
+        link_cache = CsrAdjacency.from_key_rows(key_rows, 2)
+
+        self.assertEqual(list(link_cache.offsets), [0, 1, 1])
+        self.assertEqual(list(link_cache.targets), [0])
+        self.assertEqual(list(link_cache.get(0)), [0])
+        self.assertEqual(len(link_cache.get(1)), 0)
+        self.assertEqual(len(link_cache.get(5)), 0)
+        self.assertEqual(len(link_cache.get(-1)), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import asyncio
+import os
+import threading
+import unittest
+from functools import partial
+
+from search_engine_libs.async_search_engine import AsyncZendeskSearchEngine
+from search_engine_libs.query_profiler import QueryProfiler
+from utils.constants import EntityTypes
+
+
+class TestAsyncSearchEngine(unittest.TestCase):
+    test_data_folder = None
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        TestAsyncSearchEngine.test_data_folder = os.path.join('tests', 'test_data_files')
+        if not os.path.isdir(TestAsyncSearchEngine.test_data_folder):
+            TestAsyncSearchEngine.test_data_folder = os.path.join('..', 'tests', 'test_data_files')
+
+    def test_search_batch(self):
+        async def run():
+            release = threading.Event()
+            async with await AsyncZendeskSearchEngine.create(TestAsyncSearchEngine.test_data_folder) as search_engine:
+                results = await search_engine.search_batch([('_id', 71, EntityTypes.USER),
+                                                            ('shared', False, EntityTypes.USER),
+                                                            ('name', 'Fake firm', EntityTypes.ORGANIZATION)])
+                # in flight when the engine is closed. Released by the event loop, which must keep running
+                in_flight = search_engine._run(partial(release.wait, 5))
+                asyncio.get_running_loop().call_later(0.05, release.set)
+
+            return results, await in_flight
+
+        (by_id, by_shared, not_found), released = asyncio.run(run())
+
+        self.assertTrue(released)
+        self.assertEqual(by_id[0][1], ['name', 'Prince Hinton'])
+        self.assertEqual(len(by_shared), 47)
+        self.assertIsNone(not_found)
+
+    def test_identical_searches_are_coalesced(self):
+        profiler = QueryProfiler()
+
+        async def run():
+            async with await AsyncZendeskSearchEngine.create(TestAsyncSearchEngine.test_data_folder,
+                                                             profiler=profiler) as search_engine:
+                return await asyncio.gather(search_engine.search('tags', 'Ohio', EntityTypes.TICKET),
+                                            search_engine.search('tags', 'Ohio', EntityTypes.TICKET),
+                                            search_engine.search('tags', 'Idaho', EntityTypes.TICKET))
+
+        first, second, third = asyncio.run(run())
+
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, third)
+        self.assertEqual(profiler.query_count, 2)
+
+        # each caller gets its own copy of the shared result
+        self.assertIsNot(first, second)
+        first[0][0][1] = 'changed'
+        self.assertNotEqual(second[0][0][1], 'changed')
+
+    def test_reload_publishes_new_version(self):
+        async def run():
+            async with await AsyncZendeskSearchEngine.create(TestAsyncSearchEngine.test_data_folder) as search_engine:
+                previous_version = search_engine.search_engine.dataset.version
+                search = asyncio.ensure_future(search_engine.search('_id', 71, EntityTypes.USER))
+                new_dataset = await search_engine.reload()
+                return previous_version, search_engine.search_engine.dataset, new_dataset, await search
+
+        previous_version, current_dataset, new_dataset, results = asyncio.run(run())
+
+        self.assertIs(current_dataset, new_dataset)
+        self.assertEqual(new_dataset.version, previous_version + 1)
+        self.assertEqual(len(results), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
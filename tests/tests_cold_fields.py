@@ -0,0 +1,77 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from search_engine_libs.search_engine_utils import COLD_TEXT_FIELDS
+from search_engine_libs.zendesk_search_engine import ZendeskSearchEngine
+from utils.cold_fields import ColdField
+from utils.constants import EntityTypes
+
+
+class TestColdFields(unittest.TestCase):
+    test_data_folder = None
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        TestColdFields.test_data_folder = os.path.join('tests', 'test_data_files')
+        if not os.path.isdir(TestColdFields.test_data_folder):
+            TestColdFields.test_data_folder = os.path.join('..', 'tests', 'test_data_files')
+
+    def test_same_results_as_resident_fields(self):
+        search_engine = ZendeskSearchEngine(TestColdFields.test_data_folder)
+        cold_search_engine = ZendeskSearchEngine(TestColdFields.test_data_folder, cold_fields=COLD_TEXT_FIELDS)
+
+        ticket = cold_search_engine.dataset.searchable_data_set[EntityTypes.TICKET].rows[0]
+        self.assertIsInstance(ticket.description, ColdField)
+        self.assertIsInstance(ticket.subject, str)
+
+        for search_field_name, search_value, entity_type in [
+                ('_id', 71, EntityTypes.USER), ('_id', 119, EntityTypes.ORGANIZATION),
+                ('description', 'nostrud', EntityTypes.TICKET), ('signature', 'happy', EntityTypes.USER),
+                ('tags', 'ohio', EntityTypes.TICKET)]:
+            self.assertEqual(cold_search_engine.do_search(search_field_name, search_value, entity_type),
+                             search_engine.do_search(search_field_name, search_value, entity_type))
+
+        self.assertEqual(cold_search_engine.search_text('ohio problem pending'),
+                         search_engine.search_text('ohio problem pending'))
+
+    def test_values_read_by_position(self):
+        records = [{'_id': 'a', 'subject': 'Fédérated', 'description': 'Ünïcode ✓ text', 'tags': ['Ohio']},
+                   {'_id': 'b', 'subject': 'Plain', 'description': None},
+                   {'_id': 'c', 'subject': 'Escaped', 'description': 'quote " and \\ backslash'}]
+
+        with tempfile.TemporaryDirectory() as temp_folder:
+            # copytree creates the folder, dirs_exist_ok needs python 3.8
+            data_folder = os.path.join(temp_folder, 'data_files')
+            shutil.copytree(TestColdFields.test_data_folder, data_folder)
+            tickets_folder = os.path.join(data_folder, 'tickets_data')
+            for file_name in os.listdir(tickets_folder):
+                os.remove(os.path.join(tickets_folder, file_name))
+            tickets_file = os.path.join(tickets_folder, 'tickets.json')
+            with open(tickets_file, 'w', encoding='utf-8') as file_writer:
+                json.dump(records, file_writer, ensure_ascii=False, indent=2)
+
+            search_engine = ZendeskSearchEngine(data_folder, cold_fields={EntityTypes.TICKET: ('description',)})
+            tickets = search_engine.dataset.searchable_data_set[EntityTypes.TICKET].rows
+
+            self.assertEqual([str(ticket.description) for ticket in tickets],
+                             ['Ünïcode ✓ text', 'None', 'quote " and \\ backslash'])
+            self.assertIsNone(tickets[1].description)
+            self.assertEqual(len(search_engine.do_search('description', 'ÜNÏCODE', EntityTypes.TICKET)), 1)
+
+            # the data file changed, cold fields can not be read from it any more, even if it was read before
+            with open(tickets_file, 'a', encoding='utf-8') as file_writer:
+                file_writer.write('\n')
+            self.assertRaises(ValueError, lambda: tickets[0].description.value)
+            stale_search_engine = ZendeskSearchEngine(data_folder, cold_fields={EntityTypes.TICKET: ('subject',)})
+            with open(tickets_file, 'a', encoding='utf-8') as file_writer:
+                file_writer.write('\n')
+            self.assertRaises(ValueError, lambda: stale_search_engine.dataset.searchable_data_set[
+                EntityTypes.TICKET].rows[0].subject.value)
+
+
+if __name__ == '__main__':
+    unittest.main()
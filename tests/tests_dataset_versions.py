@@ -0,0 +1,49 @@
+import gc
+import os
+import unittest
+
+from search_engine_libs.zendesk_search_engine import ZendeskSearchEngine
+from utils.constants import EntityTypes
+
+
+class TestDatasetVersions(unittest.TestCase):
+    search_engine = None
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        try:
+            TestDatasetVersions.search_engine = ZendeskSearchEngine(os.path.join('tests', 'test_data_files'))
+        except FileNotFoundError:
+            TestDatasetVersions.search_engine = ZendeskSearchEngine(os.path.join('..', 'tests', 'test_data_files'))
+
+    def test_reload_does_not_modify_published_version(self):
+        search_engine = TestDatasetVersions.search_engine
+        old_dataset = search_engine.dataset
+        old_rows = old_dataset.searchable_data_set[EntityTypes.TICKET].rows
+        old_links = old_dataset.relationship_caches['organization_to_tickets']
+
+        new_dataset = search_engine.load_data_and_relations_cache()
+
+        self.assertIs(search_engine.dataset, new_dataset)
+        self.assertEqual(new_dataset.version, old_dataset.version + 1)
+        self.assertIs(old_dataset.searchable_data_set[EntityTypes.TICKET].rows, old_rows)
+        self.assertIs(old_dataset.relationship_caches['organization_to_tickets'], old_links)
+        self.assertEqual(len(old_rows), 200)
+        self.assertIsNot(new_dataset.searchable_data_set[EntityTypes.TICKET].rows, old_rows)
+        self.assertEqual(len(search_engine.do_search('shared', False, EntityTypes.USER)), 47)
+
+    def test_old_version_released(self):
+        search_engine = TestDatasetVersions.search_engine
+        held_dataset = search_engine.dataset
+
+        search_engine.load_data_and_relations_cache()
+        self.assertIn(held_dataset, search_engine.retired_datasets)
+
+        del held_dataset
+        gc.collect()
+        self.assertEqual(len(search_engine.retired_datasets), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,38 @@
+import unittest
+
+from utils.dictionary_encoder import DictionaryEncoder
+
+
+class TestDictionaryEncoder(unittest.TestCase):
+
+    def test_repeated_values_are_shared(self):
+        encoder = DictionaryEncoder(('locale', 'tags'))
+        first = encoder.encode_record({'locale': ''.join(['en-', 'AU']), 'tags': ['Ohio', 'Idaho'], 'name': 'a'})
+        second = encoder.encode_record({'locale': ''.join(['en-', 'AU']), 'tags': ['Ohio', 'Idaho'], 'name': 'b'})
+        third = encoder.encode_record({'locale': 'zh-CN', 'tags': ['Idaho', 'Utah'], 'name': 'c'})
+
+        self.assertEqual(first, {'locale': 'en-AU', 'tags': ['Ohio', 'Idaho'], 'name': 'a'})
+        self.assertIs(first['locale'], second['locale'])
+        self.assertIs(first['tags'], second['tags'])
+        self.assertIs(first['tags'][1], third['tags'][0])
+        # shared lists can not be changed through one record
+        self.assertRaises(TypeError, first['tags'].append, 'Utah')
+        self.assertRaises(TypeError, first['tags'].__setitem__, 0, 'Utah')
+        self.assertEqual(second['tags'], ['Ohio', 'Idaho'])
+        self.assertEqual(str(second['tags']), "['Ohio', 'Idaho']")
+        self.assertEqual(len(encoder.tables['locale']), 2)
+        self.assertEqual(len(encoder.tables['tags']), 3)
+        self.assertEqual(encoder.stats['tags'].values_seen, 6)
+        self.assertLess(encoder.stats['locale'].encoded_bytes, encoder.stats['locale'].raw_bytes)
+
+    def test_other_types_are_not_encoded(self):
+        encoder = DictionaryEncoder(('tags',))
+        source_data = {'tags': None}
+
+        self.assertIsNone(encoder.encode_record(source_data)['tags'])
+        self.assertEqual(encoder.encode('tags', [1, 2]), [1, 2])
+        self.assertEqual(encoder.memory_report(), [['encoded_total', 'saved 0 of 0 bytes']])
+
+
+if __name__ == '__main__':
+    unittest.main()
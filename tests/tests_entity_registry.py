@@ -0,0 +1,92 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from enum import Enum
+
+from entity_libs.entity import Entity
+from search_engine_libs.entity_registry import EntityRegistry, ReverseLink
+from search_engine_libs.search_engine_utils import register_builtin_entity_types
+from search_engine_libs.zendesk_search_engine import ZendeskSearchEngine
+from utils.constants import EntityTypes
+
+
+class ClashingEntityTypes(Enum):
+    GROUP = 1
+
+
+class Group(Entity):
+    searchable_fields_string = ""
+    entity_name = "Group"
+
+    def __init__(self, source_data):
+        self.name = None
+        self.organization_id = None
+
+        super(Group, self).__init__(source_data)
+
+    @staticmethod
+    def get_searchable_fields():
+        return Group.searchable_fields_string
+
+    @staticmethod
+    def get_foreign_entity_links():
+        return {'organization_id': EntityTypes.ORGANIZATION}
+
+    def get_external_repr(self):
+        return f'name: {self.name}'
+
+
+class TestEntityRegistry(unittest.TestCase):
+    test_data_folder = None
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        TestEntityRegistry.test_data_folder = os.path.join('tests', 'test_data_files')
+        if not os.path.isdir(TestEntityRegistry.test_data_folder):
+            TestEntityRegistry.test_data_folder = os.path.join('..', 'tests', 'test_data_files')
+
+    def test_registered_entity_type(self):
+        entity_registry = EntityRegistry()
+        register_builtin_entity_types(entity_registry)
+        group = entity_registry.register('GROUP', Group, 'groups_data', 'groups*.json', []).entity_type
+        entity_registry.add_reverse_link(EntityTypes.ORGANIZATION, ReverseLink(
+            'organization_to_groups', group, 'organization_id', 'group_{}'))
+
+        with tempfile.TemporaryDirectory() as temp_folder:
+            # copytree creates the folder, dirs_exist_ok needs python 3.8
+            data_folder = os.path.join(temp_folder, 'data_files')
+            shutil.copytree(TestEntityRegistry.test_data_folder, data_folder)
+            os.mkdir(os.path.join(data_folder, 'groups_data'))
+            with open(os.path.join(data_folder, 'groups_data', 'groups.json'), 'w') as file_writer:
+                json.dump([{'_id': 1, 'name': 'Escalations', 'organization_id': 119},
+                           {'_id': 2, 'name': 'Billing', 'organization_id': 999}], file_writer)
+
+            search_engine = ZendeskSearchEngine(data_folder, entity_registry=entity_registry)
+
+        self.assertEqual(entity_registry.menu_numbers[4], group)
+        self.assertEqual(search_engine.do_search('name', 'escalations', group)[0][:2],
+                         [['name', 'Escalations'], ['organization_id', '119, name: Multron website: '
+                                                    'http://initech.zendesk.com/api/v2/organizations/119.json']])
+        organization = search_engine.do_search('_id', 119, EntityTypes.ORGANIZATION)[0]
+        self.assertEqual(organization[-1], ['group_1', 'name: Escalations'])
+        self.assertEqual(search_engine.integrity_report.foreign_keys[(group, 'organization_id')]
+                         .orphan_samples, [(2, 999)])
+
+    def test_duplicate_registration(self):
+        entity_registry = EntityRegistry()
+        register_builtin_entity_types(entity_registry)
+
+        self.assertRaises(KeyError, entity_registry.register, EntityTypes.USER, Group, 'groups_data', 'groups*.json')
+        self.assertRaises(KeyError, entity_registry.register, 'USER', Group, 'groups_data', 'groups*.json')
+        self.assertRaises(KeyError, entity_registry.register, ClashingEntityTypes.GROUP, Group, 'groups_data',
+                          'groups*.json')
+        self.assertEqual(list(entity_registry.menu_numbers), [3, 1, 2])
+        self.assertEqual(entity_registry.relationship_caches['user_to_ticket_assignee'],
+                         (EntityTypes.TICKET, 'assignee_id', EntityTypes.USER))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+import os
+import unittest
+
+from search_engine_libs.zendesk_search_engine import ZendeskSearchEngine
+from utils.constants import EntityTypes
+
+
+class TestExpansionCache(unittest.TestCase):
+    base_data_folder = None
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        TestExpansionCache.base_data_folder = os.path.join('tests', 'test_data_files')
+        if not os.path.isdir(TestExpansionCache.base_data_folder):
+            TestExpansionCache.base_data_folder = os.path.join('..', 'tests', 'test_data_files')
+
+    def test_expansions_cached_per_version(self):
+        search_engine = ZendeskSearchEngine(TestExpansionCache.base_data_folder)
+        uncached_search_engine = ZendeskSearchEngine(TestExpansionCache.base_data_folder, cache_expansions=False)
+
+        first_profile = search_engine.explain('_id', 71, EntityTypes.USER)
+        second_profile = search_engine.explain('_id', 71, EntityTypes.USER)
+
+        self.assertEqual(first_profile.counters['expansion_cache_hits'], 0)
+        self.assertEqual(second_profile.counters['expansion_cache_hits'], 2)
+        self.assertEqual(second_profile.counters['joins_performed'], 0)
+        self.assertEqual(second_profile.counters['link_lookups'], 0)
+        self.assertEqual(search_engine.do_search('_id', 71, EntityTypes.USER),
+                         uncached_search_engine.do_search('_id', 71, EntityTypes.USER))
+
+        # changing a result does not change the cached rows
+        search_engine.do_search('_id', 71, EntityTypes.USER)[0][-1][1] = 'changed'
+        self.assertEqual(search_engine.do_search('_id', 71, EntityTypes.USER),
+                         uncached_search_engine.do_search('_id', 71, EntityTypes.USER))
+
+        # a reload starts with an empty cache
+        search_engine.load_data_and_relations_cache()
+        self.assertEqual(search_engine.explain('_id', 71, EntityTypes.USER).counters['expansion_cache_hits'], 0)
+
+    def test_max_additional_rows(self):
+        search_engine = ZendeskSearchEngine(TestExpansionCache.base_data_folder, max_additional_rows=2)
+
+        printable_search_result = search_engine.do_search('_id', 119, EntityTypes.ORGANIZATION)[0]
+        field_names = [field_name for field_name, _ in printable_search_result]
+
+        self.assertEqual(field_names[-6:], ['employee_1', 'employee_2', 'employee_total',
+                                            'ticket_1', 'ticket_2', 'ticket_total'])
+        self.assertEqual(printable_search_result[-1], ['ticket_total', '7 (5 more not shown)'])
+        self.assertEqual(search_engine.explain('_id', 101, EntityTypes.ORGANIZATION).counters['link_lookups'], 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+import os
+import unittest
+
+from search_engine_libs.fuzzy_search import FUZZY_SEARCH_FIELDS, FuzzyIndex, edit_distance
+from search_engine_libs.text_search import tokenize
+from search_engine_libs.zendesk_search_engine import ZendeskSearchEngine
+from utils.constants import EntityTypes
+
+
+class TestFuzzySearch(unittest.TestCase):
+    search_engine = None
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        try:
+            TestFuzzySearch.search_engine = ZendeskSearchEngine(os.path.join('tests', 'test_data_files'))
+        except FileNotFoundError:
+            TestFuzzySearch.search_engine = ZendeskSearchEngine(os.path.join('..', 'tests', 'test_data_files'))
+
+    def test_names_and_emails_with_typos(self):
+        # Francisca Rasmussen, coffeyrasmussen@flotonic.com
+        results = TestFuzzySearch.search_engine.search_fuzzy('Fransisca Rasmusen')
+        self.assertEqual(len(results), 1)
+        entity_type, distance, printable_search_result = results[0]
+        self.assertEqual((entity_type, distance), (EntityTypes.USER, 2))
+        self.assertIn(['_id', '1'], printable_search_result)
+
+        results = TestFuzzySearch.search_engine.search_fuzzy('cofeyrasmussen@flotonic.com')
+        self.assertEqual([(entity_type, distance) for entity_type, distance, _ in results], [(EntityTypes.USER, 1)])
+
+        # transposed letters in an organization name
+        results = TestFuzzySearch.search_engine.search_fuzzy('Plasmso', entity_type=EntityTypes.ORGANIZATION)
+        self.assertIn(['name', 'Plasmos'], results[0][2])
+        self.assertIsNone(TestFuzzySearch.search_engine.search_fuzzy('Plasmso', entity_type=EntityTypes.TICKET))
+        self.assertIsNone(TestFuzzySearch.search_engine.search_fuzzy('Plasmso', max_edit_distance=0))
+
+    def test_index_same_as_distance_to_every_token(self):
+        dataset = TestFuzzySearch.search_engine.dataset
+        index = FuzzyIndex.build(dataset)
+
+        # all of at least 6 characters, which allows 2 typos
+        for query_token in ['rasmusen', 'flotonik', 'wagnre', 'barlow', 'ingird', 'nutralabs',
+                            'coffeyrasmusen', 'cofeyrasmussen', 'jonibarlwo']:
+            expected_hits = []
+            for entity_type, store_meta in dataset.searchable_data_set.items():
+                for row, store_object in enumerate(store_meta.rows):
+                    tokens = [token for field_name in FUZZY_SEARCH_FIELDS
+                              for token in tokenize(str(getattr(store_object, field_name, None) or ''))]
+                    distance = min([edit_distance(query_token, token, 2) for token in tokens] or [3])
+                    if distance <= 2:
+                        expected_hits.append((distance, entity_type, row))
+
+            hits = index.search(query_token, limit=len(expected_hits) + 1)
+            self.assertEqual(sorted((hit.distance, hit.entity_type.value, hit.row) for hit in hits),
+                             sorted((distance, entity_type.value, row) for distance, entity_type, row in expected_hits))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import glob
+import json
+import os
+import unittest
+
+from search_engine_libs.zendesk_search_engine import ZendeskSearchEngine
+from utils.constants import EntityTypes
+from utils.util_funcs import get_searchable_fields_string
+
+
+class TestLazyLoading(unittest.TestCase):
+    test_data_folder = None
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        TestLazyLoading.test_data_folder = os.path.join('tests', 'test_data_files')
+        if not os.path.isdir(TestLazyLoading.test_data_folder):
+            TestLazyLoading.test_data_folder = os.path.join('..', 'tests', 'test_data_files')
+
+    def test_nothing_loaded_until_searched(self):
+        search_engine = ZendeskSearchEngine(TestLazyLoading.test_data_folder, lazy_load=True)
+
+        self.assertEqual(search_engine.dataset.loaded_entity_types, frozenset())
+        # the searchable fields come from the schema of the entities, without loading data. They are the
+        # fields of the first record of each data file, which they used to be read from
+        expected_fields_list = []
+        for data_folder, entity_name in [('users_data', 'User'), ('tickets_data', 'Ticket'),
+                                         ('organizations_data', 'Organization')]:
+            file_name = glob.glob(os.path.join(TestLazyLoading.test_data_folder, data_folder, '*.json'))[0]
+            with open(file_name) as data_file:
+                expected_fields_list.append(get_searchable_fields_string(json.load(data_file)[0], entity_name))
+        self.assertEqual(search_engine.get_search_fields_list(), expected_fields_list)
+        self.assertEqual(search_engine.dataset.loaded_entity_types, frozenset())
+
+        # organizations do not refer to other entity types
+        self.assertIsNone(search_engine.do_search('_id', 999, EntityTypes.ORGANIZATION))
+        self.assertEqual(search_engine.dataset.loaded_entity_types, frozenset([EntityTypes.ORGANIZATION]))
+
+        # users refer to organizations, their tickets are loaded only to show a result
+        self.assertIsNone(search_engine.do_search('_id', 999, EntityTypes.USER))
+        self.assertEqual(search_engine.dataset.loaded_entity_types,
+                         frozenset([EntityTypes.USER, EntityTypes.ORGANIZATION]))
+        search_engine.do_search('_id', 71, EntityTypes.USER)
+        self.assertEqual(search_engine.dataset.loaded_entity_types,
+                         frozenset([EntityTypes.USER, EntityTypes.ORGANIZATION, EntityTypes.TICKET]))
+
+    def test_same_results_as_eager(self):
+        lazy_search_engine = ZendeskSearchEngine(TestLazyLoading.test_data_folder, lazy_load=True)
+        search_engine = ZendeskSearchEngine(TestLazyLoading.test_data_folder)
+
+        searches = [('_id', 119, EntityTypes.ORGANIZATION), ('_id', 71, EntityTypes.USER),
+                    ('submitter_id', 555, EntityTypes.TICKET), ('tags', 'Ohio', EntityTypes.TICKET)]
+        for search_field_name, search_value, entity_type in searches:
+            self.assertEqual(lazy_search_engine.do_search(search_field_name, search_value, entity_type),
+                             search_engine.do_search(search_field_name, search_value, entity_type))
+
+        self.assertEqual(lazy_search_engine.integrity_report.as_rows(), search_engine.integrity_report.as_rows())
+
+
+if __name__ == '__main__':
+    unittest.main()
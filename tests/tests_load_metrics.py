@@ -0,0 +1,54 @@
+import glob
+import os
+import shutil
+import tempfile
+import unittest
+
+from search_engine_libs.zendesk_search_engine import ZendeskSearchEngine
+from utils.constants import EntityTypes
+
+
+class TestLoadMetrics(unittest.TestCase):
+    test_data_folder = None
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        TestLoadMetrics.test_data_folder = os.path.join('tests', 'test_data_files')
+        if not os.path.isdir(TestLoadMetrics.test_data_folder):
+            TestLoadMetrics.test_data_folder = os.path.join('..', 'tests', 'test_data_files')
+
+    def test_load_report(self):
+        progress = []
+        search_engine = ZendeskSearchEngine(TestLoadMetrics.test_data_folder, progress_callback=progress.append)
+
+        self.assertEqual([shard.entity_name for shard in progress], ['Organization', 'User', 'Ticket'])
+        self.assertTrue(all(shard.done for shard in progress))
+
+        report = search_engine.load_report
+        self.assertEqual(list(report.entities), ['Organization', 'User', 'Ticket'])
+        self.assertEqual(report.entities['Ticket'].totals()['records_parsed'], 200)
+        self.assertEqual(report.entities['User'].totals()['records_parsed'], 75)
+        self.assertEqual(report.entities['Organization'].totals()['duplicates_rejected'], 0)
+        self.assertGreater(report.entities['Ticket'].totals()['bytes_read'], 0)
+
+    def test_duplicates(self):
+        with tempfile.TemporaryDirectory() as temp_folder:
+            # copytree creates the folder, dirs_exist_ok needs python 3.8
+            data_folder = os.path.join(temp_folder, 'data_files')
+            shutil.copytree(TestLoadMetrics.test_data_folder, data_folder)
+            # second shard of users with the same records as the first one
+            users_file = glob.glob(os.path.join(data_folder, 'users_data', 'users*.json'))[0]
+            shutil.copy(users_file, os.path.join(data_folder, 'users_data', 'users_copy.json'))
+
+            self.assertRaises(KeyError, ZendeskSearchEngine, data_folder)
+
+            search_engine = ZendeskSearchEngine(data_folder, skip_duplicates=True)
+            user_totals = search_engine.load_report.entities['User'].totals()
+            self.assertEqual(user_totals['records_parsed'], 150)
+            self.assertEqual(user_totals['duplicates_rejected'], 75)
+            self.assertEqual(len(search_engine.searchable_data_set[EntityTypes.USER].rows), 75)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import os
+import tempfile
+import unittest
+
+from search_engine_libs.mmap_store import build_mmap_store
+from search_engine_libs.zendesk_search_engine import ZendeskSearchEngine
+from utils.constants import EntityTypes
+
+
+class TestMmapStore(unittest.TestCase):
+    search_engine = None
+    temp_folder = None
+    store_file_path = None
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        try:
+            TestMmapStore.search_engine = ZendeskSearchEngine(os.path.join('tests', 'test_data_files'))
+        except FileNotFoundError:
+            TestMmapStore.search_engine = ZendeskSearchEngine(os.path.join('..', 'tests', 'test_data_files'))
+
+        TestMmapStore.temp_folder = tempfile.TemporaryDirectory()
+        TestMmapStore.store_file_path = os.path.join(TestMmapStore.temp_folder.name, 'zendesk.mmap')
+        build_mmap_store(TestMmapStore.search_engine, TestMmapStore.store_file_path)
+
+    @classmethod
+    def tearDownClass(cls):
+        TestMmapStore.temp_folder.cleanup()
+        super().tearDownClass()
+
+    def test_same_results_as_data_files(self):
+        mmap_search_engine = ZendeskSearchEngine(TestMmapStore.search_engine.base_data_folder,
+                                                 mmap_store_path=TestMmapStore.store_file_path)
+        derived_names = set(mmap_search_engine.dataset.derived)
+
+        for search_field_name, search_field_value, entity_type in [
+                ('_id', 7, EntityTypes.USER),
+                ('alias', 'Miss Campos', EntityTypes.USER),
+                ('_id', '1a227508-9f39-427c-8f57-1b72f3fab87c', EntityTypes.TICKET),
+                ('tags', 'Puerto Rico', EntityTypes.TICKET),
+                ('_id', 105, EntityTypes.ORGANIZATION),
+                ('name', 'Fake firm', EntityTypes.ORGANIZATION),
+                ('submitter_id', 38, EntityTypes.TICKET),
+                ('domain_names', 'zentix', EntityTypes.ORGANIZATION)]:
+            self.assertEqual(mmap_search_engine.do_search(search_field_name, search_field_value, entity_type),
+                             TestMmapStore.search_engine.do_search(search_field_name, search_field_value, entity_type))
+
+        self.assertIsNone(mmap_search_engine.do_search('_id', 9999, EntityTypes.USER))
+        self.assertEqual(mmap_search_engine.search_text('ohio problem pending'),
+                         TestMmapStore.search_engine.search_text('ohio problem pending'))
+        self.assertEqual(mmap_search_engine.search_fuzzy('fransisca rasmusen'),
+                         TestMmapStore.search_engine.search_fuzzy('fransisca rasmusen'))
+        self.assertEqual(mmap_search_engine.search_tags('tags', EntityTypes.TICKET, ['ohio'], none_of=['utah']),
+                         TestMmapStore.search_engine.search_tags('tags', EntityTypes.TICKET, ['ohio'], none_of=['utah']))
+
+        # the indexes come from the store, searches do not build any by decoding every record
+        self.assertEqual(set(mmap_search_engine.dataset.derived) - derived_names, {'expansion_cache'})
+
+    def test_rows_are_decoded_lazily(self):
+        mmap_search_engine = ZendeskSearchEngine(TestMmapStore.search_engine.base_data_folder,
+                                                 mmap_store_path=TestMmapStore.store_file_path)
+        rows = mmap_search_engine.searchable_data_set[EntityTypes.USER].rows
+
+        self.assertEqual(len(rows), 75)
+        self.assertIsNot(rows[0], rows[0])
+        self.assertEqual(vars(rows[0]),
+                         vars(TestMmapStore.search_engine.searchable_data_set[EntityTypes.USER].rows[0]))
+        self.assertEqual(mmap_search_engine.load_report.entities['Ticket'].totals()['records_parsed'], 200)
+
+        # the map is closed once the version attached to it is replaced and no search holds it
+        mapped_file = rows.buffer.obj
+        mmap_search_engine.load_data_and_relations_cache()
+        self.assertTrue(mapped_file.closed)
+        self.assertRaises(ValueError, rows.__getitem__, 0)
+        self.assertEqual(len(mmap_search_engine.searchable_data_set[EntityTypes.USER].rows), 75)
+
+
+if __name__ == '__main__':
+    unittest.main()
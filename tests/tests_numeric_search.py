@@ -0,0 +1,79 @@
+import os
+import unittest
+
+from search_engine_libs.command_line_interface import CommandLineInterface
+from search_engine_libs.zendesk_search_engine import ZendeskSearchEngine
+from utils.constants import EntityTypes
+from utils.numeric_match import NumericRange, parse_numeric_range
+from utils.util_funcs import CUSTOM_SEARCH_FUNCTIONS
+
+
+class TestNumericSearch(unittest.TestCase):
+    search_engine = None
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        try:
+            TestNumericSearch.search_engine = ZendeskSearchEngine(os.path.join('tests', 'test_data_files'))
+        except FileNotFoundError:
+            TestNumericSearch.search_engine = ZendeskSearchEngine(os.path.join('..', 'tests', 'test_data_files'))
+
+    def test_float_matching(self):
+        match_float = CUSTOM_SEARCH_FUNCTIONS['float']
+
+        self.assertTrue(match_float(1.5, 1.5))
+        self.assertFalse(match_float(1.5, 1.6))
+        self.assertTrue(match_float(0.1 + 0.2, 0.3))
+        self.assertTrue(match_float(2.0, 2))
+        self.assertFalse(match_float(2.5, 'two'))
+        self.assertTrue(match_float(2.5, parse_numeric_range('2..3')))
+        self.assertFalse(match_float(3.0, parse_numeric_range('<3')))
+        self.assertTrue(CUSTOM_SEARCH_FUNCTIONS['int'](3, parse_numeric_range('>=3')))
+        self.assertEqual(parse_numeric_range('..-1.5'), NumericRange(high=-1.5))
+        self.assertIsNone(parse_numeric_range('..'))
+
+    def test_numeric_column_same_as_scan(self):
+        search_engine = TestNumericSearch.search_engine
+        rows = search_engine.dataset.searchable_data_set[EntityTypes.TICKET].rows
+
+        for search_value in [71, 71.0, NumericRange(70, 72), NumericRange(low=70, low_inclusive=False),
+                             NumericRange(high=5)]:
+            profile = search_engine.explain('submitter_id', search_value, EntityTypes.TICKET)
+            expected_count = sum(1 for row in rows if row.is_match('submitter_id', search_value))
+
+            self.assertEqual(profile.access_path, 'numeric column')
+            self.assertEqual(profile.counters['results'], expected_count)
+            # values equal to an excluded bound are checked by is_match
+            self.assertGreaterEqual(profile.counters['records_scanned'], expected_count)
+            self.assertLess(profile.counters['records_scanned'], len(rows) // 2)
+
+        # the orphaned submitter 555 is found by a range as well
+        printable_search_result = search_engine.do_search('submitter_id', NumericRange(500, 600),
+                                                          EntityTypes.TICKET)[0]
+        self.assertIn(['submitter_id', '555'], printable_search_result)
+        # ranges of unique identifiers use the numeric column, ints the row index
+        profile = search_engine.explain('_id', NumericRange(1, 3), EntityTypes.USER)
+        self.assertEqual((profile.access_path, profile.counters['results']), ('numeric column', 3))
+        self.assertEqual(len(search_engine.do_search('_id', NumericRange(high=3), EntityTypes.USER)), 3)
+        self.assertEqual(len(search_engine.do_search('_id', 1 + 1e-12, EntityTypes.USER)), 1)
+        self.assertEqual(search_engine.explain('_id', 1, EntityTypes.USER).access_path, 'unique identifier lookup')
+        # fields with values which are not numbers are scanned
+        self.assertEqual(search_engine.explain('shared', 1, EntityTypes.USER).access_path, 'full scan')
+
+    def test_ranges_only_for_numeric_fields(self):
+        search_engine = TestNumericSearch.search_engine
+
+        self.assertTrue(search_engine.is_numeric_field('submitter_id', EntityTypes.TICKET))
+        self.assertFalse(search_engine.is_numeric_field('subject', EntityTypes.TICKET))
+        self.assertFalse(search_engine.is_numeric_field('tags', EntityTypes.TICKET))
+        self.assertRaises(AttributeError, search_engine.is_numeric_field, 'missing', EntityTypes.TICKET)
+
+        # a range typed for a text field is searched as text
+        self.assertEqual(CommandLineInterface.cast_to_correct_type('10..20'), NumericRange(10, 20))
+        self.assertEqual(CommandLineInterface.cast_to_correct_type('10..20', is_numeric_field=False), '10..20')
+        self.assertIsNone(search_engine.do_search('subject', '10..20', EntityTypes.TICKET))
+
+
+if __name__ == '__main__':
+    unittest.main()
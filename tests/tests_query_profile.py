@@ -0,0 +1,57 @@
+import os
+import unittest
+
+from search_engine_libs.query_profiler import QueryProfiler
+from search_engine_libs.zendesk_search_engine import ZendeskSearchEngine
+from utils.constants import EntityTypes
+
+
+class TestQueryProfile(unittest.TestCase):
+    search_engine = None
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        try:
+            TestQueryProfile.search_engine = ZendeskSearchEngine(os.path.join('tests', 'test_data_files'))
+        except FileNotFoundError:
+            TestQueryProfile.search_engine = ZendeskSearchEngine(os.path.join('..', 'tests', 'test_data_files'))
+
+    def tearDown(self):
+        TestQueryProfile.search_engine.disable_profiling()
+        super().tearDown()
+
+    def test_explain_unique_identifier(self):
+        profile = TestQueryProfile.search_engine.explain('_id', 71, EntityTypes.USER)
+
+        self.assertEqual(profile.access_path, 'unique identifier lookup')
+        self.assertEqual(profile.counters['records_scanned'], 0)
+        self.assertEqual(profile.counters['results'], 1)
+        self.assertEqual(profile.counters['joins_performed'], 1)
+        self.assertEqual(profile.counters['link_lookups'], 4)
+        self.assertEqual(profile.counters['rows_formatted'], 26)
+
+    def test_explain_scan(self):
+        profile = TestQueryProfile.search_engine.explain('name', 'Plasmos', EntityTypes.ORGANIZATION)
+
+        self.assertEqual(profile.access_path, 'full scan')
+        self.assertEqual(profile.counters['records_scanned'], 25)
+        self.assertEqual(profile.counters['predicates_evaluated'], 25)
+        self.assertEqual(profile.counters['results'], 1)
+        self.assertGreaterEqual(profile.total_time, profile.phase_timings['scan'])
+
+    def test_profiling_aggregates(self):
+        profiler = TestQueryProfile.search_engine.enable_profiling(QueryProfiler())
+
+        results = TestQueryProfile.search_engine.do_search('shared', False, EntityTypes.USER)
+        TestQueryProfile.search_engine.do_search('_id', 9999, EntityTypes.USER)
+
+        self.assertEqual(len(results), 47)
+        self.assertEqual(profiler.query_count, 2)
+        self.assertEqual(profiler.histograms['total'].count, 2)
+        self.assertEqual(profiler.counter_totals['results'], 47)
+        self.assertEqual(profiler.counter_totals['records_scanned'], 75)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+import os
+import unittest
+
+from search_engine_libs.search_engine_utils import RELATIONSHIP_CACHES
+from search_engine_libs.zendesk_search_engine import ZendeskSearchEngine
+from utils.constants import EntityTypes
+
+
+class TestReferentialIntegrity(unittest.TestCase):
+    search_engine = None
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        try:
+            TestReferentialIntegrity.search_engine = ZendeskSearchEngine(os.path.join('tests', 'test_data_files'))
+        except FileNotFoundError:
+            TestReferentialIntegrity.search_engine = ZendeskSearchEngine(
+                os.path.join('..', 'tests', 'test_data_files'))
+
+    def test_orphaned_references(self):
+        integrity_report = TestReferentialIntegrity.search_engine.integrity_report
+
+        self.assertEqual(integrity_report.orphans, 3)
+        submitter = integrity_report.foreign_keys[(EntityTypes.TICKET, 'submitter_id')]
+        self.assertEqual(submitter.references, 200)
+        self.assertEqual(submitter.orphan_samples, [('bc736a06-eeb0-4271-b4a8-c66f61b5df1f', 555)])
+        self.assertEqual(integrity_report.foreign_keys[(EntityTypes.USER, 'organization_id')].orphans, 0)
+
+        # the orphaned foreign key is printed without the representation of a linked record
+        printable_search_result = TestReferentialIntegrity.search_engine.do_search(
+            '_id', 'bc736a06-eeb0-4271-b4a8-c66f61b5df1f', EntityTypes.TICKET)[0]
+        self.assertIn(['submitter_id', '555'], printable_search_result)
+
+    def test_caches_same_as_scanned_links(self):
+        dataset = TestReferentialIntegrity.search_engine.dataset
+
+        for cache_name, (source_entity_type, field_name, key_entity_type) in RELATIONSHIP_CACHES.items():
+            key_store_meta = dataset.searchable_data_set[key_entity_type]
+            expected_links = {key_row: [] for key_row in range(len(key_store_meta.rows))}
+            for row, store_object in enumerate(dataset.searchable_data_set[source_entity_type].rows):
+                key_row = key_store_meta.row_index.get(getattr(store_object, field_name))
+                if key_row is not None:
+                    expected_links[key_row].append(row)
+
+            link_cache = dataset.relationship_caches[cache_name]
+            self.assertEqual({key_row: list(link_cache.get(key_row)) for key_row in expected_links}, expected_links)
+
+if __name__ == '__main__':
+    unittest.main()
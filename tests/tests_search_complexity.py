@@ -0,0 +1,176 @@
+import glob
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from search_engine_libs.zendesk_search_engine import ZendeskSearchEngine
+from utils.constants import EntityTypes
+from utils.numeric_match import NumericRange
+
+# Sizes of the generated datasets, in copies of the test data files. The first size is the test data itself
+SCALES = (1, 3)
+# Added to the numeric identifiers, and the foreign keys, of each copy after the first
+COPY_ID_OFFSET = 1000
+
+# Searches of tests_users_search.py, tests_tickets_search.py and tests_organization_search.py
+SEARCH_SCENARIOS = [
+    ('_id', 7, EntityTypes.USER), ('shared', False, EntityTypes.USER), ('alias', 'Miss Campos', EntityTypes.USER),
+    ('_id', 9999, EntityTypes.USER), ('name', 'this is a fake name', EntityTypes.USER),
+    ('email', '', EntityTypes.USER),
+    ('_id', '1a227508-9f39-427c-8f57-1b72f3fab87c', EntityTypes.TICKET), ('due_at', '2016-08', EntityTypes.TICKET),
+    ('tags', 'Puerto Rico', EntityTypes.TICKET), ('_id', 'Fake ticket id', EntityTypes.TICKET),
+    ('subject', 'no subject', EntityTypes.TICKET), ('organization_id', '', EntityTypes.TICKET),
+    ('_id', 105, EntityTypes.ORGANIZATION), ('created_at', '2016', EntityTypes.ORGANIZATION),
+    ('name', 'Plasmos', EntityTypes.ORGANIZATION), ('_id', 100100, EntityTypes.ORGANIZATION),
+    ('name', 'Fake firm', EntityTypes.ORGANIZATION)]
+
+# Searches of the index tests, (access path, search). The records they find are only in the first copy
+INDEX_SCENARIOS = [
+    ('numeric column', lambda engine: engine.explain('submitter_id', 71, EntityTypes.TICKET)),
+    ('numeric column', lambda engine: engine.explain('submitter_id', NumericRange(500, 600), EntityTypes.TICKET)),
+    ('inverted index', lambda engine: engine.search_text('Multron', limit=3)),
+    ('fuzzy index', lambda engine: engine.search_fuzzy('Fransisca Rasmusen')),
+    ('fuzzy index', lambda engine: engine.search_fuzzy('cofeyrasmussen@flotonic.com')),
+    ('fuzzy index', lambda engine: engine.search_fuzzy('Plasmso', entity_type=EntityTypes.ORGANIZATION))]
+
+# Searches of the index tests whose records are in every copy, (access path, search)
+COPIED_INDEX_SCENARIOS = [
+    ('tag index', lambda engine: engine.explain('tags', 'ohio', EntityTypes.TICKET)),
+    ('tag index', lambda engine: engine.explain('tags', 'Springville', EntityTypes.USER)),
+    ('tag index', lambda engine: engine.search_tags('tags', EntityTypes.TICKET, all_of=['Ohio', 'pennsylvania']))]
+
+
+def _copy_id(value, copy):
+    """
+    :param value: numeric identifier or foreign key, None if missing
+    :param copy: number of the copy, 0 for the test data itself
+    :return: the identifier in the copy
+    """
+    return value + copy * COPY_ID_OFFSET if isinstance(value, int) else value
+
+
+def write_dataset(test_data_folder, base_data_folder, copies):
+    """Write copies of the test data files. The first copy is the test data itself. The other copies have
+    their own identifiers, linked to each other like in the test data, and their own names and emails, so
+    the records the searches find by identifier, number or name are only in the first copy
+    :param test_data_folder: folder of the test data files
+    :param base_data_folder: folder to write the data files into
+    :param copies: number of copies
+    :return: {entity type : number of records}
+    """
+    record_counts = {}
+    for entity_type, data_folder in [(EntityTypes.ORGANIZATION, 'organizations_data'),
+                                     (EntityTypes.USER, 'users_data'), (EntityTypes.TICKET, 'tickets_data')]:
+        with open(glob.glob(os.path.join(test_data_folder, data_folder, '*.json'))[0]) as data_file:
+            test_records = json.load(data_file)
+
+        records = list(test_records)
+        for copy in range(1, copies):
+            for test_record in test_records:
+                record = dict(test_record)
+                if entity_type == EntityTypes.TICKET:
+                    record['_id'] = f'{record["_id"]}-copy-{copy}'
+                else:
+                    record['_id'] = _copy_id(record['_id'], copy)
+                    record['name'] = f'Copy{copy} Record{record["_id"]}'
+                for field_name in ('organization_id', 'submitter_id', 'assignee_id'):
+                    if field_name in record:
+                        record[field_name] = _copy_id(record[field_name], copy)
+                if record.get('email'):
+                    record['email'] = f'copy{copy}.record{record["_id"]}@example.org'
+                records.append(record)
+
+        os.makedirs(os.path.join(base_data_folder, data_folder))
+        with open(os.path.join(base_data_folder, data_folder, f'{data_folder}.json'), 'w') as data_file:
+            json.dump(records, data_file)
+        record_counts[entity_type] = len(records)
+
+    return record_counts
+
+
+class TestSearchComplexity(unittest.TestCase):
+    """Runs the searches of the other tests on generated datasets of growing size, and checks the counted
+    operations of each search, so that a search which stops using its index fails deterministically.
+    """
+    temp_folder = None
+    # [(search engine, {entity type : number of records})], one for each of SCALES
+    search_engines = []
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        test_data_folder = os.path.join('tests', 'test_data_files')
+        if not os.path.isdir(test_data_folder):
+            test_data_folder = os.path.join('..', 'tests', 'test_data_files')
+
+        TestSearchComplexity.temp_folder = tempfile.mkdtemp()
+        TestSearchComplexity.search_engines = []
+        for scale in SCALES:
+            base_data_folder = os.path.join(TestSearchComplexity.temp_folder, f'scale_{scale}')
+            record_counts = write_dataset(test_data_folder, base_data_folder, scale)
+            # expansions are not cached, so the counters do not depend on the order of the searches
+            TestSearchComplexity.search_engines.append(
+                (ZendeskSearchEngine(base_data_folder, cache_expansions=False), record_counts))
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TestSearchComplexity.temp_folder)
+        super().tearDownClass()
+
+    @staticmethod
+    def _profile(search_engine, search):
+        """
+        :param search: function running a search on search_engine
+        :return: QueryProfile of the search
+        """
+        profiler = search_engine.enable_profiling()
+        try:
+            search(search_engine)
+        finally:
+            search_engine.disable_profiling()
+
+        return profiler.recent_profiles[-1]
+
+    def test_search_scenarios(self):
+        for search_field_name, search_value, entity_type in SEARCH_SCENARIOS:
+            profiles = [search_engine.explain(search_field_name, search_value, entity_type)
+                        for search_engine, _ in self.search_engines]
+            message = f'{entity_type.name} {search_field_name} {search_value}'
+
+            access_path = profiles[0].access_path
+            for profile, (_, record_counts) in zip(profiles, self.search_engines):
+                self.assertEqual(profile.access_path, access_path, message)
+                if access_path == 'full scan':
+                    self.assertEqual(profile.counters['records_scanned'], record_counts[entity_type], message)
+                    self.assertEqual(profile.counters['predicates_evaluated'], record_counts[entity_type], message)
+                elif access_path == 'unique identifier lookup':
+                    self.assertEqual(profile.counters['records_scanned'], 0, message)
+                    # the record and the records linked to it are in the first copy
+                    self.assertEqual(profile.counters, profiles[0].counters, message)
+                else:
+                    self.assertEqual(access_path, 'tag index', message)
+                    # only the records which match are read
+                    self.assertEqual(profile.counters['records_scanned'], profile.counters['results'], message)
+
+    def test_index_scenarios(self):
+        for access_path, search in INDEX_SCENARIOS + COPIED_INDEX_SCENARIOS:
+            profiles = [self._profile(search_engine, search) for search_engine, _ in self.search_engines]
+            message = f'{access_path} {profiles[0].search_field_name} {profiles[0].search_field_value}'
+
+            for profile, scale in zip(profiles, SCALES):
+                self.assertEqual(profile.access_path, access_path, message)
+                if (access_path, search) in INDEX_SCENARIOS:
+                    # the same records and tokens are read at every scale
+                    self.assertEqual(profile.counters, profiles[0].counters, message)
+                else:
+                    # the records read grow with the records found, which are in every copy
+                    for counter in ('records_scanned', 'results'):
+                        self.assertEqual(profile.counters[counter], profiles[0].counters[counter] * scale, message)
+
+            self.assertGreater(profiles[0].counters['results'], 0, message)
+
+
+if __name__ == '__main__':
+    unittest.main()
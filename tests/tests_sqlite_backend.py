@@ -0,0 +1,113 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest import mock
+
+from search_engine_libs.sqlite_backend import SqliteBackend
+from search_engine_libs.zendesk_search_engine import ZendeskSearchEngine
+from utils.constants import EntityTypes
+from utils.numeric_match import NumericRange
+
+
+class TestSqliteBackend(unittest.TestCase):
+    search_engine = None
+    sqlite_search_engine = None
+    temp_folder = None
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        try:
+            TestSqliteBackend.search_engine = ZendeskSearchEngine(os.path.join('tests', 'test_data_files'))
+        except FileNotFoundError:
+            TestSqliteBackend.search_engine = ZendeskSearchEngine(os.path.join('..', 'tests', 'test_data_files'))
+
+        TestSqliteBackend.temp_folder = tempfile.TemporaryDirectory()
+        TestSqliteBackend.sqlite_search_engine = ZendeskSearchEngine(
+            TestSqliteBackend.search_engine.base_data_folder,
+            storage_backend=SqliteBackend(os.path.join(TestSqliteBackend.temp_folder.name, 'zendesk.sqlite')))
+
+    @classmethod
+    def tearDownClass(cls):
+        TestSqliteBackend.sqlite_search_engine = None
+        TestSqliteBackend.temp_folder.cleanup()
+        super().tearDownClass()
+
+    def test_same_results_as_memory(self):
+        for search_field_name, search_field_value, entity_type in [
+                ('_id', 7, EntityTypes.USER),
+                ('alias', 'Miss Campos', EntityTypes.USER),
+                ('alias', 'ca', EntityTypes.USER),
+                ('verified', True, EntityTypes.USER),
+                ('organization_id', 119, EntityTypes.USER),
+                ('_id', '1a227508-9f39-427c-8f57-1b72f3fab87c', EntityTypes.TICKET),
+                ('tags', 'Puerto Rico', EntityTypes.TICKET),
+                ('description', '', EntityTypes.TICKET),
+                ('_id', 101, EntityTypes.ORGANIZATION),
+                ('domain_names', 'kage', EntityTypes.ORGANIZATION),
+                ('name', 'no such name', EntityTypes.ORGANIZATION),
+                ('organization_id', NumericRange(110, 115, low_inclusive=False), EntityTypes.USER),
+                ('submitter_id', 38.0, EntityTypes.TICKET)]:
+            self.assertEqual(
+                TestSqliteBackend.search_engine.do_search(search_field_name, search_field_value, entity_type),
+                TestSqliteBackend.sqlite_search_engine.do_search(search_field_name, search_field_value, entity_type))
+
+        for all_of, any_of, none_of in [(['ohio'], [], []), ([], ['ohio', 'utah'], ['idaho']), (['puerto*'], [], []),
+                                        ([], [], ['ohio'])]:
+            self.assertEqual(
+                TestSqliteBackend.search_engine.search_tags('tags', EntityTypes.TICKET, all_of, any_of, none_of),
+                TestSqliteBackend.sqlite_search_engine.search_tags('tags', EntityTypes.TICKET, all_of, any_of, none_of))
+        self.assertRaises(ValueError, TestSqliteBackend.sqlite_search_engine.search_tags, 'subject',
+                          EntityTypes.TICKET, ['ohio'])
+
+        row_index = TestSqliteBackend.sqlite_search_engine.searchable_data_set[EntityTypes.USER].row_index
+        self.assertIsNone(row_index.get(NumericRange(1, 10)))
+        self.assertEqual(row_index.get([7], -1), -1)
+
+    def test_search_reads_candidate_rows_only(self):
+        profile = TestSqliteBackend.sqlite_search_engine.explain('tags', 'Puerto Rico', EntityTypes.TICKET)
+        self.assertEqual(profile.access_path, 'backend candidates')
+        self.assertLess(profile.counters['records_scanned'],
+                        len(TestSqliteBackend.search_engine.searchable_data_set[EntityTypes.TICKET].rows))
+
+        # every record of the data files is loaded
+        load_report = TestSqliteBackend.sqlite_search_engine.load_report
+        self.assertEqual(load_report.entities['Ticket'].totals()['records_parsed'],
+                         len(TestSqliteBackend.search_engine.searchable_data_set[EntityTypes.TICKET].rows))
+
+        # numbers are searched in SQL, no numeric column is built from every record
+        profile = TestSqliteBackend.sqlite_search_engine.explain('organization_id', NumericRange(110, 112),
+                                                                 EntityTypes.USER)
+        self.assertEqual(profile.access_path, 'backend candidates')
+        self.assertEqual(profile.counters['records_scanned'], profile.counters['results'])
+        self.assertNotIn(('numeric_column', EntityTypes.USER, 'organization_id'),
+                         TestSqliteBackend.sqlite_search_engine.dataset.derived)
+
+        # the connection is closed once the version using it is replaced
+        database = TestSqliteBackend.sqlite_search_engine.searchable_data_set[EntityTypes.USER].rows.database
+        TestSqliteBackend.sqlite_search_engine.load_data_and_relations_cache()
+        self.assertRaises(sqlite3.ProgrammingError, database.connection.execute, 'SELECT 1')
+
+    def test_without_fts(self):
+        # SQLite before 3.34 has no trigram tokenizer, the text tables are then plain tables
+        with tempfile.TemporaryDirectory() as temp_folder, \
+                mock.patch('search_engine_libs.sqlite_backend._create_fts_supported', return_value=False):
+            sqlite_search_engine = ZendeskSearchEngine(
+                TestSqliteBackend.search_engine.base_data_folder,
+                storage_backend=SqliteBackend(os.path.join(temp_folder, 'zendesk.sqlite')))
+
+            self.assertFalse(sqlite_search_engine.searchable_data_set[EntityTypes.USER].search_candidates.has_fts)
+            for search_field_name, search_field_value, entity_type in [
+                    ('alias', 'Miss Campos', EntityTypes.USER), ('alias', 'ca', EntityTypes.USER),
+                    ('tags', 'Puerto Rico', EntityTypes.TICKET), ('domain_names', 'kage', EntityTypes.ORGANIZATION),
+                    ('name', 'no such name', EntityTypes.ORGANIZATION)]:
+                self.assertEqual(
+                    TestSqliteBackend.search_engine.do_search(search_field_name, search_field_value, entity_type),
+                    sqlite_search_engine.do_search(search_field_name, search_field_value, entity_type))
+
+            sqlite_search_engine = None
+
+
+if __name__ == '__main__':
+    unittest.main()
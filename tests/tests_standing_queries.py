@@ -0,0 +1,134 @@
+import glob
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from search_engine_libs.search_engine_utils import COLD_TEXT_FIELDS
+from search_engine_libs.sqlite_backend import SqliteBackend
+from search_engine_libs.zendesk_search_engine import ZendeskSearchEngine
+from utils.constants import EntityTypes
+
+
+class TestStandingQueries(unittest.TestCase):
+    test_data_folder = None
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        TestStandingQueries.test_data_folder = os.path.join('tests', 'test_data_files')
+        if not os.path.isdir(TestStandingQueries.test_data_folder):
+            TestStandingQueries.test_data_folder = os.path.join('..', 'tests', 'test_data_files')
+
+    @staticmethod
+    def _edit_tickets(data_folder):
+        """Change, add and remove tickets matching priority urgent
+        :param data_folder: folder of the data files to edit
+        :return: None
+        """
+        tickets_file = glob.glob(os.path.join(data_folder, 'tickets_data', '*.json'))[0]
+        with open(tickets_file) as file_reader:
+            tickets = json.load(file_reader)
+        tickets_by_id = {ticket['_id']: ticket for ticket in tickets}
+        tickets_by_id['87db32c5-76a3-4069-954c-7d59c6c21de0']['priority'] = 'low'
+        tickets_by_id['b4875dbc-c167-4625-a1e4-d14ed409c62c']['subject'] = 'A new subject'
+        tickets_by_id['1a227508-9f39-427c-8f57-1b72f3fab87c']['priority'] = 'urgent'
+        tickets.remove(tickets_by_id['6aac0369-a7e5-4417-8b50-92528ef485d3'])
+        tickets.append({'_id': 'new-ticket', 'subject': 'Outage', 'priority': 'urgent'})
+        with open(tickets_file, 'w') as file_writer:
+            json.dump(tickets, file_writer)
+
+    def test_changes_on_reload(self):
+        with tempfile.TemporaryDirectory() as temp_folder:
+            # copytree creates the folder, dirs_exist_ok needs python 3.8
+            data_folder = os.path.join(temp_folder, 'data_files')
+            shutil.copytree(TestStandingQueries.test_data_folder, data_folder)
+            search_engine = ZendeskSearchEngine(data_folder)
+            received_changes = []
+            standing_query = search_engine.register_standing_query('priority', 'urgent', EntityTypes.TICKET,
+                                                                   callback=received_changes.append)
+            self.assertEqual(len(standing_query.matching_identifiers), 49)
+
+            self._edit_tickets(data_folder)
+            search_engine.load_data_and_relations_cache()
+
+        self.assertEqual(len(received_changes), 1)
+        query_changes = received_changes[0]
+        self.assertEqual(query_changes.version, search_engine.dataset.version)
+        self.assertEqual(sorted(query_changes.added), ['1a227508-9f39-427c-8f57-1b72f3fab87c', 'new-ticket'])
+        self.assertEqual(sorted(query_changes.removed), ['6aac0369-a7e5-4417-8b50-92528ef485d3',
+                                                         '87db32c5-76a3-4069-954c-7d59c6c21de0'])
+        self.assertEqual(query_changes.changed, ['b4875dbc-c167-4625-a1e4-d14ed409c62c'])
+        # only the 3 changed records and the added one are matched again
+        self.assertEqual(query_changes.records_checked, 4)
+        self.assertEqual(standing_query.matching_identifiers,
+                         {dict(printable_search_result)['_id'] for printable_search_result in
+                          search_engine.do_search('priority', 'urgent', EntityTypes.TICKET)})
+        self.assertEqual(standing_query.take_changes(), [query_changes])
+        self.assertEqual(standing_query.take_changes(), [])
+
+    def test_changes_on_sqlite_reload(self):
+        with tempfile.TemporaryDirectory() as temp_folder:
+            data_folder = os.path.join(temp_folder, 'data_files')
+            shutil.copytree(TestStandingQueries.test_data_folder, data_folder)
+            search_engine = ZendeskSearchEngine(
+                data_folder, storage_backend=SqliteBackend(os.path.join(temp_folder, 'zendesk.sqlite')))
+            standing_query = search_engine.register_standing_query('priority', 'urgent', EntityTypes.TICKET)
+
+            self._edit_tickets(data_folder)
+            search_engine.load_data_and_relations_cache()
+
+            query_changes = standing_query.take_changes()[0]
+            self.assertEqual(sorted(query_changes.added), ['1a227508-9f39-427c-8f57-1b72f3fab87c', 'new-ticket'])
+            self.assertEqual(sorted(query_changes.removed), ['6aac0369-a7e5-4417-8b50-92528ef485d3',
+                                                             '87db32c5-76a3-4069-954c-7d59c6c21de0'])
+            self.assertEqual(query_changes.changed, ['b4875dbc-c167-4625-a1e4-d14ed409c62c'])
+            self.assertEqual(query_changes.records_checked, 4)
+            # the sqlite files are closed before the folder is removed
+            search_engine = None
+
+    def test_changes_of_cold_fields(self):
+        with tempfile.TemporaryDirectory() as temp_folder:
+            data_folder = os.path.join(temp_folder, 'data_files')
+            shutil.copytree(TestStandingQueries.test_data_folder, data_folder)
+            search_engine = ZendeskSearchEngine(data_folder, cold_fields=COLD_TEXT_FIELDS)
+            standing_query = search_engine.register_standing_query('priority', 'urgent', EntityTypes.TICKET)
+
+            # rewritten without indentation, every record moves in the file
+            tickets_file = glob.glob(os.path.join(data_folder, 'tickets_data', '*.json'))[0]
+            with open(tickets_file) as file_reader:
+                tickets = json.load(file_reader)
+            tickets_by_id = {ticket['_id']: ticket for ticket in tickets}
+            tickets_by_id['87db32c5-76a3-4069-954c-7d59c6c21de0']['description'] = 'A new description'
+            with open(tickets_file, 'w') as file_writer:
+                json.dump(tickets, file_writer)
+
+            search_engine.load_data_and_relations_cache()
+
+            query_changes = standing_query.take_changes()[0]
+            self.assertEqual(query_changes.changed, ['87db32c5-76a3-4069-954c-7d59c6c21de0'])
+            self.assertEqual(query_changes.records_checked, 1)
+            self.assertEqual(query_changes.added + query_changes.removed, [])
+
+    def test_unchanged_data(self):
+        search_engine = ZendeskSearchEngine(TestStandingQueries.test_data_folder, lazy_load=True)
+        standing_query = search_engine.register_standing_query('tags', 'ohio', EntityTypes.TICKET)
+        other_query = search_engine.register_standing_query('organization_id', 119, EntityTypes.USER)
+
+        search_engine.load_data_and_relations_cache()
+
+        self.assertEqual(standing_query.version, search_engine.dataset.version)
+        self.assertEqual(standing_query.take_changes(), [])
+        self.assertEqual(len(standing_query.matching_identifiers), 14)
+
+        search_engine.unregister_standing_query(other_query)
+        search_engine.load_data_and_relations_cache()
+        self.assertEqual(standing_query.version, search_engine.dataset.version)
+        self.assertNotEqual(other_query.version, search_engine.dataset.version)
+        self.assertRaises(AttributeError, search_engine.register_standing_query, 'no_such_field', 1,
+                          EntityTypes.USER)
+
+
+if __name__ == '__main__':
+    unittest.main()
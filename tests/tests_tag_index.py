@@ -0,0 +1,62 @@
+import os
+import unittest
+
+from search_engine_libs.zendesk_search_engine import ZendeskSearchEngine
+from utils.constants import EntityTypes
+
+
+class TestTagIndex(unittest.TestCase):
+    search_engine = None
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        try:
+            TestTagIndex.search_engine = ZendeskSearchEngine(os.path.join('tests', 'test_data_files'))
+        except FileNotFoundError:
+            TestTagIndex.search_engine = ZendeskSearchEngine(os.path.join('..', 'tests', 'test_data_files'))
+
+    def test_search_by_tag_same_as_scan(self):
+        search_engine = TestTagIndex.search_engine
+
+        for entity_type, search_field_name, search_value in [
+                (EntityTypes.TICKET, 'tags', 'ohio'), (EntityTypes.USER, 'tags', 'Springville'),
+                (EntityTypes.ORGANIZATION, 'tags', 'e'), (EntityTypes.ORGANIZATION, 'domain_names', '.com'),
+                (EntityTypes.ORGANIZATION, 'domain_names', 'nosuchdomain')]:
+            rows = search_engine.dataset.searchable_data_set[entity_type].rows
+            expected_count = sum(1 for row in rows if row.is_match(search_field_name, search_value))
+
+            profile = search_engine.explain(search_field_name, search_value, entity_type)
+            self.assertEqual(profile.access_path, 'tag index')
+            self.assertEqual(profile.counters['results'], expected_count)
+            self.assertEqual(profile.counters['records_scanned'], expected_count)
+
+        # empty values also match the records without tags, and text fields are not tag fields
+        self.assertEqual(search_engine.explain('tags', '', EntityTypes.TICKET).access_path, 'full scan')
+        self.assertEqual(search_engine.explain('subject', 'ohio', EntityTypes.TICKET).access_path, 'full scan')
+
+    def test_set_algebra(self):
+        search_engine = TestTagIndex.search_engine
+        rows = search_engine.dataset.searchable_data_set[EntityTypes.TICKET].rows
+        ticket_tags = [set(tag.lower() for tag in row.tags or []) for row in rows]
+
+        def expected_ids(condition):
+            return [row.unique_identifier for row, tags in zip(rows, ticket_tags) if condition(tags)]
+
+        def result_ids(**tag_lists):
+            results = search_engine.search_tags('tags', EntityTypes.TICKET, **tag_lists) or []
+            return [dict(printable_search_result)['_id'] for printable_search_result in results]
+
+        self.assertEqual(result_ids(all_of=['Ohio', 'pennsylvania']),
+                         expected_ids(lambda tags: {'ohio', 'pennsylvania'} <= tags))
+        self.assertEqual(result_ids(any_of=['ohio', 'utah'], none_of=['pennsylvania']),
+                         expected_ids(lambda tags: tags & {'ohio', 'utah'} and 'pennsylvania' not in tags))
+        self.assertEqual(result_ids(none_of=['ohio', 'new*']),
+                         expected_ids(lambda tags: 'ohio' not in tags and not any(tag.startswith('new')
+                                                                                  for tag in tags)))
+        self.assertEqual(result_ids(all_of=['nosuchtag']), [])
+        self.assertRaises(ValueError, search_engine.search_tags, 'subject', EntityTypes.TICKET, ['ohio'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+import os
+import unittest
+
+from search_engine_libs.text_search import TEXT_SEARCH_FIELDS, InvertedIndex, tokenize
+from search_engine_libs.zendesk_search_engine import ZendeskSearchEngine
+from utils.constants import EntityTypes
+
+
+class TestTextSearch(unittest.TestCase):
+    search_engine = None
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        try:
+            TestTextSearch.search_engine = ZendeskSearchEngine(os.path.join('tests', 'test_data_files'))
+        except FileNotFoundError:
+            TestTextSearch.search_engine = ZendeskSearchEngine(os.path.join('..', 'tests', 'test_data_files'))
+
+    def test_results_ranked_across_entity_types(self):
+        results = TestTextSearch.search_engine.search_text('Multron', limit=3)
+
+        # organization 119 is named Multron, its users and tickets do not have the name in their text fields
+        self.assertEqual(len(results), 1)
+        entity_type, score, printable_search_result = results[0]
+        self.assertEqual(entity_type, EntityTypes.ORGANIZATION)
+        self.assertIn(['_id', '119'], printable_search_result)
+        self.assertIsNone(TestTextSearch.search_engine.search_text('nosuchword'))
+
+    def test_top_hits_match_full_ranking(self):
+        index = InvertedIndex.build(TestTextSearch.search_engine.dataset)
+        all_hits = index.search('ohio problem pending', limit=len(index.document_lengths))
+        top_hits = index.search('ohio problem pending', limit=5)
+
+        self.assertEqual([vars(hit) for hit in top_hits], [vars(hit) for hit in all_hits[:5]])
+        scores = [hit.score for hit in all_hits]
+        self.assertEqual(scores, sorted(scores, reverse=True))
+        for hit in all_hits:
+            store_object = TestTextSearch.search_engine.searchable_data_set[hit.entity_type].rows[hit.row]
+            text = ' '.join(str(getattr(store_object, field_name, '')) for field_name in TEXT_SEARCH_FIELDS)
+            self.assertTrue({'ohio', 'problem', 'pending'} & set(tokenize(text)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,132 @@
+"""Cold fields: values of records which are left in their data file, and read from it when they are used.
+
+Bulky text fields like Ticket.description or User.signature are often neither searched nor shown
+for most records, but holding them in memory costs more than all the other fields. When a field is
+cold, the entity holds a ColdField instead of the value: the data file and the position of the record
+in it. The value is read and decoded from the file each time it is used, by a search on the field,
+by the text index or when a search result is printed, and is not kept.
+The data files must not change while the data loaded from them is in use. A file is opened for each
+read and closed right after it, so no file is held open, and the read raises ValueError if the file has
+changed since it was loaded. Reloading the data reads the new files.
+"""
+import hashlib
+import json
+import os
+
+
+class ColdFieldFile():
+    """Data file holding the values of cold fields, shared by all its records. Opened for each read.
+        self.file_path -> path of the data file
+        self.file_stat -> (size, modification time) of the file when it was loaded
+    """
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        file_stat = os.stat(file_path)
+        self.file_stat = (file_stat.st_size, file_stat.st_mtime_ns)
+
+    def read(self, start, end):
+        """
+        :param start: first byte
+        :param end: end byte
+        :return: bytes of the file from start to end. Raises ValueError if the file has changed since
+        it was loaded
+        """
+        with open(self.file_path, 'rb') as file_reader:
+            file_stat = os.fstat(file_reader.fileno())
+            if (file_stat.st_size, file_stat.st_mtime_ns) != self.file_stat:
+                raise ValueError(f'{self.file_path} has changed since it was loaded. Reload the data')
+
+            file_reader.seek(start)
+            return file_reader.read(end - start)
+
+    def __repr__(self):
+        return str(vars(self))
+
+
+class ColdField():
+    """Value of a field of a record, left in the data file. Only a digest of the value is kept in memory,
+    so that cold fields are compared by value without reading the files, which may have been replaced
+    since, like the files of the previous version of the data on a reload.
+    """
+    __slots__ = ('cold_field_file', 'start', 'end', 'field_name', 'value_digest')
+
+    def __init__(self, cold_field_file, start, end, field_name, value_digest):
+        """
+        :param cold_field_file: ColdFieldFile holding the record
+        :param start: first byte of the record in the file
+        :param end: end byte of the record in the file
+        :param field_name: name of the field
+        :param value_digest: digest of the value, see value_digest
+        """
+        self.cold_field_file = cold_field_file
+        self.start = start
+        self.end = end
+        self.field_name = field_name
+        self.value_digest = value_digest
+
+    @property
+    def value(self):
+        """Value of the field, read from the data file
+        """
+        return json.loads(self.cold_field_file.read(self.start, self.end))[self.field_name]
+
+    def __eq__(self, other):
+        # Equal if the values are equal, wherever they are in the files
+        return isinstance(other, ColdField) and self.value_digest == other.value_digest
+
+    def __hash__(self):
+        return hash(self.value_digest)
+
+    def __str__(self):
+        return str(self.value)
+
+    def __repr__(self):
+        return repr(self.value)
+
+
+def value_digest(value):
+    """
+    :param value: value of a field, parsed from a data file
+    :return: 16 bytes digest of the value. Equal values have the same digest
+    """
+    return hashlib.blake2b(json.dumps(value, sort_keys=True).encode('utf-8'), digest_size=16).digest()
+
+
+def make_fields_cold(source_data, field_names, cold_field_file, start, end):
+    """Replace the values of cold fields of a source record by ColdField. Missing and null values are kept
+    :param source_data: dictionary parsed from a data file
+    :param field_names: names of the cold fields
+    :param cold_field_file: ColdFieldFile the record was parsed from
+    :param start: first byte of the record in the file
+    :param end: end byte of the record in the file
+    :return: source_data
+    """
+    for field_name in field_names:
+        if source_data.get(field_name) is not None:
+            source_data[field_name] = ColdField(cold_field_file, start, end, field_name,
+                                                value_digest(source_data[field_name]))
+
+    return source_data
+
+
+def resolve_cold_field(value):
+    """
+    :param value: value of a field
+    :return: the value read from the data file if value is a ColdField, else value
+    """
+    if isinstance(value, ColdField):
+        return value.value
+
+    return value
+
+
+def json_default(value):
+    """Hook for json.dumps(default=...), writes the values of cold fields
+    :param value: object json can not serialize
+    :return: the value of a ColdField. Raises TypeError for other objects
+    """
+    if isinstance(value, ColdField):
+        return value.value
+
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
@@ -11,9 +11,4 @@ class EntityTypes(Enum):
     ORGANIZATION = 3
 
 
-ENTITY_TYPES_REVERSE = {
-    1: EntityTypes.USER,
-    2: EntityTypes.TICKET,
-    3: EntityTypes.ORGANIZATION
-}
 EMPTY_STRING = ''
@@ -0,0 +1,130 @@
+"""Dictionary encoding of repeated values while data is loaded.
+
+Values like tag names, locale, timezone, status, via and role repeat across thousands of records,
+but every parsed record holds its own copy of the string. DictionaryEncoder keeps one table per field
+name, shared by all entity types, and replaces each value by the first equal value seen. Lists of
+strings (tags, domain_names) have their items encoded, and equal lists share one FrozenList, which
+can not be modified, so that changing the list of one record can not change the others.
+Besides the memory, comparing two encoded values of the same field is an identity check.
+"""
+import sys
+from collections import OrderedDict
+
+# Fields with few distinct values compared to the number of records
+DEFAULT_ENCODED_FIELDS = ('tags', 'domain_names', 'locale', 'timezone', 'status', 'via', 'role', 'type',
+                          'priority')
+
+
+def _read_only(self, *args, **kwargs):
+    raise TypeError(f'{type(self).__name__} can not be modified, it is shared by the records with equal lists')
+
+
+class FrozenList(list):
+    """List which can not be modified, shared by the records of an encoded field with equal lists.
+    It compares, prints and serialises like a list. Assign a new list to the field to change it.
+    """
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _read_only
+    append = extend = insert = pop = remove = clear = sort = reverse = _read_only
+
+    def __reduce__(self):
+        # copy and pickle would fill the new list with extend
+        return FrozenList, (list(self),)
+
+
+class FieldEncodingStats():
+    """Memory statistics of one encoded field.
+        self.values_seen -> number of values encoded
+        self.raw_bytes -> size of the values if every record held its own copy
+        self.encoded_bytes -> size of the distinct values kept by the encoder
+    """
+
+    def __init__(self):
+        self.values_seen = 0
+        self.raw_bytes = 0
+        self.encoded_bytes = 0
+
+    def __repr__(self):
+        return str(vars(self))
+
+
+class DictionaryEncoder():
+    """Encodes the repeated values of source records. Shared by all entity types for one load.
+    """
+
+    def __init__(self, fields=DEFAULT_ENCODED_FIELDS):
+        """
+        :param fields: names of the fields to encode
+        """
+        self.fields = frozenset(fields)
+        self.tables = {field: {} for field in self.fields}
+        self.list_tables = {field: {} for field in self.fields}
+        self.stats = OrderedDict((field, FieldEncodingStats()) for field in sorted(self.fields))
+
+    def encode_record(self, source_data):
+        """Replace the values of the encoded fields of a source record in place.
+        :param source_data: dictionary parsed from a data file
+        :return: source_data
+        """
+        for field_name in self.fields.intersection(source_data):
+            source_data[field_name] = self.encode(field_name, source_data[field_name])
+
+        return source_data
+
+    def encode(self, field_name, value):
+        """Encode a value of a field. Values which are not strings or lists of strings are returned as is.
+        :param field_name: name of the field
+        :param value: value to encode
+        :return: the first value equal to value seen for this field
+        """
+        if isinstance(value, str):
+            return self._encode_string(self.tables[field_name], self.stats[field_name], value)
+
+        if isinstance(value, list) and all(isinstance(item, str) for item in value):
+            table = self.tables[field_name]
+            field_stats = self.stats[field_name]
+            encoded_items = tuple(self._encode_string(table, field_stats, item) for item in value)
+
+            list_table = self.list_tables[field_name]
+            field_stats.raw_bytes += sys.getsizeof(value)
+            encoded_list = list_table.get(encoded_items)
+            if encoded_list is None:
+                encoded_list = list_table[encoded_items] = FrozenList(encoded_items)
+                field_stats.encoded_bytes += sys.getsizeof(encoded_list)
+
+            return encoded_list
+
+        return value
+
+    @staticmethod
+    def _encode_string(table, field_stats, value):
+        """Look up value in the table of its field, adding it if it is new.
+        :return: encoded string
+        """
+        field_stats.values_seen += 1
+        field_stats.raw_bytes += sys.getsizeof(value)
+
+        encoded_value = table.get(value)
+        if encoded_value is None:
+            encoded_value = table[value] = value
+            field_stats.encoded_bytes += sys.getsizeof(value)
+
+        return encoded_value
+
+    def memory_report(self):
+        """Rows of [Field, Value] with the memory saved per field, same format as the rows of a search result
+        :return: list of lists
+        """
+        rows = []
+        raw_total = encoded_total = 0
+        for field_name, field_stats in self.stats.items():
+            if not field_stats.values_seen:
+                continue
+
+            raw_total += field_stats.raw_bytes
+            encoded_total += field_stats.encoded_bytes
+            rows.append([f'encoded_{field_name}',
+                         f'{field_stats.values_seen} values, {len(self.tables[field_name])} distinct, '
+                         f'saved {field_stats.raw_bytes - field_stats.encoded_bytes} of {field_stats.raw_bytes} bytes'])
+
+        rows.append(['encoded_total', f'saved {raw_total - encoded_total} of {raw_total} bytes'])
+        return rows
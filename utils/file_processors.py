@@ -14,3 +14,57 @@ def parse_json_from_file(file_path):
     with open(file_path, 'r') as file_reader:
         parsed_json = json.load(file_reader)
     return parsed_json
+
+
+def parse_json_records_with_spans(file_path):
+    """Parse a file holding a json array of records, with the position of each record in the file
+    :param file_path: path of the file
+    :return: (list of records, list of (first byte, end byte) of each record)
+    """
+    with open(file_path, 'rb') as file_reader:
+        data = file_reader.read()
+
+    text = data.decode('utf-8')
+    decoder = json.JSONDecoder()
+    records = []
+    spans = []
+
+    # Records are decoded from the text, their positions are counted in bytes. Both are the same for
+    # ascii files, otherwise the bytes of the text between two records are counted as it is walked
+    is_ascii = text.isascii()
+    byte_position = 0
+    text_position = 0
+
+    position = _skip_whitespace(text, 0)
+    if text[position:position + 1] != '[':
+        raise ValueError(f'{file_path} does not hold a json array')
+
+    position = _skip_whitespace(text, position + 1)
+    if text[position:position + 1] == ']':
+        return records, spans
+
+    while True:
+        record, end = decoder.raw_decode(text, position)
+        if not is_ascii:
+            byte_position += len(text[text_position:position].encode('utf-8'))
+            start_byte = byte_position
+            byte_position += len(text[position:end].encode('utf-8'))
+            text_position = end
+            spans.append((start_byte, byte_position))
+        else:
+            spans.append((position, end))
+        records.append(record)
+
+        position = _skip_whitespace(text, end)
+        separator = text[position:position + 1]
+        if separator == ']':
+            return records, spans
+        if separator != ',':
+            raise ValueError(f'Expected , or ] at character {position} of {file_path}')
+        position = _skip_whitespace(text, position + 1)
+
+
+def _skip_whitespace(text, position):
+    while position < len(text) and text[position] in ' \t\n\r':
+        position += 1
+    return position
@@ -0,0 +1,150 @@
+"""Matching of numeric fields: equality with a tolerance for floats, and ranges of values.
+Used by CUSTOM_SEARCH_FUNCTIONS for int and float fields, and by the numeric columns of the search engine.
+"""
+import math
+
+# Two numbers are equal if they differ by at most NUMERIC_REL_TOLERANCE times the larger of them, or by
+# at most NUMERIC_ABS_TOLERANCE. Integers compared with integers must be equal
+NUMERIC_REL_TOLERANCE = 1e-9
+NUMERIC_ABS_TOLERANCE = 1e-9
+
+# Shown for a missing bound of a NumericRange
+EMPTY_BOUND = '*'
+
+
+class NumericRange():
+    """Search value matching the numbers between two bounds.
+        self.low -> lower bound, None if there is none
+        self.high -> upper bound, None if there is none
+        self.low_inclusive -> True if low itself matches
+        self.high_inclusive -> True if high itself matches
+    """
+
+    def __init__(self, low=None, high=None, low_inclusive=True, high_inclusive=True):
+        self.low = low
+        self.high = high
+        self.low_inclusive = low_inclusive
+        self.high_inclusive = high_inclusive
+
+    def contains(self, value):
+        """
+        :param value: value of a field
+        :return: True if value is a number within the bounds
+        """
+        if not is_number(value):
+            return False
+
+        if self.low is not None and (value < self.low if self.low_inclusive else value <= self.low):
+            return False
+
+        if self.high is not None and (value > self.high if self.high_inclusive else value >= self.high):
+            return False
+
+        return True
+
+    def __eq__(self, other):
+        return isinstance(other, NumericRange) and vars(self) == vars(other)
+
+    def __hash__(self):
+        return hash((self.low, self.high, self.low_inclusive, self.high_inclusive))
+
+    def __str__(self):
+        low = EMPTY_BOUND if self.low is None else self.low
+        high = EMPTY_BOUND if self.high is None else self.high
+        return f'{"[" if self.low_inclusive else "("}{low}, {high}{"]" if self.high_inclusive else ")"}'
+
+    def __repr__(self):
+        return str(vars(self))
+
+
+def is_number(value):
+    """
+    :param value:
+    :return: True if value is an int or a float. Booleans are not numbers
+    """
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def is_numeric_search(search_value):
+    """
+    :param search_value: value of a search
+    :return: True if the search value is matched as a number: a number or a NumericRange
+    """
+    return is_number(search_value) or isinstance(search_value, NumericRange)
+
+
+def numbers_equal(source, search):
+    """
+    :param source: number, value of a field
+    :param search: number, value of a search
+    :return: True if the numbers are equal, within the tolerance if either is a float
+    """
+    if isinstance(source, int) and isinstance(search, int):
+        return source == search
+
+    return math.isclose(source, search, rel_tol=NUMERIC_REL_TOLERANCE, abs_tol=NUMERIC_ABS_TOLERANCE)
+
+
+def match_number(source, search):
+    """Custom match for int and float fields
+    :param source: value of the field
+    :param search: value of the search. A number, a NumericRange or any other value
+    :return: True if the search value matches
+    """
+    if isinstance(search, NumericRange):
+        return search.contains(source)
+
+    if is_number(search):
+        return numbers_equal(source, search)
+
+    return source == search
+
+
+def parse_number(text):
+    """
+    :param text: '10', '-2.5'
+    :return: int or float, None if text is not a number
+    """
+    try:
+        return int(text)
+    except ValueError:
+        pass
+
+    try:
+        return float(text)
+    except ValueError:
+        return None
+
+
+def parse_numeric_range(text):
+    """Parse a range of numbers typed in a search.
+    Example:
+        1. parse_numeric_range('10..20') returns the numbers from 10 to 20, both included
+        2. parse_numeric_range('10..') returns the numbers from 10
+        3. parse_numeric_range('>=2.5'), parse_numeric_range('<3') and so on with >, >=, <, <=
+        4. parse_numeric_range('ten') returns None
+    :param text:
+    :return: NumericRange, None if text is not a range
+    """
+    text = text.strip()
+
+    for operator in ('>=', '<=', '>', '<'):
+        if text.startswith(operator):
+            bound = parse_number(text[len(operator):].strip())
+            if bound is None:
+                return None
+
+            if operator[0] == '>':
+                return NumericRange(low=bound, low_inclusive=operator == '>=')
+            return NumericRange(high=bound, high_inclusive=operator == '<=')
+
+    low_text, separator, high_text = text.partition('..')
+    if not separator or not (low_text or high_text):
+        return None
+
+    low = parse_number(low_text) if low_text else None
+    high = parse_number(high_text) if high_text else None
+    if (low_text and low is None) or (high_text and high is None):
+        return None
+
+    return NumericRange(low, high)
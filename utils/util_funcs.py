@@ -1,18 +1,18 @@
 """Utility functions used by in search_engine_libs package
 """
-from decimal import Decimal
-
 from utils.constants import EMPTY_STRING
+from utils.dictionary_encoder import FrozenList
+from utils.numeric_match import match_number
 
 LIST_SEARCHABLE_FIELDS_SECTION_DELIMITER = "----------------------------------------------------"
 
 def get_searchable_fields_string(source_data, entity_name):
     """Creates a string representing the searchable fields
-    :param source_data:
+    :param source_data: a record, or the names of its fields
     :param entity_name:
     :return:
     """
-    return '\n'.join([f'Search {entity_name} with', '\n'.join([k for k in source_data.keys()]), '',
+    return '\n'.join([f'Search {entity_name} with', '\n'.join([k for k in source_data]), '',
                       LIST_SEARCHABLE_FIELDS_SECTION_DELIMITER])
 
 def partial_match_in_list(source_list, search_value):
@@ -21,8 +21,14 @@ def partial_match_in_list(source_list, search_value):
         :param search_value:
         :return:
         """
+    # same as the match for str items, with the search value lowered once for the whole list
+    lower_search_value = search_value.lower() if isinstance(search_value, str) and search_value else None
+
     for list_item in source_list:
-        if CUSTOM_SEARCH_FUNCTIONS[type(list_item).__name__](list_item, search_value):
+        if lower_search_value is not None and type(list_item) is str:
+            if lower_search_value in list_item.lower():
+                return True
+        elif CUSTOM_SEARCH_FUNCTIONS[type(list_item).__name__](list_item, search_value):
             return True
 
     return False
@@ -33,7 +39,16 @@ def partial_match_in_set(source_set, search_value):
     :param search_value:
     :return:
     """
-    return partial_match_in_list(list(source_set), search_value)
+    return partial_match_in_list(source_set, search_value)
+
+def match_cold_field(cold_field, search_value):
+    """Custom match for cold fields, on the value read from the data file
+    :param cold_field: ColdField
+    :param search_value:
+    :return:
+    """
+    value = cold_field.value
+    return CUSTOM_SEARCH_FUNCTIONS[type(value).__name__](value, search_value)
 
 def is_none(val):
     """Check if the value can be considered as None, based on the type of the value
@@ -54,9 +69,11 @@ def is_none(val):
 CUSTOM_SEARCH_FUNCTIONS = {
     'str' : lambda source, search: search != EMPTY_STRING and search.lower() in source.lower(), #can be made case sensitive if needed
     'bool' : lambda source, search: source == search,
-    'int': lambda source, search: source == search,
-    'float' : lambda source, search: Decimal(source).compare(Decimal(search)),
+    'int': match_number, #equal numbers, or numbers within a NumericRange
+    'float' : match_number,
     'list' : partial_match_in_list,
+    FrozenList.__name__ : partial_match_in_list, #lists shared by dictionary encoding
     'set' : partial_match_in_set,
+    'ColdField' : match_cold_field, #fields left in the data files, see cold_fields.py
     'NoneType' : lambda source, search: is_none(search) #convert search value to None on custom rules based on type
 }